@@ -1,26 +1,53 @@
+import time
+STARTED_AT = time.perf_counter()  # before the imports below, for the startup report
+
 import tkinter as tk
-import threading, math, tempfile, os
+import threading, os, queue, atexit
 import mysql.connector
-from tkinter import ttk, messagebox, font
-from datetime import datetime
-from escpos.printer import Serial
-from PIL import Image, ImageDraw, ImageFont
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+from tkinter import ttk, messagebox, font, filedialog
+from datetime import datetime, timedelta
+from db import Database, FeedExpired
+from catalog import BARCODE_MAX, ProductCatalog, normalize_barcode, normalize_name
+from catalog_service import CatalogClient
+from catalog_snapshot import CatalogSnapshot
+from catalog_sync import SYNC_INTERVAL_MS, CatalogSync
+from chrome_pool import ChromePool
+from migrations import migrate
+from popularity import Popularity
+from price_list import read_price_list, write_price_list, upsert_products
+from bill_model import BillModel
+from bill_journal import BillJournal, read_journal
+from metrics import MetricsFile, log, log_to_file, metrics, serve_prometheus
+from print_spooler import PRIORITY_HIGH, PartialSend, PrintSpooler
+from query_executor import QueryExecutor, QueryTimeout
+from receipt_cache import ReceiptCache, receipt_key
+from ui_sync import BurstDetector, Debouncer, ListboxSync, TreeSync, VirtualTree
+# escpos, selenium, PIL and the receipt renderers are imported on first print,
+# numpy (sales history) on the first recorded sale or report
+
+# ---------------- Log ----------------
+# what went wrong in the background (metrics.log) goes to pos.log; POS_LOG_PATH moves it
+LOG_PATH = os.environ.get("POS_LOG_PATH",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "pos.log"))
+log_to_file(LOG_PATH)
 
 # ---------------- MySQL Connection ----------------
-try:
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="cash_trader"
-    )
-    cursor = conn.cursor()
-except Exception as e:
-    messagebox.showerror("DB Connection Error", str(e))
-    exit()
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "root",
+    "database": "cash_trader",
+}
+
+db = None  # Database (pooled, one connection per thread); attached by the catalog warm-up
+offline = False  # True while billing from the local catalog snapshot without MySQL
+
+def db_ready():
+    if db is None:
+        messagebox.showerror("Error", "The database is offline: products cannot be changed until it is back."
+                             if offline else "Still connecting to the database, try again in a moment.")
+        return False
+    return True
 
 # ---------------- Main Window ----------------
 root = tk.Tk()
@@ -32,27 +59,310 @@ global_font = font.Font(family="Arial", size=13)
 style = ttk.Style()
 style.configure("Treeview", font=("Arial", 12))
 
+# ---------------- Background Queries ----------------
+CATALOG_RELOAD_TIMEOUT = 60  # seconds; a full catalog fetch may be slow on a busy server
+
+# every DB call made from a Tk handler goes through here; results come back via root.after
+db_executor = QueryExecutor(root, on_pending=lambda labels: show_pending(labels))
+
+def show_pending(labels):
+    """Status line while queries are in flight, e.g. "Saving product..."."""
+    if catalog_loading:
+        return  # the warm-up owns the status line
+    status_label.config(text=f"{labels[-1]}..." if labels else catalog_status())
+
 # ---------------- Product Management ----------------
-product_names = []  # cached name_en list for suggestions
+catalog = ProductCatalog()  # cached products used by suggestions, product_tree and bills
+
+SEARCH_DEBOUNCE_MS = 120   # coalesce keystrokes typed faster than this
+SUGGESTION_LIMIT = 100     # max rows rendered in suggestion_box
+PRODUCT_TREE_PAGE = 500    # matches ranked per keystroke; product_tree asks for the rest when scrolled past
+
+CATALOG_CHUNK = 2000       # rows per chunk while the catalog streams in at startup
+CATALOG_PUMP_MS = 15       # how often the Tk thread looks for the next chunk
+OFFLINE_RETRY_MS = 15000   # how often an offline terminal tries MySQL again
+catalog_loading = False    # True while start_catalog_warmup is streaming
+
+# from this many products on, nothing is cached: suggestions and product_tree page through
+# db.search_products and bills look products up by their indexed name_key / barcode
+SERVER_SEARCH_ROWS = int(os.environ.get("POS_SERVER_SEARCH_ROWS") or 500_000)
+server_search = False      # True once attach_database found a catalog that big
+
+# local copy of the catalog for cold starts and offline billing
+CATALOG_SNAPSHOT_PATH = os.environ.get("POS_CATALOG_SNAPSHOT",
+                                       os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.db"))
+catalog_snapshot = CatalogSnapshot(CATALOG_SNAPSHOT_PATH, f"{DB_CONFIG['host']}/{DB_CONFIG['database']}")
+
+# "host:port" of the shop's catalog service (catalog_service.py), if it runs one: the catalog,
+# lookups and product changes then come from it, and MySQL only sees this terminal's writes
+CATALOG_SERVICE = os.environ.get("POS_CATALOG_SERVICE", "")
+SERVICE_SYNC_MS = 250      # pushed changes are applied this often; checking for them is free
+catalog_client = CatalogClient.from_address(CATALOG_SERVICE) if CATALOG_SERVICE else None
+
+def catalog_read(name):
+    """A worker-side catalog read (a Database method name) from the catalog service,
+    or from MySQL while there is none or it is unreachable."""
+    def read(*args):
+        if catalog_client is not None:
+            try:
+                return getattr(catalog_client, name)(*args)
+            except OSError:
+                if db is None:
+                    raise
+        return getattr(db, name)(*args)
+    return read
 
 def fetch_products():
-    """Fetch products from DB and refresh product_tree and cached names."""
-    cursor.execute("SELECT id, name_en, name_hi, price FROM products ORDER BY name_en ASC")
-    rows = cursor.fetchall()
-    product_tree.delete(*product_tree.get_children())
-    for row in rows:
-        product_tree.insert("", tk.END, values=row)
-    # update cache used by suggestions
-    global product_names
-    product_names = [r[1] for r in rows]
+    """Reload the cached catalog from the DB in the background, then refresh product_tree."""
+    def load():
+        if catalog_client is not None:
+            try:
+                return catalog_client.catalog()
+            except OSError:
+                pass
+        version = db.feed_version()  # read first: anything written during the fetch is pulled again
+        return version, db.fetch_catalog()
+
+    def loaded(result):
+        version, rows = result
+        catalog.load(rows)
+        catalog_snapshot.replace(version, list(catalog.rows))
+        catalog_sync.start(version)
+        refresh_search_results()
+
+    def failed(error):
+        if resume_version is not None:
+            catalog_sync.start(resume_version)
+        messagebox.showerror("DB Error", str(error))
+
+    resume_version = catalog_sync.version
+    catalog_sync.pause()
+    return db_executor.submit(load, label="Reloading products", tag="fetch_products",
+                              on_done=loaded, on_error=failed, timeout=CATALOG_RELOAD_TIMEOUT)
+
+def catalog_status():
+    return "Products are searched on the server" if server_search else f"{len(catalog):,} products"
 
 def init_suggestions():
-    """Initialize suggestion_box from the cached product_names."""
-    suggestion_box.delete(0, tk.END)
-    for name in product_names:
-        suggestion_box.insert(tk.END, name)
+    """Initialize suggestion_box from the cached catalog names."""
+    suggestion_sync.update(catalog.names[:SUGGESTION_LIMIT])
+
+def start_catalog_warmup():
+    """Fill the catalog on a worker thread while the window is already usable.
+
+    The local snapshot streams in first, so search and billing work at once;
+    then MySQL is attached and the change feed brings the snapshot up to
+    date. Only without a usable snapshot is the whole catalog fetched. The
+    worker only reads; the Tk thread folds one chunk per tick into the
+    catalog (pump_catalog), so product_tree and suggestion_box fill progressively.
+    """
+    global catalog_loading
+    chunks = queue.Queue()
+    catalog_sync.pause()  # restarted from the catalog's version once it is done
+    catalog.load([])
+    catalog_loading = True
+
+    def load():
+        version = None
+        try:
+            version = catalog_snapshot.version()
+            if version is not None:
+                for rows in catalog_snapshot.iter_rows(CATALOG_CHUNK):
+                    chunks.put(("rows", rows))
+                chunks.put(("snapshot", version))
+        except Exception as e:
+            log.warning("Catalog snapshot unreadable: %s", e)
+            if version is not None:
+                chunks.put(("reset", None))
+            version = None
+        attach_database(chunks, version)
+
+    threading.Thread(target=load, name="catalog-warmup", daemon=True).start()
+    root.after(CATALOG_PUMP_MS, pump_catalog, chunks)
+
+def attach_database(chunks, version):
+    """Worker: connect and upgrade the schema; catch a catalog at feed version up,
+    or stream it whole when version is None (unless it is too big to cache)."""
+    database = Database(DB_CONFIG)  # connects on first use: not at all while the catalog service answers
+    try:
+        if catalog_client is not None and attach_service(chunks, database, version):
+            return
+        migrate(database)
+        prune_feed(database)
+        live = database.feed_version()
+        chunks.put(("db", database))
+        if database.estimated_rows() >= SERVER_SEARCH_ROWS:
+            chunks.put(("server", live))
+            return
+        if version is not None and version <= live:
+            chunks.put(("done", (version, False)))  # the first sync pulls what changed since
+            return
+        if version is not None:
+            chunks.put(("reset", None))  # feed restarted (restored or new database)
+            version = None
+        for rows in database.iter_catalog(CATALOG_CHUNK):
+            chunks.put(("rows", rows))
+        chunks.put(("done", (live, True)))
+    except Exception as e:
+        chunks.put(("offline", (version, e)) if version is not None else ("error", e))
+    finally:
+        database.release()  # this worker thread is done with its connection, whichever way it ended
+
+def prune_feed(database):
+    """Worker: delete old tombstones; a terminal without the rights leaves it to the others."""
+    try:
+        database.prune_feed()
+    except mysql.connector.Error as e:
+        log.warning("Old tombstones not pruned: %s", e)
+
+def attach_service(chunks, database, version):
+    """Worker: like attach_database, with the catalog read from the catalog service
+    (which has migrated the schema). False if it cannot be reached."""
+    try:
+        live, rows = catalog_client.feed_version(), None
+        if version is None or version > live:
+            live, rows = catalog_client.catalog()
+    except OSError as e:
+        log.warning("Catalog service unreachable, reading the catalog from MySQL: %s", e)
+        return False
+    chunks.put(("db", database))
+    if rows is None:
+        chunks.put(("done", (version, False)))
+        return True
+    if version is not None:
+        chunks.put(("reset", None))
+    for i in range(0, len(rows), CATALOG_CHUNK):
+        chunks.put(("rows", rows[i:i + CATALOG_CHUNK]))
+    chunks.put(("done", (live, True)))
+    return True
+
+def pump_catalog(chunks):
+    global db, catalog_loading, offline, server_search
+    try:
+        kind, payload = chunks.get_nowait()
+    except queue.Empty:
+        root.after(CATALOG_PUMP_MS, pump_catalog, chunks)
+        return
+    if kind == "db":
+        db = payload
+    elif kind == "rows":
+        catalog.extend(payload)
+        refresh_search_results()
+        status_label.config(text=f"Loading products... {len(catalog):,}")
+    elif kind == "reset":
+        catalog.load([])
+        refresh_search_results()
+    elif kind == "snapshot":
+        refresh_quick_keys()
+        status_label.config(text=f"{len(catalog):,} products (local copy, connecting...)")
+        metrics.observe("startup.local_catalog", (time.perf_counter() - STARTED_AT) * 1000)
+    elif kind == "server":
+        catalog_loading = offline = False
+        server_search = True
+        catalog.load([])
+        catalog_snapshot.clear()  # a local copy of this catalog would not fit in memory either
+        refresh_search_results()
+        refresh_quick_keys()
+        status_label.config(text=catalog_status())
+        metrics.observe("startup.server_search", (time.perf_counter() - STARTED_AT) * 1000)
+        return
+    elif kind == "done":
+        version, full = payload
+        catalog_loading = offline = server_search = False
+        if full:
+            catalog_snapshot.replace(version, list(catalog.rows))
+        catalog_sync.start(version)
+        if not full:
+            catalog_sync.now()  # bring the local copy up to date right away
+        refresh_search_results()
+        refresh_quick_keys()
+        status_label.config(text=f"{len(catalog):,} products")
+        metrics.observe("startup.catalog", (time.perf_counter() - STARTED_AT) * 1000)
+        return
+    elif kind == "offline":
+        version, error = payload
+        if not offline:  # once, not on every retry
+            log.warning("Offline, billing from the local catalog: %s", error)
+            messagebox.showwarning("DB Connection Error", f"{error}\n\nBilling goes on from the local product "
+                                   "list; products cannot be added or changed until the database is back.")
+        catalog_loading, offline = False, True
+        status_label.config(text=f"{len(catalog):,} products - OFFLINE, product list is read-only")
+        root.after(OFFLINE_RETRY_MS, retry_database, version)
+        return
+    elif kind == "error":
+        catalog_loading = False
+        messagebox.showerror("DB Connection Error", str(payload))
+        root.destroy()
+        return
+    root.after(1, pump_catalog, chunks)
+
+def retry_database(version):
+    """Offline: try MySQL again in the background; billing goes on meanwhile."""
+    chunks = queue.Queue()
+    threading.Thread(target=attach_database, args=(chunks, version), name="db-reconnect", daemon=True).start()
+    root.after(CATALOG_PUMP_MS, pump_catalog, chunks)
+
+def apply_catalog_changes(changes):
+    """Patch the cached catalog and the visible rows with products changed on any terminal."""
+    version, rows, deleted = changes
+    if rows or deleted:
+        catalog.patch(rows, deleted)
+        refresh_search_results()  # suggestion_box / product_tree only touch the changed lines
+    catalog_snapshot.patch(version, rows, deleted)
+    status_label.config(text=catalog_status())
+
+def report_sync_error(error):
+    if isinstance(error, FeedExpired):  # behind the pruned tombstones: deletions would be missed
+        status_label.config(text=f"{len(catalog):,} products (reloading)")
+        return fetch_products()
+    status_label.config(text=f"{len(catalog):,} products (sync failed, retrying)")
+
+mysql_pull_after = 0.0  # monotonic time; while the catalog service is away MySQL is polled at the usual rate
+
+def pull_changes(version):
+    """Worker: what changed since version, as pushed by the catalog service, else from the feed."""
+    global mysql_pull_after
+    if catalog_client is not None:
+        try:
+            return catalog_client.changes_since(version)
+        except OSError:
+            if time.monotonic() < mysql_pull_after:
+                return version, [], []
+            mysql_pull_after = time.monotonic() + SYNC_INTERVAL_MS / 1000
+    return db.changes_since(version)
+
+# pulls rows changed since the last sync on a worker; started once the catalog is loaded
+catalog_sync = CatalogSync(root, pull_changes, apply_catalog_changes, on_error=report_sync_error,
+                           interval_ms=SERVICE_SYNC_MS if catalog_client is not None else SYNC_INTERVAL_MS)
+
+def catalog_written():
+    """This terminal changed products: sync now (the catalog service reads the feed at once too)."""
+    if catalog_client is not None:
+        db_executor.submit(catalog_client.poll_now, tag="service_poll")
+    catalog_sync.now()
+
+def report_startup():
+    """Runs on the first event-loop tick: from here on keystrokes are handled."""
+    metrics.observe("startup.window", (time.perf_counter() - STARTED_AT) * 1000)
+
+def report_product_error(error):
+    if isinstance(error, mysql.connector.IntegrityError):
+        messagebox.showerror("Error", "Product name and barcode must be unique")
+    elif isinstance(error, QueryTimeout):
+        messagebox.showerror("Error", "The database has not answered yet. "
+                                      "If the change goes through, the product list will show it.")
+    else:
+        messagebox.showerror("DB Error", str(error))
+
+def product_saved(result=None):
+    catalog_written()  # other terminals pick the change up on their next sync
+    if server_search:
+        refresh_search_results()
+    clear_inputs()
 
 def add_product():
+    if not db_ready():
+        return
     name_en, name_hi = name_en_entry.get().strip(), name_hi_entry.get().strip()
     try:
         price = float(price_entry.get())
@@ -60,22 +370,20 @@ def add_product():
         return messagebox.showerror("Error", "Price must be a number")
     if not (name_en and name_hi):
         return messagebox.showerror("Error", "Fill all fields")
-    try:
-        cursor.execute("INSERT INTO products (name_en, name_hi, price) VALUES (%s,%s,%s)",
-                       (name_en, name_hi, price))
-        conn.commit()
-        fetch_products()
-        init_suggestions()
-        clear_inputs()
-    except mysql.connector.IntegrityError:
-        messagebox.showerror("Error", "Product must be unique")
+    barcode = normalize_barcode(barcode_entry.get())
+    if len(barcode) > BARCODE_MAX:
+        return messagebox.showerror("Error", f"Barcode can have at most {BARCODE_MAX} characters")
+    db_executor.submit(db.execute, "INSERT INTO products (name_en, name_hi, price, barcode) VALUES (%s,%s,%s,%s)",
+                       (name_en, name_hi, price, barcode or None), label="Adding product",
+                       on_done=product_saved, on_error=report_product_error)
 
 def update_product():
-    selected = product_tree.selection()
+    if not db_ready():
+        return
+    selected = product_view.selected_row()
     if not selected:
         return messagebox.showerror("Error", "Select a product to update")
-    item = product_tree.item(selected[0])
-    product_id = item['values'][0]
+    product_id = selected[0]
     name_en, name_hi = name_en_entry.get().strip(), name_hi_entry.get().strip()
     try:
         price = float(price_entry.get())
@@ -83,43 +391,151 @@ def update_product():
         return messagebox.showerror("Error", "Price must be a number")
     if not (name_en and name_hi):
         return messagebox.showerror("Error", "Fill all fields")
-    try:
-        cursor.execute("UPDATE products SET name_en=%s, name_hi=%s, price=%s WHERE id=%s",
-                       (name_en, name_hi, price, product_id))
-        conn.commit()
-        fetch_products()
-        init_suggestions()
-        clear_inputs()
-    except mysql.connector.IntegrityError:
-        messagebox.showerror("Error", "Product must be unique")
+    barcode = normalize_barcode(barcode_entry.get())
+    if len(barcode) > BARCODE_MAX:
+        return messagebox.showerror("Error", f"Barcode can have at most {BARCODE_MAX} characters")
+    db_executor.submit(db.execute, "UPDATE products SET name_en=%s, name_hi=%s, price=%s, barcode=%s WHERE id=%s",
+                       (name_en, name_hi, price, barcode or None, product_id), label="Saving product",
+                       tag=("product", product_id), on_done=product_saved, on_error=report_product_error)
 
 def delete_product():
-    selected = product_tree.selection()
+    if not db_ready():
+        return
+    selected = product_view.selected_row()
     if not selected:
         return messagebox.showerror("Error", "Select a product to delete")
-    item = product_tree.item(selected[0])
-    product_id = item['values'][0]
+    product_id = selected[0]
     if messagebox.askyesno("Confirm Delete", "Are you sure?"):
-        cursor.execute("DELETE FROM products WHERE id=%s", (product_id,))
-        conn.commit()
-        fetch_products()
-        init_suggestions()
-        clear_inputs()
+        db_executor.submit(db.execute, "DELETE FROM products WHERE id=%s", (product_id,),
+                           label="Deleting product", tag=("product", product_id),
+                           on_done=product_saved, on_error=report_product_error)
 
 def clear_inputs():
-    for e in [name_en_entry, name_hi_entry, price_entry]:
+    for e in [name_en_entry, name_hi_entry, price_entry, barcode_entry]:
         e.delete(0, tk.END)
 
 def select_product(event):
-    sel = product_tree.selection()
-    if sel:
-        item = product_tree.item(sel[0])
+    row = product_view.selected_row()
+    if row:
         name_en_entry.delete(0, tk.END)
         name_hi_entry.delete(0, tk.END)
         price_entry.delete(0, tk.END)
-        name_en_entry.insert(0, item['values'][1])
-        name_hi_entry.insert(0, item['values'][2])
-        price_entry.insert(0, item['values'][3])
+        barcode_entry.delete(0, tk.END)
+        name_en_entry.insert(0, row[1])
+        name_hi_entry.insert(0, row[2])
+        price_entry.insert(0, row[3])
+        barcode_entry.insert(0, row[4])
+
+# ---------------- Bulk Import / Export ----------------
+PRICE_LIST_TYPES = [("Price lists", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")]
+PROGRESS_POLL_MS = 50
+IMPORT_ERRORS_SHOWN = 15   # skipped lines listed in the import summary
+
+def run_with_progress(title, work, on_done):
+    """Run work(progress) on a worker thread behind a progress bar.
+
+    The worker may call progress(done, total) as often as it likes; the Tk
+    thread shows the latest value. on_done(result, error) runs on the Tk
+    thread when work returns or raises.
+    """
+    win = tk.Toplevel(root)
+    win.title(title)
+    label = tk.Label(win, text=f"{title}...", font=global_font)
+    label.pack(padx=20, pady=(15, 5))
+    bar = ttk.Progressbar(win, length=360, mode="determinate")
+    bar.pack(padx=20, pady=(0, 15))
+    updates = queue.Queue()
+
+    def worker():
+        try:
+            result = work(lambda done, total: updates.put(("progress", (done, total))))
+            updates.put(("done", (result, None)))
+        except Exception as e:
+            updates.put(("done", (None, e)))
+
+    def pump():
+        latest = None
+        try:
+            while True:
+                kind, payload = updates.get_nowait()
+                if kind == "done":
+                    win.destroy()
+                    on_done(*payload)
+                    return
+                latest = payload
+        except queue.Empty:
+            pass
+        if latest:
+            done, total = latest
+            bar.config(maximum=max(total, 1), value=done)
+            label.config(text=f"{title}... {done:,} / {total:,}")
+        root.after(PROGRESS_POLL_MS, pump)
+
+    threading.Thread(target=worker, name=title.lower(), daemon=True).start()
+    root.after(PROGRESS_POLL_MS, pump)
+
+def import_products():
+    """Upsert a CSV/XLSX price list (name_en, name_hi, price[, barcode]) in one transaction."""
+    if not db_ready():
+        return
+    path = filedialog.askopenfilename(title="Import price list", filetypes=PRICE_LIST_TYPES)
+    if not path:
+        return
+    known = None if server_search else set(catalog.by_name)  # snapshot for the new/updated count
+
+    def work(progress):
+        products, errors = read_price_list(path)
+        try:
+            upsert_products(db, products, progress)
+        finally:
+            db.release()  # this worker thread is done with its connection
+        added = None if known is None else sum(normalize_name(p[0]) not in known for p in products)
+        return len(products), added, errors
+
+    def done(result, error):
+        if error:
+            return messagebox.showerror("Import Error", str(error))
+        count, added, errors = result
+        catalog_written()  # the whole import reaches the catalog in one sync
+        if server_search:
+            refresh_search_results()
+        msg = f"{count:,} products imported" + (
+            "." if added is None else f" ({added:,} new, {count - added:,} updated).")
+        if errors:
+            msg += f"\n\n{len(errors):,} line(s) skipped:\n" + "\n".join(
+                f"Line {line}: {problem}" for line, problem in errors[:IMPORT_ERRORS_SHOWN])
+            return messagebox.showwarning("Import", msg)
+        messagebox.showinfo("Import", msg)
+
+    run_with_progress("Importing", work, done)
+
+def export_products():
+    """Write the catalog as a CSV/XLSX price list that import_products reads back."""
+    path = filedialog.asksaveasfilename(title="Export price list", defaultextension=".csv",
+                                        filetypes=PRICE_LIST_TYPES)
+    if not path:
+        return
+    if server_search:
+        if not db_ready():
+            return
+
+        def work(progress):
+            try:
+                total = db.query_one("SELECT COUNT(*) FROM products")[0]
+                rows = (row for chunk in db.iter_catalog(CATALOG_CHUNK) for row in chunk)
+                return write_price_list(path, rows, progress, total)
+            finally:
+                db.release()
+    else:
+        rows = list(catalog.rows)  # snapshot; the catalog is only touched on the Tk thread
+        work = lambda progress: write_price_list(path, rows, progress)
+
+    def done(count, error):
+        if error:
+            return messagebox.showerror("Export Error", str(error))
+        messagebox.showinfo("Export", f"{count:,} products exported.")
+
+    run_with_progress("Exporting", work, done)
 
 # ---------------- Product Management UI ----------------
 pm_frame = tk.Frame(root)
@@ -129,32 +545,54 @@ tk.Label(pm_frame, text="Product Management", font=("Arial",18)).grid(row=0, col
 tk.Label(pm_frame, text="Name (English)", font=global_font).grid(row=1, column=0, pady=5)
 tk.Label(pm_frame, text="Name (Hindi)", font=global_font).grid(row=2, column=0, pady=5)
 tk.Label(pm_frame, text="Price", font=global_font).grid(row=3, column=0, pady=5)
+tk.Label(pm_frame, text="Barcode", font=global_font).grid(row=4, column=0, pady=5)
 
 name_en_entry = tk.Entry(pm_frame, font=global_font)
 name_hi_entry = tk.Entry(pm_frame, font=global_font)
 price_entry = tk.Entry(pm_frame, font=global_font)
+barcode_entry = tk.Entry(pm_frame, font=global_font)  # optional; scan straight into it
 name_en_entry.grid(row=1, column=1)
 name_hi_entry.grid(row=2, column=1)
 price_entry.grid(row=3, column=1)
+barcode_entry.grid(row=4, column=1)
 
-tk.Button(pm_frame, text="Add", font=global_font, width=12, command=add_product).grid(row=4, column=0, pady=5)
-tk.Button(pm_frame, text="Update", font=global_font, width=12, command=update_product).grid(row=4, column=1, pady=5)
-tk.Button(pm_frame, text="Delete", font=global_font, width=12, command=delete_product).grid(row=5, column=0, pady=5)
-tk.Button(pm_frame, text="Clear", font=global_font, width=12, command=clear_inputs).grid(row=5, column=1, pady=5)
+tk.Button(pm_frame, text="Add", font=global_font, width=12, command=add_product).grid(row=5, column=0, pady=5)
+tk.Button(pm_frame, text="Update", font=global_font, width=12, command=update_product).grid(row=5, column=1, pady=5)
+tk.Button(pm_frame, text="Delete", font=global_font, width=12, command=delete_product).grid(row=6, column=0, pady=5)
+tk.Button(pm_frame, text="Clear", font=global_font, width=12, command=clear_inputs).grid(row=6, column=1, pady=5)
+tk.Button(pm_frame, text="Import", font=global_font, width=12, command=import_products).grid(row=10, column=0, pady=5)
+tk.Button(pm_frame, text="Export", font=global_font, width=12, command=export_products).grid(row=10, column=1, pady=5)
 
 # Suggestion box (shared)
 suggestion_box = tk.Listbox(pm_frame, font=global_font, height=26, width=34)
-suggestion_box.grid(row=6, column=0, columnspan=2, pady=5)
+suggestion_box.grid(row=7, column=0, columnspan=2, pady=5)
+suggestion_sync = ListboxSync(suggestion_box)
+status_label = tk.Label(pm_frame, text="Loading products...", font=global_font, anchor="w")
+status_label.grid(row=8, column=0, columnspan=2, sticky="w")
 
 # Treeview for products (top)
 heading_font = font.Font(family="Arial", size=12, weight="bold")
 style.configure("Treeview.Heading", font=heading_font)
 
-product_tree = ttk.Treeview(root, columns=("ID","Name_EN", "Name_HI", "Price"), show="headings", height=6)
-for col, text in zip(("ID","Name_EN", "Name_HI", "Price"), ("ID","Name (English)", "Name (Hindi)", "Price")):
+product_frame = tk.Frame(root)
+product_frame.pack(side=tk.TOP, fill=tk.X, padx=30, pady=8)
+product_tree = ttk.Treeview(product_frame, columns=("ID","Name_EN", "Name_HI", "Price", "Barcode"), show="headings",
+                            height=6, selectmode="browse")
+for col, text in zip(("ID","Name_EN", "Name_HI", "Price", "Barcode"),
+                     ("ID","Name (English)", "Name (Hindi)", "Price", "Barcode")):
     product_tree.heading(col, text=text)
-product_tree.pack(side=tk.TOP, fill=tk.X, padx=30, pady=8)
+product_scroll = ttk.Scrollbar(product_frame, orient=tk.VERTICAL)
+product_tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+product_scroll.pack(side=tk.RIGHT, fill=tk.Y)
 product_tree.bind("<ButtonRelease-1>", select_product)
+# only the visible rows exist as Tk items, however many products match
+product_view = VirtualTree(product_tree, product_scroll, sort_keys={
+    "ID": lambda row: row[0],
+    "Name_EN": lambda row: normalize_name(row[1]),
+    "Name_HI": lambda row: row[2],
+    "Price": lambda row: float(row[3]),
+    "Barcode": lambda row: row[4],
+})
 
 # ---------------- Common Helpers ----------------
 def format_qty_display(qty):
@@ -177,8 +615,9 @@ def format_price(p):
 # ---------------- Inline Editing (per-tree) ----------------
 editing_entry = None
 
-def start_edit_cell(tree, bill_items, item, col_index):
+def start_edit_cell(bill, item, col_index):
     global editing_entry
+    tree = bill["tree"]
     try:
         if editing_entry:
             editing_entry.destroy()
@@ -208,19 +647,21 @@ def start_edit_cell(tree, bill_items, item, col_index):
             if col_index == 1:  # Qty
                 val = float(new_val)
                 new_qty = int(val) if float(val).is_integer() else round(val, 2)
-                bill_items[pid][2] = max(0.01, new_qty)
+                bill["model"].set_qty(pid, max(0.01, new_qty))
+                bill_journal.log(bill["title"], "qty", pid=pid, qty=bill["model"].line(pid).qty)
             elif col_index == 2:  # Price
                 new_price = round(float(new_val), 2)
-                bill_items[pid][1] = max(0.0, new_price)
+                bill["model"].set_price(pid, max(0.0, new_price))
+                bill_journal.log(bill["title"], "price", pid=pid, price=bill["model"].line(pid).price)
+            refresh_bill_line(bill, pid)
         except Exception:
             pass
         try:
             entry.destroy()
         except:
             pass
-        refresh_bill_for_tree(tree, bill_items)
         if col_index == 1:
-            root.after(50, lambda: start_edit_cell(tree, bill_items, item, 2))
+            root.after(50, lambda: start_edit_cell(bill, item, 2))
         else:
             root.after(40, focus_active_product_entry)
 
@@ -228,7 +669,8 @@ def start_edit_cell(tree, bill_items, item, col_index):
     entry.bind("<Escape>", lambda e: entry.destroy())
     editing_entry = entry
 
-def on_tree_double_click_factory(tree, bill_items):
+def on_tree_double_click_factory(bill):
+    tree = bill["tree"]
     def handler(event):
         region = tree.identify("region", event.x, event.y)
         if region != "cell":
@@ -239,7 +681,7 @@ def on_tree_double_click_factory(tree, bill_items):
             return
         col_num = int(col.replace("#", "")) - 1
         if col_num in (1,2):  # Qty or Price
-            start_edit_cell(tree, bill_items, item, col_num)
+            start_edit_cell(bill, item, col_num)
     return handler
 
 # ---------------- Bill Panel Creator ----------------
@@ -284,6 +726,7 @@ def create_bill_panel(parent, title):
     btn_row.pack(pady=(0, 10))
 
     return {
+        "title": title,
         "frame": frame,
         "cust_entry": cust_entry,
         "entry": entry,
@@ -292,7 +735,7 @@ def create_bill_panel(parent, title):
         "items_label": items_label,
         "clear_btn": clear_btn,
         "print_btn": print_btn,
-        "items": {}
+        "model": BillModel()  # the bill itself; this panel only renders it
     }
 
 # ---------------- Both Bills ----------------
@@ -305,26 +748,42 @@ right_bill = create_bill_panel(billing_container, "Right Bill")
 left_bill["frame"].pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
 right_bill["frame"].pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
 
-# ---------------- Refresh helper ----------------
-def refresh_bill_for_tree(tree, bill_items):
+# ---------------- Refresh helpers ----------------
+def bill_line_values(bill, pid):
+    line = bill["model"].line(pid)
+    return (line.name_hi, format_qty_display(line.qty), format_price(line.price), f"{line.total:,}")
+
+def refresh_bill_labels(bill):
+    bill["items_label"].config(text=f"Items: {bill['model'].count}")
+    bill["total_label"].config(text=f"Grand Total: {bill['model'].total:,}")
+
+@metrics.timed("refresh_bill_line")
+def refresh_bill_line(bill, pid, scroll=False):
+    """Repaint only the row of pid (insert, update or delete) and the two labels."""
+    tree, iid = bill["tree"], str(pid)
+    if pid in bill["model"]:
+        values = bill_line_values(bill, pid)
+        if tree.exists(iid):
+            tree.item(iid, values=values)
+        else:
+            tree.insert("", tk.END, iid=iid, values=values)
+        if scroll:
+            try:
+                tree.see(iid)
+            except:
+                pass
+    elif tree.exists(iid):
+        tree.delete(iid)
+    refresh_bill_labels(bill)
+
+@metrics.timed("refresh_bill_for_tree")
+def refresh_bill_for_tree(bill):
+    """Full rebuild of a bill tree from its model; only clear_bill needs this."""
+    tree = bill["tree"]
     tree.delete(*tree.get_children())
-    total = 0.0
-    for pid, item in bill_items.items():
-        name_hi, price, qty = item
-        line_total = math.ceil(price * qty)
-        total += line_total
-        tree.insert("", tk.END, iid=str(pid), values=(name_hi, format_qty_display(qty), format_price(price), f"{line_total:,}"))
-    for b in (left_bill, right_bill):
-        if b["tree"] is tree:
-            b["items_label"].config(text=f"Items: {len(bill_items)}")
-            b["total_label"].config(text=f"Grand Total: {int(round(total)):,}")
-            if bill_items:
-                last_item = list(bill_items.keys())[-1]
-                try:
-                    tree.see(str(last_item))
-                except:
-                    pass
-            break
+    for pid in bill["model"].lines:
+        tree.insert("", tk.END, iid=str(pid), values=bill_line_values(bill, pid))
+    refresh_bill_labels(bill)
 
 # ---------------- Suggestion & search ----------------
 active_bill = None  # will hold reference to left_bill or right_bill depending on where user last focused
@@ -344,6 +803,10 @@ def focus_active_product_entry():
     except:
         pass
 
+search_debounce = Debouncer(root, SEARCH_DEBOUNCE_MS)
+scan_detector = BurstDetector()  # barcode scanners type a whole code within a few ms
+
+@metrics.timed("update_suggestions_for_widget")
 def update_suggestions_for_widget(event):
     # Ignore navigation keys for normal typing
     if event.keysym in ("Up", "Down", "Return"):
@@ -351,37 +814,74 @@ def update_suggestions_for_widget(event):
 
     widget = event.widget
     set_active_bill_by_widget(widget)
+    if scan_detector.active(widget):
+        # a scanner is typing: no search for its digits, the Return adds the product
+        return search_debounce.cancel()
+    # a burst of keystrokes collapses into one search on the last typed text
+    search_debounce(run_search, widget.get())
+
+@metrics.timed("run_search")
+def run_search(gen, text):
+    """Debounced body of update_suggestions_for_widget."""
+    typed = text.strip().lower()
+    if server_search:
+        return search_on_server(gen, typed)
+    # ranked matches (all products when entry is empty), served from the cached catalog
+    filtered = catalog.search(typed, max(SUGGESTION_LIMIT, PRODUCT_TREE_PAGE), popularity.hot())
+    if not search_debounce.is_current(gen):
+        return  # a newer keystroke superseded this search
+
+    # --- Populate suggestion box / product management TreeView (changed rows only) ---
+    suggestion_sync.update(row[1] for row in filtered[:SUGGESTION_LIMIT])
+    more = (lambda: catalog.search(typed, boost=popularity.hot())) if len(filtered) >= PRODUCT_TREE_PAGE else None
+    product_view.set_rows(filtered, more=more, source=typed)
+
+def search_on_server(gen, typed):
+    """run_search for a catalog too big to cache: one keyset page per query.
+
+    A newer search supersedes the one in flight (tag), and product_tree asks
+    for the next page only when scrolled to the end of what it has.
+    """
+    if db is None:
+        return
+    db_executor.cancel("search_page")
 
-    typed = widget.get().strip().lower()
-    suggestion_box.delete(0, tk.END)
+    def next_page(cursor):
+        if cursor is None:
+            return None
+        return lambda: db_executor.submit(db.search_products, typed, PRODUCT_TREE_PAGE, cursor,
+                                          tag="search_page", on_done=page_loaded, on_error=report_search_error)
 
-    # --- Populate suggestion box ---
-    if typed == "":
-        # show all product names if entry is empty
-        for name in product_names:
-            suggestion_box.insert(tk.END, name)
-    else:
-        for name in product_names:
-            if typed in name.lower():
-                suggestion_box.insert(tk.END, name)
+    def page_loaded(result):
+        rows, cursor = result
+        product_view.extend(rows, more=next_page(cursor))
 
-    # --- Update product management TreeView ---
-    cursor.execute("SELECT id, name_en, name_hi, price FROM products ORDER BY name_en ASC")
-    all_rows = cursor.fetchall()
-    product_tree.delete(*product_tree.get_children())
+    def first_page(result):
+        if not search_debounce.is_current(gen):
+            return  # a newer keystroke superseded this search
+        rows, cursor = result
+        suggestion_sync.update(row[1] for row in rows[:SUGGESTION_LIMIT])
+        product_view.set_rows(rows, more=next_page(cursor), source=typed, paged=True)
 
-    if typed == "":
-        filtered = all_rows  # show all products when entry is empty
-    else:
-        filtered = [row for row in all_rows if typed in row[1].lower()]
+    db_executor.submit(db.search_products, typed, max(SUGGESTION_LIMIT, PRODUCT_TREE_PAGE),
+                       tag="search", on_done=first_page, on_error=report_search_error)
 
-    for row in filtered:
-        product_tree.insert("", tk.END, values=row)
+def report_search_error(error):
+    status_label.config(text=f"Search failed: {error}")
+
+def refresh_search_results():
+    """Re-run the current search, e.g. after the catalog changed underneath it."""
+    entry = (active_bill or left_bill)["entry"]
+    run_search(search_debounce.generation, entry.get())
 
 # Entry nav: Up/Down to move selection; Return to add directly
 def on_entry_key_nav(event):
     widget = event.widget
     set_active_bill_by_widget(widget)
+    if scan_detector.key(event):
+        return
+    if event.keysym in ("Down", "Up", "Return"):
+        search_debounce.flush()  # navigate the results of what was actually typed
     size = suggestion_box.size()
     if event.keysym in ("Down", "Up"):
         if size == 0:
@@ -499,34 +999,58 @@ suggestion_box.bind("<Key>", suggestion_box_key)
 suggestion_box.bind("<ButtonRelease-1>", suggestion_click_select)
 
 # ---------------- Add / Clear / Delete for bills ----------------
+@metrics.timed("add_to_bill")
 def add_to_bill(event=None, bill=None):
     if bill is None:
         return
     name_en = bill["entry"].get().strip()
     if not name_en:
         return
-    cursor.execute("SELECT id, name_hi, price FROM products WHERE LOWER(name_en)=LOWER(%s)", (name_en.lower(),))
-    product = cursor.fetchone()
-    if not product:
-        messagebox.showerror("Error", "Product not found")
-        bill["entry"].delete(0, tk.END)
-        bill["entry"].focus()
-        return
-    product_id, name_hi, price = product
-    price = float(price)
-    if product_id in bill["items"]:
-        current = bill["items"][product_id][2]
-        bill["items"][product_id][2] = int(current + 1) if isinstance(current, int) else round(current + 1, 2)
-    else:
-        bill["items"][product_id] = [name_hi, price, 1]
-    refresh_bill_for_tree(bill["tree"], bill["items"])
+    # a scan adds one unit and leaves the entry ready for the next scan (no qty editor)
+    scanned = event is not None and scan_detector.scanned(event)
+    if scanned:
+        search_debounce.cancel()
+    # cached catalog first (a barcode, else the English name); a product added on another
+    # terminal moments ago is asked of the DB in the background (a newer Enter on the
+    # same bill supersedes the lookup)
+    product = catalog.lookup_barcode(name_en) or catalog.lookup(name_en)
+    if product:
+        return add_product_to_bill(bill, product, edit_qty=not scanned)
+    if db is None and catalog_client is None:
+        return product_not_found(bill)
+    by_barcode, by_name = catalog_read("product_by_barcode"), catalog_read("product_by_name")
+    code = normalize_barcode(name_en)
+
+    def lookup():
+        # like the cached path: a barcode typed by hand resolves too, not just a scan
+        return (by_barcode(code) if code else None) or by_name(name_en)
+
+    db_executor.submit(lookup,
+                       label="Looking up product", tag=("lookup", bill["title"]),
+                       on_done=lambda row: add_product_to_bill(bill, row, edit_qty=not scanned) if row
+                       else product_not_found(bill),
+                       on_error=lambda error: messagebox.showerror("DB Error", str(error)))
+
+def product_not_found(bill):
+    messagebox.showerror("Error", "Product not found")
+    bill["entry"].delete(0, tk.END)
+    bill["entry"].focus()
+
+def add_product_to_bill(bill, product, edit_qty=True):
+    product_id, name_hi, price = product[0], product[2], product[3]
+    bill["model"].add(product_id, name_hi, price)
+    popularity.bump(product_id)
+    bill_journal.log(bill["title"], "add", pid=product_id, name_hi=name_hi, price=float(price))
+    refresh_bill_line(bill, product_id, scroll=True)
     bill["entry"].delete(0, tk.END)
     # focus qty edit for same bill
-    root.after(60, lambda b=bill, pid=product_id: start_edit_cell(b["tree"], b["items"], str(pid), 1))
+    if edit_qty:
+        root.after(60, lambda b=bill, pid=product_id: start_edit_cell(b, str(pid), 1))
 
 def clear_bill(bill):
-    bill["items"].clear()
-    refresh_bill_for_tree(bill["tree"], bill["items"])
+    bill["model"].clear()
+    bill_journal.log(bill["title"], "clear")
+    refresh_bill_for_tree(bill)
     bill["entry"].focus()
 
 def delete_selected_bill_item(event=None, bill=None):
@@ -535,19 +1059,167 @@ def delete_selected_bill_item(event=None, bill=None):
     sel = bill["tree"].selection()
     for iid in sel:
         pid = int(iid)
-        if pid in bill["items"]:
-            del bill["items"][pid]
-    refresh_bill_for_tree(bill["tree"], bill["items"])
+        if bill["model"].remove(pid):
+            bill_journal.log(bill["title"], "delete", pid=pid)
+            refresh_bill_line(bill, pid)
+
+# ---------------- Fast Movers & Quick Keys ----------------
+POPULARITY_PATH = os.environ.get("POS_POPULARITY_PATH",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "popularity.json"))
+POPULARITY_SAVE_MS = 60 * 1000  # counters are saved, and the quick keys redrawn, this often
+QUICK_KEYS = 12                 # F1..F12
+QUICK_KEY_COLUMNS = 6
+
+# decayed add counts per product: fast movers rank first in suggestions and fill the quick keys
+popularity = Popularity(POPULARITY_PATH)
+quick_keys = []  # product id per key; only redrawn with the save, so keys do not move mid-bill
+
+quick_frame = tk.Frame(root)
+quick_frame.pack(side=tk.TOP, fill=tk.X, padx=30, before=billing_container)
+quick_buttons = []
+for i in range(QUICK_KEYS):
+    btn = tk.Button(quick_frame, text=f"F{i + 1}", font=global_font, width=16, height=2,
+                    state=tk.DISABLED, command=lambda i=i: quick_add(i))
+    btn.grid(row=i // QUICK_KEY_COLUMNS, column=i % QUICK_KEY_COLUMNS, padx=2, pady=2, sticky="we")
+    quick_buttons.append(btn)
+
+def refresh_quick_keys():
+    """Lay the current top sellers out on the quick keys."""
+    global quick_keys
+    quick_keys = popularity.top(QUICK_KEYS)
+
+    def label(names):
+        for i, btn in enumerate(quick_buttons):
+            pid = quick_keys[i] if i < len(quick_keys) else None
+            name = names.get(pid, f"#{pid}") if pid is not None else ""
+            btn.config(text=f"F{i + 1}  {name}" if name else f"F{i + 1}",
+                       state=tk.NORMAL if pid is not None else tk.DISABLED)
+
+    names = {}
+    for pid in quick_keys:
+        product = catalog.get(pid)
+        if product:
+            names[pid] = product[1]
+    label(names)
+    missing = [pid for pid in quick_keys if pid not in names]
+    if missing and server_search and db is not None:
+        db_executor.submit(db.products_by_ids, missing, tag="quick_keys",
+                           on_done=lambda rows: label({**names, **{r[0]: r[1] for r in rows}}))
+
+def quick_add(index):
+    """One keystroke (F1..F12) or click: one unit of that fast mover on the active bill."""
+    bill = active_bill or left_bill
+    if index >= len(quick_keys):
+        return "break"
+    pid = quick_keys[index]
+    product = catalog.get(pid)
+    if product:
+        add_product_to_bill(bill, product, edit_qty=False)
+    elif server_search and db is not None:
+        db_executor.submit(db.product_by_id, pid, label="Looking up product", tag=("lookup", bill["title"]),
+                           on_done=lambda row: add_product_to_bill(bill, row, edit_qty=False) if row
+                           else product_not_found(bill),
+                           on_error=lambda e: messagebox.showerror("DB Error", str(e)))
+    else:
+        popularity.forget(pid)  # deleted since the keys were drawn
+        product_not_found(bill)
+    return "break"
+
+def save_popularity(reschedule=True):
+    try:
+        popularity.save()
+    except OSError as e:
+        log.warning("Popularity counters not saved: %s", e)
+    refresh_quick_keys()
+    if reschedule:
+        root.after(POPULARITY_SAVE_MS, save_popularity)
+
+for i in range(QUICK_KEYS):
+    root.bind(f"<F{i + 1}>", lambda e, i=i: quick_add(i))
+atexit.register(popularity.save)
+
+
+# ---------------- Open Bill Journal ----------------
+JOURNAL_PATH = os.environ.get("POS_JOURNAL_PATH",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "open_bills.journal"))
+JOURNAL_COMPACT_MS = 5 * 60 * 1000  # rewrite the journal from the open bills this often
+
+bill_journal = BillJournal(JOURNAL_PATH)
+atexit.register(bill_journal.close)
+
+def log_customer_name(bill):
+    name = bill["cust_entry"].get().strip()
+    if name != bill.get("journal_customer", ""):
+        bill["journal_customer"] = name
+        bill_journal.log(bill["title"], "customer", name=name)
+
+def restore_open_bills():
+    """Replay the journal into left_bill/right_bill after a crash or power cut."""
+    bills = {b["title"]: b for b in (left_bill, right_bill)}
+    for rec in read_journal(JOURNAL_PATH):
+        bill = bills.get(rec.get("bill"))
+        if bill is None:
+            continue
+        model, op, pid = bill["model"], rec.get("op"), rec.get("pid")
+        try:
+            if op == "add":
+                model.add(pid, rec["name_hi"], rec["price"])
+            elif op == "qty" and pid in model:
+                model.set_qty(pid, rec["qty"])
+            elif op == "price" and pid in model:
+                model.set_price(pid, rec["price"])
+            elif op == "delete":
+                model.remove(pid)
+            elif op == "clear":
+                model.clear()
+            elif op == "customer":
+                bill["journal_customer"] = rec["name"]
+        except (KeyError, TypeError):
+            continue
+    for bill in bills.values():
+        bill["cust_entry"].delete(0, tk.END)
+        bill["cust_entry"].insert(0, bill.get("journal_customer", ""))
+        refresh_bill_for_tree(bill)
+    compact_journal(reschedule=False)
+
+def compact_journal(reschedule=True):
+    bill_journal.compact({
+        b["title"]: (b.get("journal_customer", ""), b["model"].rows())
+        for b in (left_bill, right_bill)
+    })
+    if reschedule:
+        root.after(JOURNAL_COMPACT_MS, compact_journal)
 
 
 # ---------------- Print Bill (same format) ----------------
 CHROMEDRIVER_PATH = None  # or set full path manually
-
-def build_receipt_html(bill, customer_name, total):
+PRINTER_PORT = "COM30"
+PRINTER_BAUDRATE = 9600
+SEND_CHUNK = 4096         # bytes per serial write; a failure after the first one is not retried
+PRINT_MODE = "native"     # "native" = Pillow renderer, "chrome" = headless Chrome screenshot
+RECEIPT_TIME_FORMAT = "%d-%m-%Y %I:%M %p"
+# printer-ready receipts by content, for duplicates; POS_RECEIPT_DIR="" keeps them in memory only
+RECEIPT_DIR = os.environ.get("POS_RECEIPT_DIR",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "receipts"))
+
+receipt_cache = ReceiptCache(RECEIPT_DIR or None)
+
+# headless Chrome for PRINT_MODE "chrome" (and the native renderer's fallback), kept running between bills
+CHROME_POOL_SIZE = 1
+CHROME_MAX_JOBS = 200     # receipts per browser before it is restarted
+chrome_pool = ChromePool(CHROME_POOL_SIZE, CHROME_MAX_JOBS, CHROMEDRIVER_PATH)
+atexit.register(chrome_pool.close)
+if PRINT_MODE == "chrome":
+    chrome_pool.warm()
+
+def receipt_rows(bill):
+    """(name_hi, qty, price, line_total) for every line, as printed on the receipt."""
+    return [(line.name_hi, line.qty, line.price, line.total) for line in bill["model"]]
+
+@metrics.timed("build_receipt_html")
+def build_receipt_html(bill, customer_name, total, printed_at=None):
     rows_html = ""
-    for item in bill["items"].values():
-        name_hi, price, qty = item
-        line_total = math.ceil(price * qty)
+    for name_hi, qty, price, line_total in receipt_rows(bill):
         rows_html += f"""
         <tr>
             <td class="item">{name_hi}</td>
@@ -585,8 +1257,8 @@ def build_receipt_html(bill, customer_name, total):
                 <tbody>{rows_html}</tbody>
                 </table> 
                 <hr/> 
-                <div style="font-size:22px;font-weight:bold">Items: {len(bill['items'])} &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; Grand Total: {int(round(total)):,}</div> 
-                <div style="font-size:22px">Thank You! &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;{datetime.now().strftime('%d-%m-%Y %I:%M %p')}</div> 
+                <div style="font-size:22px;font-weight:bold">Items: {len(bill['model'])} &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; Grand Total: {total:,}</div> 
+                <div style="font-size:22px">Thank You! &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;{(printed_at or datetime.now()).strftime(RECEIPT_TIME_FORMAT)}</div> 
                 <div style="text-align:center;margin-top:6px;font-size:22px">- Developed By Nayan Parihar -</div> 
             </div>
         </body>
@@ -594,65 +1266,333 @@ def build_receipt_html(bill, customer_name, total):
     return html
 
 
-def print_bill(bill):
-    def do_print():
-        driver = None
-        try:
-            customer_name = bill["cust_entry"].get().strip()
-            total = sum(math.ceil(p * q) for _, p, q in bill["items"].values())
-            html = build_receipt_html(bill, customer_name, total)
-
-            tmp_dir = tempfile.mkdtemp()
-            html_path = os.path.join(tmp_dir, "receipt.html")
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(html)
-
-            # --- dynamic window height ---
-            num_items = len(bill["items"])
-            window_height = max(6000, 400 + num_items * 45)  # expand as bill grows
-
-            chrome_opts = Options()
-            chrome_opts.add_argument("--headless=new")
-            chrome_opts.add_argument(f"--window-size=800,{window_height}")
-
-            driver = (
-                webdriver.Chrome(executable_path=CHROMEDRIVER_PATH, options=chrome_opts)
-                if CHROMEDRIVER_PATH
-                else webdriver.Chrome(options=chrome_opts)
-            )
-
-            driver.get("file:///" + html_path.replace("\\", "/"))
-            driver.implicitly_wait(1)
-
-            elem = driver.find_element(By.ID, "receipt")
-
-            tmp_png = os.path.join(tmp_dir, "bill.png")
-            elem.screenshot(tmp_png)
-            driver.quit()
-
-            # ---- Print the captured image ----
-            p = Serial(devfile="COM30", baudrate=9600, timeout=1)
-            p._raw(b"\x1B\x37\x08\xF0\x02")  # print density
-            p._raw(b"\x1B\x33\x08")          # line spacing
-            p.image(tmp_png)
-            p.cut()
-
-            messagebox.showinfo("Printed", "Bill printed successfully.")
-
-            # cleanup
-            os.remove(tmp_png)
-            os.remove(html_path)
-            os.rmdir(tmp_dir)
+def render_receipt_chrome(bill, customer_name, total, printed_at=None):
+    """Screenshot the #receipt element of build_receipt_html in a warm headless Chrome."""
+    html = build_receipt_html(bill, customer_name, total, printed_at)
+    return chrome_pool.render(html, "receipt", height=400 + len(bill["model"]) * 45)  # window grows with the bill
 
+def render_receipt_image(bill, customer_name, total, printed_at=None):
+    """Render the receipt per PRINT_MODE; headless Chrome stays as the fallback."""
+    if PRINT_MODE == "native":
+        from receipt_render import render_receipt
+        try:
+            with metrics.time("print.render_native"):
+                return render_receipt(receipt_rows(bill), customer_name, total, printed_at)
+        except OSError:
+            pass  # no Devanagari font, or a Pillow without libraqm to shape it
+    with metrics.time("print.render_chrome"):
+        return render_receipt_chrome(bill, customer_name, total, printed_at)
+
+def open_printer():
+    """Open and initialise the printer; the spooler keeps this connection for the session."""
+    from escpos.printer import Serial
+    p = Serial(devfile=PRINTER_PORT, baudrate=PRINTER_BAUDRATE, timeout=1)
+    p._raw(b"\x1B\x37\x08\xF0\x02")  # print density
+    p._raw(b"\x1B\x33\x08")          # line spacing
+    return p
+
+def encode_receipt(img):
+    """Printer bytes of a rendered receipt: trimmed, feed-compressed raster."""
+    from escpos_raster import encode_image
+    with metrics.time("print.encode"):
+        data, report = encode_image(img)
+    metrics.count("print.raster_bytes", report.encoded_bytes)
+    metrics.count("print.raster_unencoded_bytes", report.raw_bytes)   # what a plain GS v 0 image would be
+    return data
+
+def receipt_bytes(key, bill, customer_name, total, printed_at):
+    """Encoded receipt for key, rendered only if this exact receipt is not cached yet."""
+    data = receipt_cache.get(key)
+    if data is not None:
+        metrics.count("print.cache_hits")
+        return data
+    data = encode_receipt(render_receipt_image(bill, customer_name, total, printed_at))
+    receipt_cache.put(key, data)
+    return data
+
+def send_receipt(printer, data):
+    """Send encoded receipt bytes in SEND_CHUNK pieces and cut.
+
+    Once a piece is out, a failure raises PartialSend: the spooler must not
+    start the receipt again from the top over what is already on the paper.
+    """
+    sent = 0
+    with metrics.time("print.serial"):
+        try:
+            for at in range(0, len(data), SEND_CHUNK):
+                printer._raw(data[at:at + SEND_CHUNK])
+                sent = min(at + SEND_CHUNK, len(data))
+            printer.cut()
         except Exception as e:
-            if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
-            messagebox.showerror("Print Error", str(e))
+            if not sent:
+                raise  # nothing printed yet: safe to reconnect and send it all
+            raise PartialSend(f"Printing stopped after {sent:,} of {len(data):,} bytes ({e}).\n"
+                              "Check the printer and reprint the bill.") from e
+    metrics.count("print.bytes", len(data))
+    return len(data)
+
+print_spooler = PrintSpooler(open_printer, root, send=send_receipt)
+
+def report_print_status(job, status, error):
+    """Runs on the Tk thread for every status change of a print job."""
+    if status == "done":
+        messagebox.showinfo("Printed", "Bill printed successfully.")
+    elif status == "failed":
+        messagebox.showerror("Print Error", str(error))
 
-    threading.Thread(target=do_print, daemon=True).start()
+def print_bill(bill):
+    # snapshot on the Tk thread; rendering and printing happen on the spooler worker
+    model = bill["model"].copy()
+    snapshot = {"model": model}
+    customer_name = bill["cust_entry"].get().strip()
+    printed_at = datetime.now()
+    # the time is part of the key, so a later copy is the very same receipt
+    key = receipt_key(receipt_rows(snapshot), customer_name, model.total,
+                      printed_at.strftime(RECEIPT_TIME_FORMAT), PRINT_MODE)
+
+    def on_status(job, status, error):
+        if status == "done":
+            bill_no = record_sale(model)
+            if bill_no is not None:
+                receipt_cache.add_bill(bill_no, key, customer_name, model.total,
+                                       printed_at.strftime(RECEIPT_TIME_FORMAT))
+        report_print_status(job, status, error)
+
+    try:
+        print_spooler.submit(lambda: receipt_bytes(key, snapshot, customer_name, model.total, printed_at),
+                             on_status=on_status)
+    except queue.Full:
+        messagebox.showerror("Print Error", "Printer queue is full, try again in a moment.")
+
+def reprint(entry):
+    """Send a printed bill's cached receipt again; a duplicate is not a new sale."""
+    data = receipt_cache.get(entry["key"]) if entry else None
+    if data is None:
+        return messagebox.showerror("Reprint", "No printed receipt to reprint." if not entry
+                                    else f"Receipt of bill {entry['bill']} is no longer cached.")
+    metrics.count("print.reprints")
+    try:
+        print_spooler.submit(lambda: data, priority=PRIORITY_HIGH, on_status=report_print_status)
+    except queue.Full:
+        messagebox.showerror("Print Error", "Printer queue is full, try again in a moment.")
+
+def open_reprint_window():
+    win = tk.Toplevel(root)
+    win.title("Reprint Bill")
+    tree = ttk.Treeview(win, columns=("Bill", "Printed", "Customer", "Total"), show="headings",
+                        height=14, selectmode="browse")
+    for col, width in zip(tree["columns"], (80, 190, 220, 110)):
+        tree.heading(col, text=col)
+        tree.column(col, width=width, anchor="center")
+    tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=8)
+    for entry in receipt_cache.recent_bills():
+        tree.insert("", tk.END, iid=str(entry["bill"]),
+                    values=(entry["bill"], entry["printed_at"], entry["customer"], f"{entry['total']:,}"))
+
+    def reprint_selected(event=None):
+        sel = tree.selection()
+        if sel:
+            reprint(receipt_cache.bill(int(sel[0])))
+
+    tree.bind("<Double-1>", reprint_selected)
+    tk.Button(win, text="Reprint", font=global_font, width=12, command=reprint_selected).pack(pady=(0, 8))
+    return win
+
+
+# ---------------- Sales History & Reports ----------------
+SALES_DIR = os.environ.get("POS_SALES_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "sales"))
+REPORT_RANGES = ("Today", "This week", "This month", "This year", "All time")
+REPORT_TOP_N = 50
+
+_sales_history = None
+
+def get_sales_history():
+    """The local columnar sales store, opened on first use."""
+    global _sales_history
+    if _sales_history is None:
+        from sales_history import SalesHistory
+        _sales_history = SalesHistory(SALES_DIR)
+        atexit.register(_sales_history.close)   # bills printed in the last moment are still written
+    return _sales_history
+
+def record_sale(model):
+    """Queue a printed bill for the sales history; returns its bill number (None if it failed).
+
+    The history's writer thread does the writes and fsyncs, not the Tk thread."""
+    try:
+        return get_sales_history().append_bill([(l.pid, l.qty_hundredths, l.price_paise, l.total) for l in model])
+    except Exception as e:
+        messagebox.showerror("Sales History", f"Bill printed but not saved to history: {e}")
+
+def report_range(name):
+    """(start, end) unix seconds for one of REPORT_RANGES, None = open ended."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if name == "Today":
+        start = today
+    elif name == "This week":
+        start = today - timedelta(days=today.weekday())
+    elif name == "This month":
+        start = today.replace(day=1)
+    elif name == "This year":
+        start = today.replace(month=1, day=1)
+    else:
+        return None, None
+    return start.timestamp(), None
+
+def open_sales_report():
+    win = tk.Toplevel(root)
+    win.title("Sales Report")
+
+    controls = tk.Frame(win)
+    controls.pack(fill=tk.X, padx=10, pady=8)
+    tk.Label(controls, text="Range", font=global_font).pack(side=tk.LEFT)
+    range_box = ttk.Combobox(controls, values=REPORT_RANGES, state="readonly", width=12, font=global_font)
+    range_box.set(REPORT_RANGES[0])
+    range_box.pack(side=tk.LEFT, padx=(5, 15))
+    tk.Label(controls, text="Group by", font=global_font).pack(side=tk.LEFT)
+    group_box = ttk.Combobox(controls, values=("day", "week", "month"), state="readonly", width=8, font=global_font)
+    group_box.set("day")
+    group_box.pack(side=tk.LEFT, padx=(5, 15))
+    tk.Label(controls, text="Top", font=global_font).pack(side=tk.LEFT)
+    top_entry = tk.Entry(controls, width=5, font=global_font)
+    top_entry.insert(0, str(REPORT_TOP_N))
+    top_entry.pack(side=tk.LEFT, padx=5)
+    refresh_btn = tk.Button(controls, text="Refresh", font=global_font, width=10)
+    refresh_btn.pack(side=tk.LEFT, padx=10)
+
+    summary_label = tk.Label(win, text="", font=global_font, anchor="w")
+    summary_label.pack(fill=tk.X, padx=10)
+
+    period_tree = ttk.Treeview(win, columns=("Period", "Bills", "Lines", "Amount"), show="headings", height=8)
+    top_tree = ttk.Treeview(win, columns=("Rank", "Product", "Qty", "Amount"), show="headings", height=14)
+    for tree, widths in ((period_tree, (140, 80, 80, 120)), (top_tree, (60, 300, 80, 120))):
+        for col, width in zip(tree["columns"], widths):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor="center")
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=6)
+    period_sync, top_sync = TreeSync(period_tree), TreeSync(top_tree)
+
+    def refresh(event=None):
+        history = get_sales_history()
+        start, end = report_range(range_box.get())
+        try:
+            top_n = max(1, int(top_entry.get()))
+        except:
+            top_n = REPORT_TOP_N
+        bills, lines, amount = history.totals(start, end)
+        summary_label.config(text=f"Bills: {bills:,}    Lines: {lines:,}    Amount: {amount:,}")
+        period_sync.update((day.strftime('%d-%m-%Y'), f"{b:,}", f"{n:,}", f"{a:,}")
+                           for day, b, n, a in reversed(history.period_totals(group_box.get(), start, end)))
+        top = history.top_sellers(top_n, start, end)
+        names = {}
+        for pid, _, _ in top:
+            product = catalog.get(pid)
+            if product:
+                names[pid] = product[1]
+
+        def show(names):
+            top_sync.update((rank, names.get(pid, f"#{pid}"), format_qty_display(qty), f"{amt:,}")
+                            for rank, (pid, qty, amt) in enumerate(top, 1))
+
+        show(names)
+        missing = [pid for pid, _, _ in top if pid not in names]
+        if missing and db is not None:  # not cached (large catalog): ask the DB in the background
+            db_executor.submit(db.products_by_ids, missing, tag="report_names",
+                               on_done=lambda rows: show({**names, **{r[0]: r[1] for r in rows}}))
+
+    refresh_btn.config(command=refresh)
+    range_box.bind("<<ComboboxSelected>>", refresh)
+    group_box.bind("<<ComboboxSelected>>", refresh)
+    top_entry.bind("<Return>", refresh)
+    refresh()
+    return win
+
+tk.Button(pm_frame, text="Sales Report", font=global_font, width=12, command=open_sales_report).grid(
+    row=9, column=0, pady=5)
+
+
+# ---------------- Metrics ----------------
+# timings of the hot paths (see metrics.py); POS_METRICS=0 switches them off
+METRICS_PATH = os.environ.get("POS_METRICS_PATH",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics.jsonl"))
+METRICS_WRITE_MS = 60 * 1000   # one snapshot line per minute
+METRICS_PORT = int(os.environ.get("POS_METRICS_PORT") or 0)   # e.g. 9464 for Prometheus on localhost
+LOOP_LAG_MS = 1000             # heartbeat that measures how late the Tk event loop runs
+STATS_REFRESH_MS = 1000
+
+metrics_file = MetricsFile(METRICS_PATH, metrics) if metrics.enabled else None
+
+def write_metrics(reschedule=True):
+    try:
+        metrics_file.write()
+    except OSError as e:
+        log.warning("Metrics file not written: %s", e)
+    if reschedule:
+        root.after(METRICS_WRITE_MS, write_metrics)
+
+def watch_loop_lag(due=None):
+    """Record how late each heartbeat fires: time the loop spent busy instead of handling input."""
+    now = time.perf_counter()
+    if due is not None:
+        metrics.observe("tk.loop_lag", max(0.0, (now - due) * 1000))
+    root.after(LOOP_LAG_MS, watch_loop_lag, now + LOOP_LAG_MS / 1000)
+
+def start_metrics():
+    if not metrics.enabled:
+        return
+    root.after(METRICS_WRITE_MS, write_metrics)
+    atexit.register(write_metrics, False)
+    watch_loop_lag()
+    if METRICS_PORT:
+        try:
+            serve_prometheus(metrics, METRICS_PORT)
+        except OSError as e:
+            log.warning("Metrics: cannot serve on port %d: %s", METRICS_PORT, e)
+
+def open_stats_window():
+    win = tk.Toplevel(root)
+    win.title(f"Stats - {metrics.snapshot()['terminal']}")
+
+    controls = tk.Frame(win)
+    controls.pack(fill=tk.X, padx=10, pady=8)
+    since_label = tk.Label(controls, text="", font=global_font, anchor="w")
+    since_label.pack(side=tk.LEFT)
+    tk.Button(controls, text="Reset", font=global_font, width=10,
+              command=lambda: (metrics.reset(), refresh(False))).pack(side=tk.RIGHT)
+
+    timing_tree = ttk.Treeview(win, columns=("Metric", "Count", "Mean", "p50", "p95", "p99", "Max"),
+                               show="headings", height=16)
+    counter_tree = ttk.Treeview(win, columns=("Counter", "Value"), show="headings", height=6)
+    for tree, widths in ((timing_tree, (240, 80, 90, 90, 90, 90, 90)), (counter_tree, (240, 120))):
+        for col, width in zip(tree["columns"], widths):
+            tree.heading(col, text=col if col in ("Metric", "Count", "Counter", "Value") else f"{col} ms")
+            tree.column(col, width=width, anchor="w" if col in ("Metric", "Counter") else "e")
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=6)
+    timing_sync, counter_sync = TreeSync(timing_tree), TreeSync(counter_tree)
+
+    def refresh(reschedule=True):
+        if not win.winfo_exists():
+            return
+        snap = metrics.snapshot()
+        since_label.config(text="Metrics are off (POS_METRICS=0)" if not metrics.enabled else
+                           f"Since {datetime.fromtimestamp(snap['since']).strftime('%d-%m-%Y %I:%M:%S %p')}")
+        timing_sync.update((name, f"{h['count']:,}", f"{h['mean_ms']:.2f}", f"{h['p50_ms']:.2f}",
+                            f"{h['p95_ms']:.2f}", f"{h['p99_ms']:.2f}", f"{h['max_ms']:.2f}")
+                           for name, h in sorted(snap["histograms"].items()))
+        counter_sync.update((name, f"{value:,}") for name, value in sorted(snap["counters"].items()))
+        if reschedule:
+            win.after(STATS_REFRESH_MS, refresh)
+
+    refresh()
+    return win
+
+tk.Button(pm_frame, text="Stats", font=global_font, width=12, command=open_stats_window).grid(
+    row=9, column=1, pady=5)
+tk.Button(pm_frame, text="Reprint Last", font=global_font, width=12,
+          command=lambda: reprint(receipt_cache.last_bill())).grid(row=11, column=0, pady=5)
+tk.Button(pm_frame, text="Reprint...", font=global_font, width=12, command=open_reprint_window).grid(
+    row=11, column=1, pady=5)
 
 
 # ---------------- Bindings & startup ----------------
@@ -663,27 +1603,33 @@ for b in (left_bill, right_bill):
     b["entry"].bind("<Return>", lambda e, bill=b: add_to_bill(e, bill))
     b["clear_btn"].config(command=lambda bill=b: clear_bill(bill))
     b["print_btn"].config(command=lambda bill=b: print_bill(bill))
-    b["tree"].bind("<Double-1>", on_tree_double_click_factory(b["tree"], b["items"]))
+    b["tree"].bind("<Double-1>", on_tree_double_click_factory(b))
     b["tree"].bind("<Delete>", lambda e, bill=b: delete_selected_bill_item(e, bill))
+    b["cust_entry"].bind("<KeyRelease>", lambda e, bill=b: log_customer_name(bill))
 
 # product tree double-click fill fields
 def product_tree_fill(event):
-    sel = product_tree.selection()
-    if not sel:
+    row = product_view.selected_row()
+    if not row:
         return
-    item = product_tree.item(sel[0])
     name_en_entry.delete(0, tk.END)
     name_hi_entry.delete(0, tk.END)
     price_entry.delete(0, tk.END)
-    name_en_entry.insert(0, item['values'][1])
-    name_hi_entry.insert(0, item['values'][2])
-    price_entry.insert(0, item['values'][3])
+    barcode_entry.delete(0, tk.END)
+    name_en_entry.insert(0, row[1])
+    name_hi_entry.insert(0, row[2])
+    price_entry.insert(0, row[3])
+    barcode_entry.insert(0, row[4])
 
 product_tree.bind("<Double-1>", product_tree_fill)
 
-# initial load
-fetch_products()
-init_suggestions()
+# initial load: open bills come from the local journal, the catalog streams in behind
+restore_open_bills()
+root.after(JOURNAL_COMPACT_MS, compact_journal)
+root.after(POPULARITY_SAVE_MS, save_popularity)
+start_catalog_warmup()
+start_metrics()
+root.after(0, report_startup)
 active_bill = left_bill
 left_bill["entry"].focus()
 
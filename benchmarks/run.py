@@ -0,0 +1,428 @@
+"""Headless benchmarks for the search, billing and print hot paths of Main.py.
+
+    python -m benchmarks.run                          # 1k, 10k, 100k products
+    python -m benchmarks.run --sizes 1000,1000000 --out bench.json
+    python -m benchmarks.run --compare old.json       # ratios against an earlier run
+
+Main.py is imported with the stand-ins from benchmarks.standins (no display,
+MySQL, printer or Chrome), so the real handlers are timed:
+cold starts with and without the local catalog snapshot,
+update_suggestions_for_widget per keystroke (plain and with fast movers
+boosted), a change-feed sync after
+price edits elsewhere, the server-side keyset search used for catalogs too big
+to cache (SQLite here, so only indicative), bulk pricing with bill_model.price_bills, add_to_bill,
+barcode scans and refresh_bill_for_tree against bill size,
+build_receipt_html, receipt render-to-bytes and a cached duplicate, and
+sales-history reports over years of synthetic sales.
+Results are written as JSON. Without a Pillow that can shape Hindi the
+receipt benches go through the stand-in Chrome, which draws the receipt text
+with a plain font; those results carry mode "chrome-stub".
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+from benchmarks import standins
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EN_SYLLABLES = ("ka", "ra", "mo", "li", "sa", "ta", "ne", "po", "du", "vi", "ga", "ro", "me", "shi", "ba", "la")
+EN_ITEMS = ("Soap", "Shampoo", "Oil", "Rice", "Dal", "Atta", "Sugar", "Tea", "Biscuit", "Salt",
+            "Toothpaste", "Detergent", "Masala", "Ghee", "Namkeen", "Agarbatti", "Candle", "Brush")
+HI_CONSONANTS = "कखगघचछजझटठडढतथदधनपफबभमयरलवशसह"
+HI_MATRAS = ("", "ा", "ि", "ी", "ु", "ू", "े", "ै", "ो", "ौ", "ं")
+UNITS = ("g", "kg", "ml", "L", "pc")
+
+
+# ---------------- Synthetic data ----------------
+def synthetic_catalog(size, seed=1):
+    """size rows of (id, name_en, name_hi, price, barcode) with unique names and EAN-13-like barcodes."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(1, size + 1):
+        brand = "".join(rnd.choice(EN_SYLLABLES) for _ in range(rnd.randint(2, 3))).title()
+        item = rnd.choice(EN_ITEMS)
+        qty = rnd.choice((50, 100, 200, 250, 500, 1, 2, 5))
+        name_en = f"{brand} {item} {qty}{rnd.choice(UNITS)} {i:x}"
+        name_hi = " ".join(
+            "".join(rnd.choice(HI_CONSONANTS) + rnd.choice(HI_MATRAS) for _ in range(rnd.randint(2, 4)))
+            for _ in range(rnd.randint(1, 3)))
+        rows.append((i, name_en, name_hi, round(rnd.uniform(5, 2000), 2), f"890{i:010d}"))
+    return rows
+
+
+# ---------------- Timing ----------------
+def stats(samples_ns):
+    ms = sorted(s / 1e6 for s in samples_ns)
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(ms[len(ms) // 2], 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "max_ms": round(ms[-1], 4),
+    }
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter_ns()
+    result = fn(*args)
+    return time.perf_counter_ns() - t0, result
+
+
+# ---------------- Benchmarks ----------------
+def bench_search(app, rows, keystrokes, seed):
+    """Keystroke -> painted suggestions through update_suggestions_for_widget."""
+    rnd = random.Random(seed)
+    entry = app.left_bill["entry"]
+    samples = []
+    for _ in range(keystrokes // 6 or 1):
+        name = rnd.choice(rows)[rnd.choice((1, 2))]
+        entry.delete(0)
+        for ch in name[:6]:
+            entry.insert("end", ch)
+            event = types.SimpleNamespace(keysym=ch, widget=entry)
+            dt, _ = timed(lambda: (app.update_suggestions_for_widget(event), app.search_debounce.flush()))
+            samples.append(dt)
+    entry.delete(0)
+    return samples
+
+
+def bench_search_hot(app, rows, keystrokes, seed):
+    """bench_search with a full set of fast movers boosting the ranking."""
+    rnd = random.Random(seed + 1)
+    now = time.time()
+    for i, row in enumerate(rnd.sample(rows, min(len(rows), app.popularity.hot_items * 2))):
+        for _ in range(1 + i % 5):
+            app.popularity.bump(row[0], now - rnd.uniform(0, 30 * 86400))
+    try:
+        return bench_search(app, rows, keystrokes, seed)
+    finally:
+        app.popularity.clear()
+
+
+def bench_server_search(app, rows, queries, seed):
+    """db.search_products as the large-catalog mode runs it: first page, then the keyset next page."""
+    rnd = random.Random(seed)
+    first, following = [], []
+    for _ in range(queries):
+        typed = rnd.choice(rows)[1][:rnd.choice((2, 3, 4))]
+        dt, (_, cursor) = timed(app.db.search_products, typed, app.PRODUCT_TREE_PAGE)
+        first.append(dt)
+        if cursor is not None:
+            following.append(timed(app.db.search_products, typed, app.PRODUCT_TREE_PAGE, cursor)[0])
+    return first, following
+
+
+def bench_service(app, rows, lookups, seed):
+    """A catalog service on localhost: whole-catalog fetch, and name lookups through it vs MySQL."""
+    from catalog_service import CatalogClient, CatalogService, serve
+    service = CatalogService(app.Database(app.DB_CONFIG, pool_name=f"bench-service-{len(rows)}")).start()
+    server = serve(service, "127.0.0.1", 0)
+    client = CatalogClient("127.0.0.1", server.server_address[1])
+    try:
+        rnd = random.Random(seed)
+        names = [rnd.choice(rows)[1] for _ in range(lookups)]
+        fetch = [timed(client.catalog)[0] for _ in range(3)]
+        via_service = [timed(client.product_by_name, name)[0] for name in names]
+        via_mysql = [timed(app.db.product_by_name, name)[0] for name in names]
+        return fetch, via_service, via_mysql
+    finally:
+        client.close()
+        service.stop()
+        server.shutdown()
+        server.server_close()
+
+
+def bench_sync(app, rows, changes, repeat, seed):
+    """changes prices edited on another terminal -> feed pull + in-place catalog/widget patch."""
+    rnd = random.Random(seed)
+    samples = []
+    for _ in range(repeat):
+        standins.change_prices([r[0] for r in rnd.sample(rows, min(changes, len(rows)))], 1.05)
+        dt, _ = timed(lambda: (app.catalog_sync.now(),
+                               app.root.run_pending(until=lambda: not app.catalog_sync.busy)))
+        samples.append(dt)
+    return samples
+
+
+def bench_price_bills(rows, bills, lines, repeat, seed):
+    """price_bills over `bills` replayed orders of `lines` lines each."""
+    from bill_model import price_bills
+    rnd = random.Random(seed)
+    orders = [[(r[3], rnd.choice((1, 2, 3, 5, 10, 0.5, 1.25))) for r in rnd.sample(rows, min(lines, len(rows)))]
+              for _ in range(bills)]
+    return [timed(price_bills, orders)[0] for _ in range(repeat)]
+
+
+def synthetic_history(directory, rows, days, bills_per_day, lines, seed):
+    """SalesHistory in directory holding days of bills ending now."""
+    from bill_model import hundredths, line_total
+    from sales_history import SalesHistory
+    rnd = random.Random(seed)
+    history = SalesHistory(directory)
+    start = int(time.time()) - days * 86400
+    for day in range(days):
+        bills = []
+        for b in range(bills_per_day):
+            ts = start + day * 86400 + b * (86400 // bills_per_day)
+            picked = rnd.sample(rows, min(lines, len(rows)))
+            bill = []
+            for r in picked:
+                price, qty = hundredths(r[3]), rnd.choice((100, 200, 300, 500, 50, 125))
+                bill.append((r[0], qty, price, line_total(price, qty)))
+            bills.append((ts, bill))
+        history.append_bills(bills)
+    return history
+
+
+def bench_reports(history, repeat):
+    """The Sales Report window's queries over the whole history."""
+    out = {}
+    for name, fn in (("report_totals", lambda: history.totals()),
+                     ("report_by_day", lambda: history.period_totals("day")),
+                     ("report_by_month", lambda: history.period_totals("month")),
+                     ("report_top50", lambda: history.top_sellers(50))):
+        out[name] = [timed(fn)[0] for _ in range(repeat)]
+    return out
+
+
+def bench_billing(app, rows, bill_size, seed):
+    """add_to_bill latency near bill_size lines, plus one full refresh_bill_for_tree."""
+    rnd = random.Random(seed)
+    bill = app.left_bill
+    app.clear_bill(bill)
+    products = rnd.sample(rows, min(bill_size, len(rows)))
+    samples = []
+    for i, row in enumerate(products):
+        bill["entry"].delete(0)
+        bill["entry"].insert(0, row[1])
+        dt, _ = timed(app.add_to_bill, None, bill)
+        if i >= len(products) - 50:
+            samples.append(dt)
+        app.root.drop_pending()   # skip the qty editor popup add_to_bill schedules
+    refresh, _ = timed(app.refresh_bill_for_tree, bill)
+    return samples, refresh
+
+
+def bench_scan(app, rows, bill_size, seed):
+    """A whole scan (digits 4 ms apart, then Return) through the entry handlers, near bill_size lines."""
+    rnd = random.Random(seed)
+    bill = app.left_bill
+    app.clear_bill(bill)
+    entry = bill["entry"]
+    products = rnd.sample(rows, min(bill_size, len(rows)))
+    samples, clock = [], 0
+
+    def scan(code):
+        nonlocal clock
+        for ch in code:
+            clock += 4
+            event = types.SimpleNamespace(keysym=ch, widget=entry, time=clock)
+            app.on_entry_key_nav(event)
+            entry.insert("end", ch)
+            app.update_suggestions_for_widget(event)
+        clock += 4
+        app.add_to_bill(types.SimpleNamespace(keysym="Return", widget=entry, time=clock), bill)
+
+    for i, row in enumerate(products):
+        clock += 500   # the cashier picks up the next item
+        dt, _ = timed(scan, row[4])
+        if i >= len(products) - 50:
+            samples.append(dt)
+    assert bill["model"].count == len(products) and not entry.get()
+    app.root.drop_pending()
+    return samples
+
+
+def render_mode(app):
+    """The receipt path render_receipt_image will actually take."""
+    if app.PRINT_MODE == "native":
+        try:
+            from receipt_render import find_font, require_shaping
+            require_shaping()
+            find_font()
+            return "native"
+        except OSError:
+            pass
+    return "chrome-stub"
+
+
+def bench_print(app, bill, repeat):
+    """build_receipt_html, render + encode to printer bytes, and a duplicate from the receipt cache."""
+    customer, total = "Bench Customer", bill["model"].total
+    html = [timed(app.build_receipt_html, bill, customer, total)[0] for _ in range(repeat)]
+    render, encode, reprint, nbytes = [], [], [], 0
+    for _ in range(repeat):
+        dt, img = timed(app.render_receipt_image, bill, customer, total)
+        render.append(dt)
+        printer = standins.NullSerial()
+        dt, _ = timed(lambda: app.send_receipt(printer, app.encode_receipt(img)))
+        encode.append(dt)
+        nbytes = printer.bytes_sent
+    printed_at = datetime.now()
+    key = app.receipt_key(app.receipt_rows(bill), customer, total, str(printed_at), "bench")
+    app.receipt_bytes(key, bill, customer, total, printed_at)   # the original print fills the cache
+    for _ in range(repeat):
+        printer = standins.NullSerial()
+        dt, _ = timed(lambda: app.send_receipt(printer, app.receipt_bytes(key, bill, customer, total, printed_at)))
+        reprint.append(dt)
+    return html, render, encode, reprint, nbytes
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def load_app(tmp_dir):
+    """Import Main.py against the stand-ins, with every file it writes in tmp_dir."""
+    os.environ["POS_JOURNAL_PATH"] = os.path.join(tmp_dir, "open_bills.journal")
+    os.environ["POS_METRICS_PATH"] = os.path.join(tmp_dir, "metrics.jsonl")
+    os.environ["POS_RECEIPT_DIR"] = os.path.join(tmp_dir, "receipts")
+    os.environ["POS_CATALOG_SNAPSHOT"] = os.path.join(tmp_dir, "catalog.db")
+    os.environ["POS_POPULARITY_PATH"] = os.path.join(tmp_dir, "popularity.json")
+    os.environ["POS_LOG_PATH"] = os.path.join(tmp_dir, "pos.log")
+    standins.install()
+    if REPO not in sys.path:
+        sys.path.insert(0, REPO)
+    import Main
+    Main.root.run_pending(until=lambda: not Main.catalog_loading)   # startup warm-up
+    return Main
+
+
+def run(sizes, bill_sizes, keystrokes, repeat, seed, history_days=730):
+    tmp_dir = tempfile.mkdtemp(prefix="pos-bench-")
+    app = load_app(tmp_dir)
+    results = []
+
+    def record(bench, size, samples, **extra):
+        results.append({"bench": bench, "size": size, **stats(samples), **extra})
+        r = results[-1]
+        print(f"{bench:<22} {size:>9,}  p50 {r['p50_ms']:>10.3f} ms  p95 {r['p95_ms']:>10.3f} ms  n={r['n']}"
+              + (f"  [{r['mode']}]" if "mode" in r else ""), file=sys.stderr)
+
+    rows = []
+    for size in sizes:
+        rows = synthetic_catalog(size, seed)
+        standins.load_products(rows)
+        app.catalog_snapshot.clear()   # a first start: nothing local yet
+        app.catalog_snapshot.flush()
+        dt, _ = timed(lambda: (app.start_catalog_warmup(),
+                               app.root.run_pending(until=lambda: not app.catalog_loading)))
+        record("catalog_warmup", size, [dt])
+        dt, _ = timed(lambda: app.root.run_pending(until=(lambda q: lambda: q.state != "pending")(app.fetch_products())))
+        record("catalog_load", size, [dt])
+        app.catalog_snapshot.flush()
+        # a restart: time until the whole catalog is searchable from the local copy
+        dt, _ = timed(lambda: (app.start_catalog_warmup(),
+                               app.root.run_pending(until=lambda: len(app.catalog) == size)))
+        record("catalog_warmup_snapshot", size, [dt])
+        app.root.run_pending(until=lambda: not app.catalog_loading)
+        record("keystroke_suggest", size, bench_search(app, rows, keystrokes, seed))
+        record("keystroke_suggest_hot", size, bench_search_hot(app, rows, keystrokes, seed),
+               hot=app.popularity.hot_items)
+        record("catalog_delta_sync", size, bench_sync(app, rows, 20, repeat, seed), changes=20)
+        first, following = bench_server_search(app, rows, 20, seed)
+        record("server_search_page", size, first)
+        if following:  # small catalogs fit in one page
+            record("server_search_next", size, following)
+        fetch, via_service, via_mysql = bench_service(app, rows, keystrokes, seed)
+        record("service_catalog_fetch", size, fetch)
+        record("service_lookup", size, via_service)
+        record("mysql_lookup", size, via_mysql)
+
+    mode = render_mode(app)   # "chrome-stub": the stand-in screenshot, not a real browser
+    for bill_size in bill_sizes:
+        adds, refresh = bench_billing(app, rows, bill_size, seed)
+        record("add_to_bill", bill_size, adds, catalog=len(rows))
+        record("barcode_scan", bill_size, bench_scan(app, rows, bill_size, seed), catalog=len(rows))
+        record("refresh_bill_for_tree", bill_size, [refresh])
+        html, render, encode, reprint, nbytes = bench_print(app, app.left_bill, repeat)
+        record("build_receipt_html", bill_size, html)
+        record("render_receipt", bill_size, render, mode=mode)
+        record("encode_receipt", bill_size, encode, bytes=nbytes, mode=mode)
+        record("reprint_cached", bill_size, reprint, bytes=nbytes, mode=mode)
+    app.clear_bill(app.left_bill)
+
+    samples = bench_price_bills(rows, 1000, 30, repeat, seed)
+    record("price_bills", 1000, samples, lines=30,
+           bills_per_sec=round(1000 / (statistics.median(samples) / 1e9)))
+
+    if history_days:
+        history = synthetic_history(os.path.join(tmp_dir, "sales"), rows, history_days, 100, 20, seed)
+        for name, samples in bench_reports(history, repeat).items():
+            record(name, len(history), samples, days=history_days)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "receipt_render": mode,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """Print p50 ratios current/baseline for every (bench, size) present in both."""
+    old = {(r["bench"], r["size"]): r for r in baseline["results"]}
+    print(f"{'bench':<22} {'size':>9}  {'old p50':>10}  {'new p50':>10}  ratio")
+    for r in current["results"]:
+        o = old.get((r["bench"], r["size"]))
+        if o:
+            ratio = r["p50_ms"] / o["p50_ms"] if o["p50_ms"] else float("inf")
+            modes = "" if o.get("mode") == r.get("mode") else f"  ({o.get('mode')} -> {r.get('mode')}, not comparable)"
+            print(f"{r['bench']:<22} {r['size']:>9,}  {o['p50_ms']:>10.3f}  {r['p50_ms']:>10.3f}  {ratio:5.2f}x{modes}")
+
+
+def _ints(s):
+    return [int(x) for x in s.split(",") if x]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--sizes", type=_ints, default=[1000, 10000, 100000], help="catalog sizes")
+    ap.add_argument("--bill-sizes", type=_ints, default=[10, 100, 400], help="bill line counts")
+    ap.add_argument("--keystrokes", type=int, default=300, help="keystrokes timed per catalog size")
+    ap.add_argument("--repeat", type=int, default=5, help="receipt builds per bill size")
+    ap.add_argument("--history-days", type=int, default=730, help="days of sales history for reports (0 = skip)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--font", help="Devanagari TTF for the native receipt renderer (sets RECEIPT_FONT)")
+    ap.add_argument("--out", default="bench.json", help="JSON results file ('-' for stdout)")
+    ap.add_argument("--compare", help="earlier JSON results to compare against")
+    args = ap.parse_args(argv)
+
+    if args.font:
+        os.environ["RECEIPT_FONT"] = args.font
+    # Main prints per-receipt byte reports; keep stdout for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args.sizes, args.bill_sizes, args.keystrokes, args.repeat, args.seed, args.history_days)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+"""Headless stand-ins so Main.py can be imported without a display, MySQL,
+a printer or Chrome. install() must run before `import Main`.
+
+Widgets keep just enough state (entry text, listbox rows, tree items) for the
+billing and search handlers to behave as they do under Tk; everything else is
+a no-op. MySQL is replaced by an in-memory SQLite database.
+"""
+import html
+import re
+import sqlite3
+import sys
+import time
+import types
+from decimal import Decimal
+
+from PIL import Image
+
+
+# ---------------- tkinter ----------------
+class _Noop:
+    def __call__(self, *args, **kwargs):
+        return None
+
+
+class Widget:
+    def __init__(self, master=None, **kwargs):
+        self.master = master
+        self.options = dict(kwargs)
+
+    def __getattr__(self, name):
+        # pack/grid/bind/config/focus/... are irrelevant headless
+        return _Noop()
+
+    def __getitem__(self, key):
+        return self.options.get(key)
+
+    def config(self, *args, **kwargs):
+        self.options.update(kwargs)
+
+    configure = config
+
+
+class Entry(Widget):
+    def __init__(self, master=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.text = ""
+
+    def get(self):
+        return self.text
+
+    def delete(self, first, last=None):
+        self.text = ""
+
+    def insert(self, index, s):
+        self.text = str(s) + self.text if index == 0 else self.text + str(s)
+
+    def set(self, value):   # ttk.Combobox
+        self.text = str(value)
+
+
+class Listbox(Widget):
+    def __init__(self, master=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.rows = []
+        self.selected = []
+
+    def _index(self, i):
+        return len(self.rows) if i == END else int(i)
+
+    def size(self):
+        return len(self.rows)
+
+    def get(self, first, last=None):
+        if last is None:
+            return self.rows[self._index(first[0] if isinstance(first, tuple) else first)]
+        return tuple(self.rows[self._index(first):self._index(last) + 1])
+
+    def insert(self, index, *items):
+        i = self._index(index)
+        self.rows[i:i] = items
+
+    def delete(self, first, last=None):
+        i = self._index(first)
+        j = i if last is None else self._index(last)
+        del self.rows[i:j + 1]
+
+    def curselection(self):
+        return tuple(self.selected)
+
+    def selection_set(self, i):
+        self.selected = [i]
+
+    def selection_clear(self, *args):
+        self.selected = []
+
+
+class Treeview(Widget):
+    def __init__(self, master=None, columns=(), **kwargs):
+        super().__init__(master, columns=columns, **kwargs)
+        self.children = []
+        self.values = {}
+        self._next = 0
+        self._selection = ()
+        self.headings = {}
+
+    def get_children(self, item=""):
+        return tuple(self.children)
+
+    def insert(self, parent, index, iid=None, values=()):
+        if iid is None:
+            self._next += 1
+            iid = f"I{self._next:03X}"
+        if iid in self.values:
+            raise ValueError(f"Item {iid} already exists")
+        self.children.insert(len(self.children) if index == END else int(index), iid)
+        self.values[iid] = tuple(values)
+        return iid
+
+    def delete(self, *items):
+        for iid in items:
+            self.children.remove(iid)
+            del self.values[iid]
+        self.selection_remove(*items)
+
+    def move(self, iid, parent, index):
+        self.children.remove(iid)
+        self.children.insert(int(index), iid)
+
+    def exists(self, iid):
+        return iid in self.values
+
+    def item(self, iid, values=None, **kwargs):
+        if values is not None:
+            self.values[iid] = tuple(values)
+        return {"values": list(self.values[iid])}
+
+    def set(self, iid, column):
+        return self.values[iid][list(self.options["columns"]).index(column)]
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, *items):
+        self._selection = tuple(items)
+
+    def selection_remove(self, *items):
+        self._selection = tuple(i for i in self._selection if i not in items)
+
+    def heading(self, column, option=None, **kwargs):
+        opts = self.headings.setdefault(column, {"text": ""})
+        opts.update(kwargs)
+        return opts if option is None else opts.get(option)
+
+
+class Tk(Widget):
+    LONG_TIMER_MS = 1000   # run_pending() leaves periodic housekeeping timers alone
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(None)
+        self.pending = {}      # after id -> (due on the virtual clock, func, args)
+        self.clock = 0
+        self._ids = 0
+
+    def after(self, ms, func=None, *args):
+        self._ids += 1
+        after_id = f"after#{self._ids}"
+        self.pending[after_id] = (self.clock + int(ms), self._ids, func, args)
+        return after_id
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self, until=None):
+        """Run after() callbacks in due order, advancing a virtual clock.
+
+        Stops when until() is true or only timers at least LONG_TIMER_MS away
+        are left (journal compaction, sync polls, ...).
+        """
+        while self.pending:
+            if until is not None and until():
+                return
+            after_id, (due, _, func, args) = min(self.pending.items(), key=lambda kv: kv[1][:2])
+            if due - self.clock >= self.LONG_TIMER_MS and until is None:
+                return
+            if due - self.clock >= self.LONG_TIMER_MS:
+                time.sleep(0.001)   # only long timers left; wait for a worker thread to post
+                continue
+            del self.pending[after_id]
+            self.clock = max(self.clock, due)
+            if func:
+                func(*args)
+
+    def drop_pending(self):
+        self.pending.clear()
+
+    def focus_get(self):
+        return None
+
+    def mainloop(self):
+        pass
+
+
+def _tk_modules():
+    tk = types.ModuleType("tkinter")
+    for name in ("END", "LEFT", "RIGHT", "TOP", "BOTTOM", "X", "Y", "BOTH", "GROOVE", "W", "E", "N", "S",
+                 "HORIZONTAL", "VERTICAL", "NORMAL", "DISABLED"):
+        setattr(tk, name, name.lower())
+    tk.END = END
+    tk.Tk, tk.Entry, tk.Listbox = Tk, Entry, Listbox
+    tk.Frame = tk.Label = tk.Button = tk.Toplevel = tk.Scrollbar = tk.Canvas = Widget
+    tk.StringVar = tk.IntVar = Widget
+    tk.TclError = RuntimeError
+
+    ttk = types.ModuleType("tkinter.ttk")
+    ttk.Treeview = Treeview
+    ttk.Style = ttk.Progressbar = ttk.Scrollbar = ttk.Frame = ttk.Label = ttk.Button = ttk.Notebook = Widget
+    ttk.Combobox = Entry
+
+    messagebox = types.ModuleType("tkinter.messagebox")
+    messagebox.showerror = messagebox.showinfo = messagebox.showwarning = _Noop()
+    messagebox.askyesno = lambda *a, **k: True
+
+    font = types.ModuleType("tkinter.font")
+    font.Font = Widget
+
+    filedialog = types.ModuleType("tkinter.filedialog")
+    filedialog.askopenfilename = filedialog.asksaveasfilename = lambda *a, **k: ""
+
+    tk.ttk, tk.messagebox, tk.font, tk.filedialog = ttk, messagebox, font, filedialog
+    return {"tkinter": tk, "tkinter.ttk": ttk, "tkinter.messagebox": messagebox,
+            "tkinter.font": font, "tkinter.filedialog": filedialog}
+
+
+END = "end"
+
+
+# ---------------- mysql.connector (SQLite) ----------------
+sqlite3.register_adapter(Decimal, float)
+DATABASE = sqlite3.connect(":memory:", check_same_thread=False)
+DATABASE.create_function("DATABASE", 0, lambda: "cash_trader")
+DATABASE.create_function("GET_LOCK", 2, lambda name, timeout: 1)
+DATABASE.create_function("RELEASE_LOCK", 1, lambda name: 1)
+DATABASE.create_function("ft_match", 3, lambda en, hi, phrase: int(
+    phrase.strip('"').lower() in en.lower() or phrase.strip('"').lower() in hi.lower()))
+# products with every migration (migrations.MIGRATIONS) already applied, in SQLite dialect;
+# the FULLTEXT index is emulated by ft_match (a scan)
+DATABASE.executescript("""
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name_en TEXT UNIQUE NOT NULL COLLATE NOCASE,
+    name_hi TEXT NOT NULL,
+    price REAL NOT NULL,
+    barcode TEXT UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    name_key TEXT GENERATED ALWAYS AS (lower(trim(name_en))) STORED
+);
+CREATE INDEX idx_products_version ON products (version);
+CREATE INDEX idx_products_name_key ON products (name_key);
+CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL,
+                                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP);
+INSERT INTO schema_migrations (version, name) VALUES (1, 'change feed'), (2, 'barcodes'),
+                                                     (3, 'name lookup key'), (4, 'names fulltext'),
+                                                     (5, 'feed pruning');
+CREATE TABLE catalog_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL,
+                              pruned INTEGER NOT NULL DEFAULT 0);
+INSERT INTO catalog_version VALUES (1, 0, 0);
+CREATE TABLE product_tombstones (version INTEGER PRIMARY KEY, product_id INTEGER NOT NULL,
+                                 deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP);
+CREATE TRIGGER products_feed_insert AFTER INSERT ON products BEGIN
+    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    UPDATE products SET version = (SELECT version FROM catalog_version WHERE id = 1) WHERE id = NEW.id;
+END;
+CREATE TRIGGER products_feed_update AFTER UPDATE OF name_en, name_hi, price, barcode ON products BEGIN
+    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    UPDATE products SET version = (SELECT version FROM catalog_version WHERE id = 1),
+                        updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
+CREATE TRIGGER products_feed_delete AFTER DELETE ON products BEGIN
+    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    INSERT INTO product_tombstones (version, product_id) SELECT version, OLD.id FROM catalog_version WHERE id = 1;
+END;
+ATTACH DATABASE ':memory:' AS information_schema;
+CREATE TABLE information_schema.TABLES (TABLE_SCHEMA, TABLE_NAME, TABLE_ROWS);
+CREATE TABLE information_schema.COLUMNS (TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME);
+CREATE TABLE information_schema.STATISTICS (TABLE_SCHEMA, TABLE_NAME, INDEX_NAME);
+CREATE TABLE information_schema.TRIGGERS (TRIGGER_SCHEMA, TRIGGER_NAME, EVENT_OBJECT_TABLE);
+INSERT INTO information_schema.COLUMNS VALUES ('cash_trader', 'products', 'version'),
+                                              ('cash_trader', 'products', 'updated_at'),
+                                              ('cash_trader', 'products', 'barcode'),
+                                              ('cash_trader', 'products', 'name_key'),
+                                              ('cash_trader', 'catalog_version', 'pruned');
+INSERT INTO information_schema.TABLES VALUES ('cash_trader', 'products', 0),
+                                             ('cash_trader', 'schema_migrations', 5);
+INSERT INTO information_schema.STATISTICS VALUES ('cash_trader', 'products', 'idx_products_name_key'),
+                                                 ('cash_trader', 'products', 'ft_products_names');
+INSERT INTO information_schema.TRIGGERS VALUES ('cash_trader', 'products_feed_insert', 'products'),
+                                               ('cash_trader', 'products_feed_update', 'products'),
+                                               ('cash_trader', 'products_feed_delete', 'products');
+""")
+
+
+class Error(Exception):
+    def __init__(self, msg="", errno=None):
+        super().__init__(msg)
+        self.errno = errno
+
+
+class IntegrityError(Error):
+    pass
+
+
+class OperationalError(Error):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class ProgrammingError(Error):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+def _sqlite(sql):
+    """MySQL statement -> SQLite: placeholders, LIKE escapes, MATCH, date arithmetic, GREATEST
+    and INSERT ... ON DUPLICATE KEY UPDATE."""
+    sql = sql.replace("%s", "?").replace("LIKE ?", "LIKE ? ESCAPE '\\'")
+    sql = sql.replace("CURRENT_TIMESTAMP - INTERVAL ? DAY", "datetime('now', '-' || ? || ' days')")
+    sql = sql.replace("GREATEST(", "MAX(")
+    sql = sql.replace("MATCH(name_en, name_hi) AGAINST (? IN BOOLEAN MODE)", "ft_match(name_en, name_hi, ?)")
+    head, dup, assignments = sql.partition(" ON DUPLICATE KEY UPDATE ")
+    if dup:
+        sql = head + " ON CONFLICT DO UPDATE SET " + re.sub(r"VALUES\((\w+)\)", r"excluded.\1", assignments)
+    return sql
+
+
+class _Cursor:
+    def __init__(self, db):
+        self._c = db.cursor()
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def execute(self, sql, params=()):
+        try:
+            self._c.execute(_sqlite(sql), tuple(params or ()))
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(str(e))
+        self.lastrowid, self.rowcount = self._c.lastrowid, self._c.rowcount
+
+    def executemany(self, sql, seq):
+        try:
+            self._c.executemany(_sqlite(sql), [tuple(p) for p in seq])
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(str(e))
+        self.rowcount = self._c.rowcount
+
+    def fetchall(self):
+        return self._c.fetchall()
+
+    def fetchone(self):
+        return self._c.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._c.fetchmany(size)
+
+    def close(self):
+        self._c.close()
+
+
+class _Connection:
+    def __init__(self, db):
+        self._db = db
+
+    def cursor(self, prepared=False, **kwargs):
+        return _Cursor(self._db)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, *args, **kwargs):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class MySQLConnectionPool:
+    def __init__(self, pool_name=None, pool_size=5, **config):
+        self.pool_name, self.pool_size = pool_name, pool_size
+
+    def get_connection(self):
+        return _Connection(DATABASE)
+
+
+def connect(**config):
+    return _Connection(DATABASE)
+
+
+def load_products(rows):
+    """Replace the products table with rows of (id, name_en, name_hi, price, barcode)."""
+    DATABASE.execute("DELETE FROM products")
+    DATABASE.execute("DELETE FROM product_tombstones")
+    DATABASE.executemany("INSERT INTO products (id, name_en, name_hi, price, barcode) VALUES (?,?,?,?,?)",
+                         [(pid, en, hi, price, barcode or None) for pid, en, hi, price, barcode in rows])
+    DATABASE.execute("UPDATE information_schema.TABLES SET TABLE_ROWS = ? WHERE TABLE_NAME = 'products'",
+                     (len(rows),))
+    DATABASE.commit()
+
+
+def change_prices(ids, factor):
+    """Reprice products as another terminal would; each row goes through the change feed."""
+    DATABASE.executemany("UPDATE products SET price = ROUND(price * ?, 2) WHERE id = ?",
+                         [(factor, pid) for pid in ids])
+    DATABASE.commit()
+
+
+def _mysql_modules():
+    mysql = types.ModuleType("mysql")
+    connector = types.ModuleType("mysql.connector")
+    pooling = types.ModuleType("mysql.connector.pooling")
+    errorcode = types.ModuleType("mysql.connector.errorcode")
+    errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST = 2006, 2013
+    errorcode.CR_CONN_HOST_ERROR, errorcode.CR_CONNECTION_ERROR = 2003, 2002
+    errorcode.ER_DUP_ENTRY = 1062
+    pooling.MySQLConnectionPool = MySQLConnectionPool
+    for name in ("Error", "IntegrityError", "OperationalError", "InterfaceError",
+                 "ProgrammingError", "DatabaseError"):
+        setattr(connector, name, globals()[name])
+    connector.connect = connect
+    connector.pooling, connector.errorcode = pooling, errorcode
+    mysql.connector = connector
+    return {"mysql": mysql, "mysql.connector": connector,
+            "mysql.connector.pooling": pooling, "mysql.connector.errorcode": errorcode}
+
+
+# ---------------- escpos / selenium ----------------
+class NullSerial:
+    """Printer that only counts the bytes it is sent."""
+
+    def __init__(self, *args, **kwargs):
+        self.bytes_sent = 0
+
+    def _raw(self, data):
+        self.bytes_sent += len(data)
+
+    def image(self, img, *args, **kwargs):
+        w, h = img.size if hasattr(img, "size") else Image.open(img).size
+        self.bytes_sent += (w + 7) // 8 * h
+
+    def cut(self, *args, **kwargs):
+        self._raw(b"\x1dV\x00")
+
+    def close(self):
+        pass
+
+
+class _StubElement:
+    """The #receipt element: draws the text of the last written page, one line per
+    block, so the raster encoder and printer bytes see a receipt's worth of ink."""
+
+    LINE_HEIGHT = 30
+
+    def __init__(self, page):
+        self.page = page
+
+    def _image(self):
+        from PIL import ImageDraw, ImageFont
+        text = re.sub(r"(?s)<(style|script)\b.*?</\1>", "", self.page)
+        text = re.sub(r"<(br|/tr|/div|/h\d|/p)\b[^>]*>", "\n", text, flags=re.I)
+        text = re.sub(r"<t[dh]\b[^>]*>", "  ", text, flags=re.I)
+        lines = [" ".join(line.split()) for line in html.unescape(re.sub(r"<[^>]+>", "", text)).splitlines()]
+        lines = [line for line in lines if line]
+        img = Image.new("RGB", (576, 40 + self.LINE_HEIGHT * len(lines)), "white")
+        draw, font = ImageDraw.Draw(img), ImageFont.load_default(size=22)
+        for i, line in enumerate(lines):
+            draw.text((12, 20 + i * self.LINE_HEIGHT), line, fill="black", font=font)
+        return img
+
+    def screenshot(self, path):
+        self._image().save(path)
+        return True
+
+    @property
+    def screenshot_as_png(self):
+        import io
+        buf = io.BytesIO()
+        self._image().save(buf, "PNG")
+        return buf.getvalue()
+
+
+class StubChrome:
+    def __init__(self, *args, **kwargs):
+        self.page = ""
+
+    def __getattr__(self, name):
+        return _Noop()
+
+    def execute_script(self, script, *args):
+        if script.startswith("document.open()"):   # chrome_pool writing the receipt page
+            self.page = args[0]
+
+    def find_element(self, *args):
+        return _StubElement(self.page)
+
+
+class _Options:
+    def __init__(self):
+        self.arguments = []
+
+    def add_argument(self, arg):
+        self.arguments.append(arg)
+
+
+def _device_modules():
+    escpos = types.ModuleType("escpos")
+    printer = types.ModuleType("escpos.printer")
+    printer.Serial = printer.Usb = printer.Network = printer.Dummy = NullSerial
+    escpos.printer = printer
+
+    selenium = types.ModuleType("selenium")
+    webdriver = types.ModuleType("selenium.webdriver")
+    chrome = types.ModuleType("selenium.webdriver.chrome")
+    options = types.ModuleType("selenium.webdriver.chrome.options")
+    common = types.ModuleType("selenium.webdriver.common")
+    by = types.ModuleType("selenium.webdriver.common.by")
+    webdriver.Chrome = StubChrome
+    options.Options = _Options
+    by.By = types.SimpleNamespace(ID="id", TAG_NAME="tag name", CSS_SELECTOR="css selector")
+    common_pkg = types.ModuleType("selenium.common")
+    exceptions = types.ModuleType("selenium.common.exceptions")
+    exceptions.WebDriverException = type("WebDriverException", (Exception,), {})
+    selenium.common, common_pkg.exceptions = common_pkg, exceptions
+    selenium.webdriver = webdriver
+    webdriver.chrome, chrome.options = chrome, options
+    webdriver.common, common.by = common, by
+    return {"escpos": escpos, "escpos.printer": printer, "selenium": selenium,
+            "selenium.webdriver": webdriver, "selenium.webdriver.chrome": chrome,
+            "selenium.webdriver.chrome.options": options, "selenium.webdriver.common": common,
+            "selenium.webdriver.common.by": by, "selenium.common": common_pkg,
+            "selenium.common.exceptions": exceptions}
+
+
+def install():
+    """Register every stand-in in sys.modules (replacing any real module)."""
+    for modules in (_tk_modules(), _mysql_modules(), _device_modules()):
+        sys.modules.update(modules)
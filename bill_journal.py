@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+
+COMMIT_INTERVAL = 0.05   # seconds a burst of mutations is gathered before one fsync
+
+
+def read_journal(path):
+    """Records of a journal file in order; a torn last line from a crash is ignored."""
+    records = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+    except FileNotFoundError:
+        pass
+    return records
+
+
+# ---------------- Open Bill Journal ----------------
+class BillJournal:
+    """Append-only log of open-bill mutations, replayed on startup after a crash.
+
+    log() only appends to an in-memory list; a writer thread group-commits
+    everything logged during COMMIT_INTERVAL with a single write + fsync, so
+    no disk I/O happens on the keystroke path. compact() rewrites the file
+    from a snapshot of the open bills so it never grows without bound.
+
+    Ops: add(pid, name_hi, price), qty(pid, qty), price(pid, price),
+    delete(pid), clear, customer(name).
+    """
+
+    def __init__(self, path, commit_interval=COMMIT_INTERVAL):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.records = len(read_journal(path))   # records written since the last compaction
+        self._pending = []
+        self._lock = threading.Lock()      # guards _pending
+        self._io_lock = threading.Lock()   # guards the file
+        self._wake = threading.Event()
+        self._closed = False
+        self._file = open(path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="bill-journal", daemon=True)
+        self._thread.start()
+
+    def log(self, bill, op, **fields):
+        fields["bill"], fields["op"] = bill, op
+        line = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._pending.append(line)
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait()
+            time.sleep(self.commit_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write and fsync everything logged so far."""
+        with self._io_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines or self._file.closed:
+                return
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.records += len(lines)
+
+    def compact(self, bills):
+        """Replace the log with the current state.
+
+        bills: {bill: (customer_name, [(pid, name_hi, price, qty), ...])}. Must be
+        called from the thread that logs, so every pending record is already
+        reflected in the snapshot and can be dropped.
+        """
+        lines = []
+        for bill, (customer, items) in bills.items():
+            if customer:
+                lines.append({"bill": bill, "op": "customer", "name": customer})
+            for pid, name_hi, price, qty in items:
+                lines.append({"bill": bill, "op": "add", "pid": pid, "name_hi": name_hi, "price": price})
+                if qty != 1:
+                    lines.append({"bill": bill, "op": "qty", "pid": pid, "qty": qty})
+        tmp = self.path + ".tmp"
+        with self._io_lock:
+            with self._lock:
+                self._pending = []
+            with open(tmp, "w", encoding="utf-8") as f:
+                for rec in lines:
+                    f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self.records = len(lines)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        with self._io_lock:
+            self._file.close()
@@ -0,0 +1,140 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def hundredths(value):
+    """Exact int count of hundredths: rupees -> paise, qty -> 1/100 units."""
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        return int(round(value * 100))
+    return int((Decimal(str(value)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def line_total(price_paise, qty_hundredths):
+    """Whole rupees charged for one line: price x qty rounded up (math.ceil), in integers."""
+    return -(-price_paise * qty_hundredths // 10000)
+
+
+def price_bills(bills):
+    """Grand totals of many bills at once, e.g. to replay wholesale orders.
+
+    Each bill is an iterable of (price, qty) in rupees and units; every total is
+    exactly what BillModel shows for the same lines.
+    """
+    h = hundredths
+    return [sum(line_total(h(price), h(qty)) for price, qty in bill) for bill in bills]
+
+
+# ---------------- Bill Line ----------------
+class BillLine:
+    __slots__ = ("pid", "name_hi", "price_paise", "qty_hundredths", "total")
+
+    def __init__(self, pid, name_hi, price_paise, qty_hundredths):
+        self.pid = pid
+        self.name_hi = name_hi
+        self.price_paise = price_paise
+        self.qty_hundredths = qty_hundredths
+        self.total = line_total(price_paise, qty_hundredths)
+
+    @property
+    def price(self):
+        return self.price_paise / 100
+
+    @property
+    def qty(self):
+        """Whole quantities as int, fractional ones as float (the way they are typed)."""
+        q = self.qty_hundredths
+        return q // 100 if q % 100 == 0 else q / 100
+
+    def retotal(self):
+        """Recompute the line total; returns how much it changed."""
+        old, self.total = self.total, line_total(self.price_paise, self.qty_hundredths)
+        return self.total - old
+
+
+# ---------------- Bill Model ----------------
+class BillModel:
+    """Line items of one open bill with the grand total kept up to date.
+
+    Independent of Tk: the bill panels only render what it holds. Prices and
+    quantities are stored as integer hundredths, so totals are exact. Every
+    mutation adjusts the running total by the difference of the one line it
+    touched, so the panel only has to repaint that line and its labels.
+    """
+
+    def __init__(self, lines=()):
+        self.lines = {}   # product id -> BillLine, in the order they were added
+        self.total = 0    # whole rupees
+        self.add_many(lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __contains__(self, pid):
+        return pid in self.lines
+
+    def __iter__(self):
+        return iter(self.lines.values())
+
+    @property
+    def count(self):
+        return len(self.lines)
+
+    def line(self, pid):
+        return self.lines[pid]
+
+    def add(self, pid, name_hi, price):
+        """Add a product, or bump its qty by one if already billed. Returns True for a new line."""
+        line = self.lines.get(pid)
+        if line:
+            line.qty_hundredths += 100
+            self.total += line.retotal()
+            return False
+        line = self.lines[pid] = BillLine(pid, name_hi, hundredths(price), 100)
+        self.total += line.total
+        return True
+
+    def add_many(self, lines):
+        """Bulk add of (pid, name_hi, price, qty); a repeated pid adds to its qty."""
+        for pid, name_hi, price, qty in lines:
+            line = self.lines.get(pid)
+            if line:
+                line.qty_hundredths += hundredths(qty)
+                self.total += line.retotal()
+            else:
+                line = self.lines[pid] = BillLine(pid, name_hi, hundredths(price), hundredths(qty))
+                self.total += line.total
+
+    def set_qty(self, pid, qty):
+        line = self.lines[pid]
+        line.qty_hundredths = hundredths(qty)
+        self.total += line.retotal()
+
+    def set_price(self, pid, price):
+        line = self.lines[pid]
+        line.price_paise = hundredths(price)
+        self.total += line.retotal()
+
+    def remove(self, pid):
+        """Drop a line; returns False if it was not on the bill."""
+        line = self.lines.pop(pid, None)
+        if line is None:
+            return False
+        self.total -= line.total
+        return True
+
+    def rows(self):
+        """(pid, name_hi, price, qty) per line; add_many(rows()) rebuilds the same bill."""
+        return [(l.pid, l.name_hi, l.price, l.qty) for l in self.lines.values()]
+
+    def copy(self):
+        """Independent snapshot, safe to hand to another thread."""
+        other = BillModel()
+        for pid, l in self.lines.items():
+            other.lines[pid] = BillLine(pid, l.name_hi, l.price_paise, l.qty_hundredths)
+        other.total = self.total
+        return other
+
+    def clear(self):
+        self.lines.clear()
+        self.total = 0
@@ -0,0 +1,132 @@
+from bisect import bisect_left, bisect_right
+
+from search import SearchIndex, normalize_text
+
+PATCH_RELOAD = 5000   # a change batch larger than this re-sorts the catalog instead of patching
+BARCODE_MAX = 32      # products.barcode is VARCHAR(32)
+
+
+def normalize_name(name):
+    """Normalize a product name the way add_to_bill compares it (trim + lowercase)."""
+    return normalize_text(name)
+
+
+def normalize_barcode(code):
+    """A barcode as stored: every space removed ('' for none)."""
+    return "".join(str(code or "").split())
+
+
+# ---------------- Product Catalog ----------------
+class ProductCatalog:
+    """Process-local copy of the products table.
+
+    Built once from the rows fetch_products() selects, so suggestions, the
+    product_tree filter and add_to_bill are served without a DB round-trip.
+    A scanned barcode is one dict lookup in by_barcode.
+    """
+
+    def __init__(self):
+        self.rows = []      # (id, name_en, name_hi, price, barcode) ordered by name_en
+        self.names = []     # name_en, parallel to rows
+        self.keys = []      # normalized name_en, parallel to rows (sorted)
+        self.by_id = {}     # id -> row
+        self.by_name = {}   # normalized name_en -> row
+        self.by_barcode = {}  # barcode -> row, for products that have one
+        self.index = SearchIndex()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def load(self, rows):
+        """Replace the whole catalog with rows of (id, name_en, name_hi, price, barcode)."""
+        rows = sorted((tuple(r) for r in rows), key=lambda r: normalize_name(r[1]))
+        self.rows = rows
+        self.names = [r[1] for r in rows]
+        self.keys = [normalize_name(r[1]) for r in rows]
+        self.by_id = {r[0]: r for r in rows}
+        self.by_name = dict(zip(self.keys, rows))
+        self.by_barcode = {r[4]: r for r in rows if r[4]}
+        self.index.build(rows)
+
+    def extend(self, rows):
+        """Add a chunk of a catalog that is streaming in name order.
+
+        A chunk that sorts after everything loaded so far is appended; one that
+        would interleave (server collation differs from ours) rebuilds the catalog.
+        """
+        rows = sorted((tuple(r) for r in rows), key=lambda r: normalize_name(r[1]))
+        if not rows:
+            return
+        keys = [normalize_name(r[1]) for r in rows]
+        if self.keys and keys[0] < self.keys[-1]:
+            return self.load(self.rows + rows)
+        self.rows.extend(rows)
+        self.names.extend(r[1] for r in rows)
+        self.keys.extend(keys)
+        self.by_id.update((r[0], r) for r in rows)
+        self.by_name.update(zip(keys, rows))
+        self.by_barcode.update((r[4], r) for r in rows if r[4])
+        self.index.extend(rows)
+
+    def patch(self, rows, deleted=()):
+        """Apply changed rows (by id, added or updated) and deleted ids in place."""
+        if len(rows) + len(deleted) > PATCH_RELOAD:
+            by_id = dict(self.by_id)
+            by_id.update((r[0], tuple(r)) for r in rows)
+            for product_id in deleted:
+                by_id.pop(product_id, None)
+            return self.load(by_id.values())
+        for row in rows:
+            row = tuple(row)
+            self._drop(row[0])
+            key = normalize_name(row[1])
+            i = bisect_right(self.keys, key)
+            self.rows.insert(i, row)
+            self.names.insert(i, row[1])
+            self.keys.insert(i, key)
+            self.by_id[row[0]] = row
+            self.by_name[key] = row
+            if row[4]:
+                self.by_barcode[row[4]] = row
+            self.index.upsert(row)
+        for product_id in deleted:
+            self._drop(product_id)
+            self.index.remove(product_id)
+
+    def _drop(self, product_id):
+        row = self.by_id.pop(product_id, None)
+        if row is None:
+            return
+        key = normalize_name(row[1])
+        i = bisect_left(self.keys, key)
+        while self.rows[i][0] != product_id:
+            i += 1
+        del self.rows[i], self.names[i], self.keys[i]
+        if self.by_name.get(key) is row:
+            del self.by_name[key]
+        if row[4] and self.by_barcode.get(row[4]) is row:
+            del self.by_barcode[row[4]]
+
+    def get(self, product_id):
+        return self.by_id.get(product_id)
+
+    def lookup(self, name_en):
+        """Exact (case-insensitive) name lookup, same rule as LOWER(name_en)=LOWER(%s)."""
+        return self.by_name.get(normalize_name(name_en))
+
+    def lookup_barcode(self, code):
+        return self.by_barcode.get(normalize_barcode(code))
+
+    def prefix(self, typed):
+        """Rows whose name starts with typed, using the sorted key array."""
+        typed = normalize_name(typed)
+        start = bisect_left(self.keys, typed)
+        end = bisect_left(self.keys, typed + "\uffff", start)
+        return self.rows[start:end]
+
+    def search(self, typed, limit=None, boost=None):
+        """Ranked rows matching typed in name_en or name_hi; all rows if typed is empty.
+
+        boost ({id: weight}) puts those products first within each match rank.
+        """
+        return self.index.search(typed, limit, boost)
@@ -0,0 +1,423 @@
+"""Catalog service: one process on the shop LAN serves every terminal's catalog reads.
+
+    python catalog_service.py --listen 0.0.0.0:8765 --db-host 192.168.1.10
+
+Terminals started with POS_CATALOG_SERVICE=host:8765 load the catalog, look
+products up and get product changes from here, so MySQL sees only their
+writes plus this service's own change-feed poll.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+
+from catalog import ProductCatalog
+from db import Database, FeedExpired
+from metrics import log, metrics
+from migrations import migrate
+
+DEFAULT_PORT = 8765
+POLL_SECS = 0.5          # how often the service asks MySQL's change feed for news
+CHANGE_LOG = 256         # change sets kept for terminals catching up
+CONNECT_TIMEOUT = 2.0    # seconds; a terminal falls back to MySQL when the service is away
+CALL_TIMEOUT = 10.0
+RECONNECT_SECS = 2.0     # subscriber retry delay
+PRUNE_SECS = 24 * 3600   # old tombstones are deleted at start and this often
+
+
+# ---------------- Wire format ----------------
+# One JSON object per line, both ways, on a kept-alive TCP connection.
+#   request  {"id": n, "ops": [[op, arg, ...], ...]}   several ops per round trip
+#   response {"id": n, "results": [...]} or {"id": n, "error": "..."}
+#   push     {"push": [since, version, rows, deleted]} to connections that subscribed
+# "changes" answers null when the feed no longer reaches back that far (FeedExpired).
+# Rows travel as [id, name_en, name_hi, "price", barcode].
+def encode_row(row):
+    return [row[0], row[1], row[2], str(row[3]), row[4]]
+
+
+def decode_row(row):
+    return (row[0], row[1], row[2], Decimal(row[3]), row[4]) if row else None
+
+
+def merge_changes(sets):
+    """One (rows, deleted) from consecutive change sets [(rows, deleted), ...], later ones winning."""
+    changed, deleted = {}, set()
+    for rows, gone in sets:
+        for row in rows:
+            changed[row[0]] = row
+            deleted.discard(row[0])
+        for pid in gone:
+            changed.pop(pid, None)
+            deleted.add(pid)
+    return list(changed.values()), sorted(deleted)
+
+
+def _send(sock, lock, message):
+    data = (json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    with lock:
+        sock.sendall(data)
+
+
+# ---------------- Service ----------------
+class CatalogService:
+    """The products table in memory, kept current from the change feed.
+
+    A poller thread is the only reader of MySQL: it applies each change set
+    to the catalog, logs it (for changes()) and pushes it to subscribers.
+    Request handlers run on one thread per terminal connection.
+    """
+
+    def __init__(self, database, poll_secs=POLL_SECS):
+        self.db = database
+        self.poll_secs = poll_secs
+        self.catalog = ProductCatalog()
+        self.version = 0
+        self.log = deque(maxlen=CHANGE_LOG)   # (since, version, rows, deleted)
+        self.subscribers = {}                 # socket -> send lock
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._prune_at = 0.0
+
+    def start(self):
+        migrate(self.db)
+        self.prune()
+        self.reload()
+        threading.Thread(target=self._poll, name="catalog-service-poll", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def poll_now(self):
+        """Ask the feed right away (a terminal just wrote a product)."""
+        self._wake.set()
+
+    def reload(self):
+        """The whole catalog from MySQL; older change sets are forgotten."""
+        version = self.db.feed_version()
+        rows = self.db.fetch_catalog()
+        with self._lock:
+            self.catalog.load(rows)
+            self.version = version
+            self.log.clear()
+
+    def prune(self):
+        self._prune_at = time.monotonic() + PRUNE_SECS
+        try:
+            self.db.prune_feed()
+        except Exception as e:
+            log.warning("Old tombstones not pruned: %s", e)
+
+    def _poll(self):
+        while not self._stopped:
+            self._wake.wait(self.poll_secs)
+            self._wake.clear()
+            try:
+                if time.monotonic() >= self._prune_at:
+                    self.prune()
+                self.pull()
+            except Exception as e:
+                log.warning("Change feed poll failed: %s", e)
+                time.sleep(self.poll_secs)
+
+    def pull(self):
+        since = self.version
+        try:
+            version, rows, deleted = self.db.changes_since(since)
+        except FeedExpired:
+            return self.reload()   # away longer than the tombstones are kept
+        if version == since:
+            return
+        with self._lock:
+            if rows or deleted:
+                self.catalog.patch(rows, deleted)
+            self.version = version
+            self.log.append((since, version, rows, deleted))
+            subscribers = list(self.subscribers.items())
+        push = {"push": [since, version, [encode_row(r) for r in rows], list(deleted)]}
+        for sock, lock in subscribers:
+            try:
+                _send(sock, lock, push)
+            except OSError:
+                self.unsubscribe(sock)
+
+    def subscribe(self, sock, lock):
+        with self._lock:
+            self.subscribers[sock] = lock
+            return self.version
+
+    def unsubscribe(self, sock):
+        with self._lock:
+            self.subscribers.pop(sock, None)
+
+    def changes(self, since):
+        """(version, rows, deleted) after since: from the log, or once from MySQL if it is older."""
+        with self._lock:
+            version = self.version
+            if since >= version:
+                return version, [], []
+            sets = [entry for entry in self.log if entry[1] > since]
+            if sets and sets[0][0] == since:
+                rows, deleted = merge_changes([(e[2], e[3]) for e in sets])
+                return version, rows, deleted
+        try:
+            return self.db.changes_since(since)
+        finally:
+            self.db.release()   # a handler thread per terminal would otherwise keep a pooled connection each
+
+    # --- ops ---
+    def op_version(self):
+        return self.version
+
+    def op_catalog(self):
+        with self._lock:
+            return {"version": self.version, "rows": [encode_row(r) for r in self.catalog.rows]}
+
+    def op_changes(self, since):
+        try:
+            version, rows, deleted = self.changes(since)
+        except FeedExpired:
+            return None
+        return [version, [encode_row(r) for r in rows], list(deleted)]
+
+    def op_name(self, name_en):
+        row = self.catalog.lookup(name_en)
+        return encode_row(row) if row else None
+
+    def op_barcode(self, code):
+        row = self.catalog.lookup_barcode(code)
+        return encode_row(row) if row else None
+
+    def op_ids(self, ids):
+        with self._lock:
+            return [encode_row(r) for r in map(self.catalog.get, ids) if r]
+
+    def op_search(self, text, limit):
+        with self._lock:
+            return [encode_row(r) for r in self.catalog.search(text, limit)]
+
+    def op_poll(self):
+        self.poll_now()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service, sock, lock = self.server.service, self.request, threading.Lock()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            for line in self.rfile:
+                request = None
+                try:
+                    request = json.loads(line)
+                    results = []
+                    for op, *args in request["ops"]:
+                        metrics.count(f"service.{op}")
+                        if op == "subscribe":
+                            results.append(service.subscribe(sock, lock))
+                        else:
+                            results.append(getattr(service, "op_" + op)(*args))
+                    reply = {"id": request.get("id"), "results": results}
+                except Exception as e:
+                    reply = {"id": request.get("id") if isinstance(request, dict) else None, "error": str(e)}
+                _send(sock, lock, reply)
+        except OSError:
+            pass
+        finally:
+            service.unsubscribe(sock)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(service, host="127.0.0.1", port=DEFAULT_PORT):
+    """Serve service on host:port from a daemon thread; returns the server (port 0 = any free port)."""
+    server = _Server((host, port), _Handler)
+    server.service = service
+    threading.Thread(target=server.serve_forever, name="catalog-service", daemon=True).start()
+    return server
+
+
+# ---------------- Client ----------------
+class ServiceError(Exception):
+    pass
+
+
+class CatalogClient:
+    """A terminal's connection to the catalog service.
+
+    call() sends a batch of ops over one kept-alive connection (callers on
+    any thread take turns). A second connection subscribes to pushes; they
+    are kept so changes_since() can usually answer from memory, asking the
+    service only when a push was missed. Network errors surface as OSError,
+    so the caller can fall back to MySQL.
+    """
+
+    def __init__(self, host, port, timeout=CALL_TIMEOUT):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.version = None      # newest version seen on the push connection; None while it is down
+        self._pushed = deque(maxlen=CHANGE_LOG)   # (since, version, rows, deleted)
+        self._sock = self._file = None
+        self._next_id = 0
+        self._lock = threading.Lock()       # one request in flight on the call connection
+        self._push_lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._subscribe, name="catalog-service-push", daemon=True).start()
+
+    @classmethod
+    def from_address(cls, address):
+        host, _, port = address.rpartition(":")
+        return cls(host or "127.0.0.1", int(port or DEFAULT_PORT))
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        return sock, sock.makefile("rb")
+
+    def call(self, *ops):
+        """Results of ops ([op, arg, ...] each) from one round trip."""
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._sock, self._file = self._connect()
+                    self._next_id += 1
+                    self._sock.sendall((json.dumps({"id": self._next_id, "ops": [list(o) for o in ops]},
+                                                   ensure_ascii=False) + "\n").encode("utf-8"))
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("catalog service closed the connection")
+                    break
+                except OSError:
+                    self._drop()
+                    if attempt == 2:
+                        raise
+        reply = json.loads(line)
+        if "error" in reply:
+            raise ServiceError(reply["error"])
+        return reply["results"]
+
+    def _drop(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            self._drop()
+
+    # --- pushes ---
+    def _subscribe(self):
+        while not self._closed:
+            try:
+                sock, f = self._connect()
+                sock.settimeout(None)   # pushes come whenever products change
+                sock.sendall(b'{"id":0,"ops":[["subscribe"]]}\n')
+                for line in f:
+                    message = json.loads(line)
+                    with self._push_lock:
+                        if "push" in message:
+                            since, version, rows, deleted = message["push"]
+                            self._pushed.append((since, version, [decode_row(r) for r in rows], deleted))
+                            self.version = version
+                        elif "results" in message:
+                            self.version = message["results"][0]
+                            self._pushed.clear()
+            except (OSError, ValueError):
+                pass
+            with self._push_lock:
+                self.version = None
+            time.sleep(RECONNECT_SECS)
+
+    # --- reads ---
+    def catalog(self):
+        """(version, rows) of the whole catalog, in name order."""
+        result = self.call(["catalog"])[0]
+        return result["version"], [decode_row(r) for r in result["rows"]]
+
+    def feed_version(self):
+        return self.call(["version"])[0]
+
+    @metrics.timed("service.changes_since")
+    def changes_since(self, version):
+        """Like Database.changes_since; from the pushes when they cover it, else one request."""
+        with self._push_lock:
+            if self.version is None:
+                raise ConnectionError("not subscribed to the catalog service")
+            if self.version <= version:
+                return version, [], []
+            sets = [p for p in self._pushed if p[1] > version]
+            if sets and sets[0][0] == version and all(a[1] == b[0] for a, b in zip(sets, sets[1:])):
+                rows, deleted = merge_changes([(p[2], p[3]) for p in sets])
+                return sets[-1][1], rows, deleted
+        result = self.call(["changes", version])[0]
+        if result is None:
+            raise FeedExpired(f"catalog version {version} is older than the change feed keeps")
+        high, rows, deleted = result
+        return high, [decode_row(r) for r in rows], deleted
+
+    def product_by_name(self, name_en):
+        return decode_row(self.call(["name", name_en])[0])
+
+    def product_by_barcode(self, code):
+        return decode_row(self.call(["barcode", code])[0])
+
+    def product_by_id(self, product_id):
+        rows = self.products_by_ids([product_id])
+        return rows[0] if rows else None
+
+    def products_by_ids(self, ids):
+        return [decode_row(r) for r in self.call(["ids", list(ids)])[0]]
+
+    def search(self, text, limit):
+        return [decode_row(r) for r in self.call(["search", text, limit])[0]]
+
+    def poll_now(self):
+        """Have the service read the change feed now (after this terminal wrote)."""
+        self.call(["poll"])
+
+
+# ---------------- Command line ----------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve the products catalog to the POS terminals.")
+    ap.add_argument("--listen", default=f"0.0.0.0:{DEFAULT_PORT}", help="host:port to listen on")
+    ap.add_argument("--db-host", default=os.environ.get("POS_DB_HOST", "localhost"))
+    ap.add_argument("--db-user", default=os.environ.get("POS_DB_USER", "root"))
+    ap.add_argument("--db-password", default=os.environ.get("POS_DB_PASSWORD", "root"))
+    ap.add_argument("--db-name", default=os.environ.get("POS_DB_NAME", "cash_trader"))
+    ap.add_argument("--poll", type=float, default=POLL_SECS, help="seconds between change-feed polls")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s Catalog service: %(message)s")
+    database = Database({"host": args.db_host, "user": args.db_user,
+                         "password": args.db_password, "database": args.db_name}, pool_name="catalog-service")
+    service = CatalogService(database, args.poll).start()
+    host, _, port = args.listen.rpartition(":")
+    server = serve(service, host or "0.0.0.0", int(port))
+    log.info("%s products at version %s, listening on %s:%d", f"{len(service.catalog):,}", service.version,
+             host or "0.0.0.0", server.server_address[1])
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        service.stop()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import queue
+import sqlite3
+import threading
+from decimal import Decimal
+
+from catalog import normalize_name
+from metrics import log
+
+SNAPSHOT_SCHEMA = 1
+MMAP_BYTES = 256 * 1024 * 1024   # let SQLite read the file through mmap
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY, sort_key TEXT NOT NULL, name_en TEXT NOT NULL,
+    name_hi TEXT NOT NULL, price TEXT NOT NULL, barcode TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS products_sort_key ON products (sort_key);
+"""
+
+
+# ---------------- Catalog Snapshot ----------------
+class CatalogSnapshot:
+    """Local SQLite copy of the products table at a change-feed version.
+
+    Startup reads it (mmap'd, in name order) so search and billing work
+    before MySQL answers, and the change feed then only has to bring it up
+    from its version. Writes (a full replace after a reload, a patch after
+    each sync) go through one writer thread so the Tk thread never waits on
+    disk. source names the database it was taken from; a snapshot of
+    another database is ignored.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self.queued_version = None   # version of the last write handed to the writer
+        self._ops = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    # --- reading (any thread, own connection) ---
+    def version(self):
+        """Feed version the snapshot reflects, or None if there is no usable snapshot."""
+        conn = self._connect()
+        try:
+            meta = dict(conn.execute("SELECT name, value FROM meta"))
+        finally:
+            conn.close()
+        if meta.get("schema") != str(SNAPSHOT_SCHEMA) or meta.get("source") != self.source \
+                or meta.get("version") is None:
+            return None
+        return int(meta["version"])
+
+    def iter_rows(self, chunk_size):
+        """Rows (id, name_en, name_hi, price, barcode) in catalog order, chunk_size at a time."""
+        conn = self._connect()
+        try:
+            cur = conn.execute("SELECT id, name_en, name_hi, price, barcode FROM products ORDER BY sort_key, id")
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [(pid, en, hi, Decimal(price), barcode) for pid, en, hi, price, barcode in rows]
+        finally:
+            conn.close()
+
+    # --- writing (queued for the writer thread) ---
+    def replace(self, version, rows):
+        """Make the snapshot exactly rows at version (rows must not change afterwards)."""
+        self.queued_version = version
+        self._submit(("replace", version, rows, ()))
+
+    def patch(self, version, rows, deleted=()):
+        """Apply one change-feed result on top of the snapshot; a sync that found nothing is skipped."""
+        if not rows and not deleted and version == self.queued_version:
+            return
+        self.queued_version = version
+        self._submit(("patch", version, rows, deleted))
+
+    def clear(self):
+        self.queued_version = None
+        self._submit(("clear", None, (), ()))
+
+    def flush(self):
+        """Block until every queued write is on disk."""
+        done = threading.Event()
+        self._submit(("flush", done, (), ()))
+        done.wait()
+
+    def _submit(self, op):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+                self._thread.start()
+        self._ops.put(op)
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            kind, version, rows, deleted = self._ops.get()
+            if kind == "flush":
+                version.set()
+                continue
+            try:
+                with conn:
+                    self._write(conn, kind, version, rows, deleted)
+            except sqlite3.Error as e:
+                log.warning("Catalog snapshot not saved: %s", e)
+
+    def _write(self, conn, kind, version, rows, deleted):
+        if kind in ("replace", "clear"):
+            conn.execute("DELETE FROM products")
+            conn.execute("DELETE FROM meta")
+            if kind == "clear":
+                return
+        elif conn.execute("SELECT 1 FROM meta WHERE name='version'").fetchone() is None:
+            return   # nothing to patch yet; the next full load writes the snapshot
+        conn.executemany("INSERT OR REPLACE INTO products VALUES (?,?,?,?,?,?)",
+                         [(r[0], normalize_name(r[1]), r[1], r[2], str(r[3]), r[4]) for r in rows])
+        conn.executemany("DELETE FROM products WHERE id=?", [(pid,) for pid in deleted])
+        conn.executemany("INSERT OR REPLACE INTO meta VALUES (?,?)",
+                         [("schema", str(SNAPSHOT_SCHEMA)), ("source", self.source), ("version", str(version))])
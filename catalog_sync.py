@@ -0,0 +1,96 @@
+import queue
+import threading
+
+SYNC_INTERVAL_MS = 3000   # how often each terminal asks the feed for changes
+COLLECT_MS = 25           # Tk-side poll while a pull is in flight
+
+
+# ---------------- Catalog Sync ----------------
+class CatalogSync:
+    """Keeps the cached catalog current from the products change feed.
+
+    The Tk thread owns the feed version: every SYNC_INTERVAL_MS (or on now())
+    it hands the version to a worker thread, which runs pull(version) on its
+    own connection. The result is collected on the Tk thread and passed to
+    apply(changes), which patches the catalog and widgets in place. A result
+    pulled from a version that has since been reset (full reload) is dropped.
+    """
+
+    def __init__(self, root, pull, apply, interval_ms=SYNC_INTERVAL_MS, on_error=None):
+        self.root = root
+        self.pull = pull            # version -> (new_version, rows, deleted ids); worker thread
+        self.apply = apply          # called on the Tk thread with that tuple
+        self.on_error = on_error    # called on the Tk thread with the exception
+        self.interval_ms = interval_ms
+        self.version = None         # feed position the catalog reflects; None until start()
+        self.busy = False
+        self._again = False
+        self._timer = None
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        threading.Thread(target=self._run, name="catalog-sync", daemon=True).start()
+
+    def start(self, version):
+        """Begin (or restart after a full reload) polling from version."""
+        self.version = version
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+        self._timer = self.root.after(self.interval_ms, self._tick)
+
+    def pause(self):
+        """Stop polling until the next start(); a pull already in flight is discarded."""
+        self.version = None
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+
+    def now(self):
+        """Pull right away, e.g. after this terminal wrote a product."""
+        if self.version is None:
+            return
+        if self.busy:
+            self._again = True
+        else:
+            self._request()
+
+    def stop(self):
+        self.pause()
+        self._requests.put(None)
+
+    def _tick(self):
+        self._timer = self.root.after(self.interval_ms, self._tick)
+        if not self.busy:
+            self._request()
+
+    def _request(self):
+        self.busy = True
+        self._requests.put(self.version)
+        self.root.after(COLLECT_MS, self._collect)
+
+    def _collect(self):
+        try:
+            since, result = self._results.get_nowait()
+        except queue.Empty:
+            self.root.after(COLLECT_MS, self._collect)
+            return
+        self.busy = False
+        if isinstance(result, Exception):
+            if self.on_error:
+                self.on_error(result)
+        elif since == self.version:
+            self.version = result[0]
+            self.apply(result)
+        if self._again and self.version is not None:
+            self._again = False
+            self._request()
+
+    def _run(self):
+        while True:
+            since = self._requests.get()
+            if since is None:
+                return
+            try:
+                result = self.pull(since)
+            except Exception as e:
+                result = e
+            self._results.put((since, result))
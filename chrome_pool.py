@@ -0,0 +1,131 @@
+import io
+import queue
+import threading
+
+from metrics import log, metrics
+
+POOL_SIZE = 1          # warm browsers; one is plenty for a single spooler thread
+MAX_JOBS = 200         # renders before a browser is replaced (Chrome grows with every page)
+WINDOW_WIDTH = 800
+MIN_WINDOW_HEIGHT = 6000
+
+# replaces the blank page's document in place: no file, no navigation
+_WRITE = "document.open(); document.write(arguments[0]); document.close();"
+# resolves once web fonts are in, so Devanagari is shaped before the screenshot
+_FONTS_READY = "const done = arguments[arguments.length - 1]; document.fonts.ready.then(() => done(true));"
+
+
+class _Browser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.jobs = 0
+        self.height = 0
+
+
+# ---------------- Chrome Pool ----------------
+class ChromePool:
+    """Headless Chrome instances kept running between receipts.
+
+    render() borrows a browser, writes the HTML into its open page and takes
+    the element screenshot as PNG bytes straight into PIL, so a print costs
+    the page render rather than a browser launch, and nothing touches disk.
+    A browser is replaced after max_jobs renders, or as soon as it fails (the
+    job is then retried once on a fresh one). Needs selenium; safe to call
+    from any thread.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_jobs=MAX_JOBS, driver_path=None):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.driver_path = driver_path
+        self._idle = queue.LifoQueue()   # most recently used first: its page is warmest
+        self._slots = threading.Semaphore(size)
+        self._closed = False
+
+    def _launch(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        opts = Options()
+        opts.add_argument("--headless=new")
+        opts.add_argument(f"--window-size={WINDOW_WIDTH},{MIN_WINDOW_HEIGHT}")
+        with metrics.time("print.chrome_start"):
+            driver = (webdriver.Chrome(executable_path=self.driver_path, options=opts) if self.driver_path
+                      else webdriver.Chrome(options=opts))
+        driver.set_script_timeout(5)
+        browser = _Browser(driver)
+        browser.height = MIN_WINDOW_HEIGHT
+        return browser
+
+    def _retire(self, browser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+
+    def warm(self):
+        """Start the browsers in the background, so the first receipt does not wait for them."""
+        def start():
+            for _ in range(self.size):
+                if not self._slots.acquire(blocking=False):
+                    return
+                try:
+                    self._idle.put(self._launch())
+                except Exception as e:
+                    log.warning("Headless Chrome not started: %s", e)
+                    return
+                finally:
+                    self._slots.release()
+        threading.Thread(target=start, name="chrome-warm", daemon=True).start()
+
+    def render(self, html, element_id="receipt", height=MIN_WINDOW_HEIGHT):
+        """PIL image of the element_id element of html, in a window at least height px tall."""
+        from selenium.common.exceptions import WebDriverException
+
+        with self._slots:
+            for attempt in (1, 2):
+                try:
+                    browser = self._idle.get_nowait()
+                except queue.Empty:
+                    browser = self._launch()
+                try:
+                    img = self._render(browser, html, element_id, height)
+                except WebDriverException:
+                    metrics.count("print.chrome_recycled")
+                    self._retire(browser)   # crashed or hung: the next try gets a fresh browser
+                    if attempt == 2:
+                        raise
+                    continue
+                browser.jobs += 1
+                if browser.jobs >= self.max_jobs or self._closed:
+                    self._retire(browser)
+                else:
+                    self._idle.put(browser)
+                return img
+
+    def _render(self, browser, html, element_id, height):
+        from PIL import Image
+        from selenium.webdriver.common.by import By
+
+        driver = browser.driver
+        if height > browser.height:   # only ever grows, so most jobs skip the resize
+            driver.set_window_size(WINDOW_WIDTH, height)
+            browser.height = height
+        with metrics.time("print.chrome_load"):
+            driver.execute_script(_WRITE, html)
+            driver.execute_async_script(_FONTS_READY)
+            elem = driver.find_element(By.ID, element_id)
+        with metrics.time("print.chrome_screenshot"):
+            png = elem.screenshot_as_png
+        img = Image.open(io.BytesIO(png))
+        img.load()
+        return img
+
+    def close(self):
+        """Quit the idle browsers; ones still rendering quit when they finish."""
+        self._closed = True
+        while True:
+            try:
+                self._retire(self._idle.get_nowait())
+            except queue.Empty:
+                return
@@ -0,0 +1,371 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errorcode, pooling
+
+from metrics import metrics
+from search import normalize_text
+
+POOL_SIZE = 5
+HEALTH_CHECK_SECS = 30   # ping a connection that sat idle longer than this before reusing it
+TOMBSTONE_DAYS = 30      # deletions are kept this long; a terminal further behind reloads the catalog
+
+# errors after which the connection is dead: it is dropped, and a read is retried on a new one
+_LOST = {errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST,
+         errorcode.CR_CONN_HOST_ERROR, errorcode.CR_CONNECTION_ERROR}
+ER_UNKNOWN_STMT_HANDLER = 1243   # a prepared statement the server forgot (new session): same remedy
+
+# ---------------- Hot queries (server-side prepared) ----------------
+# rows are (id, name_en, name_hi, price, barcode); a product without a barcode has ''
+SQL_CATALOG = "SELECT id, name_en, name_hi, price, COALESCE(barcode, '') FROM products ORDER BY name_en ASC"
+# name_key is LOWER(TRIM(name_en)), generated and indexed (migrations.py); the same
+# functions on the parameter keep the lookup an index seek
+SQL_PRODUCT_BY_NAME = ("SELECT id, name_en, name_hi, price, COALESCE(barcode, '') FROM products "
+                       "WHERE name_key=LOWER(TRIM(%s))")
+SQL_PRODUCT_BY_ID = "SELECT id, name_en, name_hi, price, COALESCE(barcode, '') FROM products WHERE id=%s"
+SQL_PRODUCT_BY_BARCODE = "SELECT id, name_en, name_hi, price, COALESCE(barcode, '') FROM products WHERE barcode=%s"
+SQL_PRODUCTS_BY_IDS = "SELECT id, name_en, name_hi, price, COALESCE(barcode, '') FROM products WHERE id IN ({})"
+
+# ---------------- Server-side search ----------------
+# Keyset pages in (name_key, id) order: name prefixes first (a range scan of
+# idx_products_name_key), then the other matches of the n-gram FULLTEXT index.
+# Each page carries the last (name_key, id) it returned, so the next one seeks
+# past it instead of counting an OFFSET.
+NGRAM_MIN = 2   # ngram_token_size; shorter text only gets the prefix phase
+_SEARCH_COLUMNS = "SELECT id, name_en, name_hi, price, COALESCE(barcode, ''), name_key FROM products WHERE "
+_AFTER = " AND (name_key > %s OR (name_key = %s AND id > %s))"
+_PAGE = " ORDER BY name_key, id LIMIT %s"
+SQL_SEARCH_PREFIX = _SEARCH_COLUMNS + "name_key LIKE %s" + _PAGE
+SQL_SEARCH_PREFIX_AFTER = _SEARCH_COLUMNS + "name_key LIKE %s" + _AFTER + _PAGE
+_MATCH = "MATCH(name_en, name_hi) AGAINST (%s IN BOOLEAN MODE) AND name_key NOT LIKE %s"
+SQL_SEARCH_MATCH = _SEARCH_COLUMNS + _MATCH + _PAGE
+SQL_SEARCH_MATCH_AFTER = _SEARCH_COLUMNS + _MATCH + _AFTER + _PAGE
+SQL_ESTIMATED_ROWS = ("SELECT TABLE_ROWS FROM information_schema.TABLES"
+                      " WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s")
+
+
+def like_prefix(text):
+    """LIKE pattern for "starts with text", with LIKE's own wildcards escaped."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def ngram_phrase(text):
+    """BOOLEAN MODE phrase for text: with the ngram parser, rows containing it as a substring."""
+    return '"' + text.replace('"', " ") + '"'
+
+
+# ---------------- Change feed ----------------
+# Every write to products bumps one counter row; the row lock is held until commit,
+# so versions become visible in order and "version > last seen" never skips a change.
+SQL_FEED_VERSION = "SELECT version FROM catalog_version WHERE id=1"
+# pruned: the newest version whose tombstones are gone; a terminal behind it cannot be caught up
+SQL_FEED_STATE = "SELECT version, pruned FROM catalog_version WHERE id=1"
+SQL_CHANGED_PRODUCTS = ("SELECT id, name_en, name_hi, price, COALESCE(barcode, '') FROM products "
+                        "WHERE version > %s AND version <= %s ORDER BY version")
+SQL_TOMBSTONES = "SELECT product_id FROM product_tombstones WHERE version > %s AND version <= %s"
+SQL_OLD_TOMBSTONES = "SELECT MAX(version) FROM product_tombstones WHERE deleted_at < CURRENT_TIMESTAMP - INTERVAL %s DAY"
+
+
+class FeedExpired(Exception):
+    """The feed no longer has the deletions after this version: reload the whole catalog."""
+
+
+def _is_lost(e):
+    if isinstance(e, mysql.connector.Error) and e.errno == ER_UNKNOWN_STMT_HANDLER:
+        return True
+    return isinstance(e, (mysql.connector.OperationalError, mysql.connector.InterfaceError)) and (
+        e.errno in _LOST or e.errno is None or e.errno == -1)
+
+
+def _quietly(fn):
+    """Run a cleanup call (rollback, close) that may fail on a dead connection."""
+    try:
+        fn()
+    except Exception:
+        pass
+
+
+class _ThreadConn:
+    """A pooled connection owned by one thread, plus its prepared cursors."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.prepared = {}   # sql -> MySQLCursorPrepared (statement stays prepared on the server)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        for cur in self.prepared.values():
+            _quietly(cur.close)
+        _quietly(self.conn.close)   # returns it to the pool
+
+
+# ---------------- Database ----------------
+class Database:
+    """Thread-safe access to MySQL through a connection pool.
+
+    Each thread gets its own pooled connection, so the Tk thread and background
+    workers never share a cursor. Idle connections are pinged before reuse; a
+    connection found dead, there or by any statement, is replaced together
+    with its prepared statements (they do not survive a new server session).
+    Reads that hit a lost connection are retried once on the fresh one; writes
+    are not, as the server may already have applied them. Hot queries run as
+    server-side prepared statements, parsed once per connection.
+    """
+
+    def __init__(self, config, pool_size=POOL_SIZE, pool_name="pos"):
+        self.config, self.pool_size, self.pool_name = config, pool_size, pool_name
+        self.pool = None   # opened by the first statement: a terminal that only reads the catalog service never connects
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self):
+        with self._pool_lock:
+            if self.pool is None:
+                self.pool = pooling.MySQLConnectionPool(pool_name=self.pool_name, pool_size=self.pool_size,
+                                                        **self.config)
+        return self.pool.get_connection()
+
+    # --- connections ---
+    def _conn(self):
+        tc = getattr(self._local, "tc", None)
+        if tc is None:
+            tc = self._local.tc = _ThreadConn(self._connection())
+        elif time.monotonic() - tc.last_used > HEALTH_CHECK_SECS:
+            try:
+                tc.conn.ping(reconnect=False)
+            except Exception:
+                metrics.count("db.reconnects")
+                self.release()
+                tc = self._local.tc = _ThreadConn(self._connection())
+        tc.last_used = time.monotonic()
+        return tc
+
+    def release(self):
+        """Give this thread's connection back to the pool (call when a worker thread ends)."""
+        tc = getattr(self._local, "tc", None)
+        if tc is not None:
+            self._local.tc = None
+            tc.close()
+
+    def _dropped(self, e):
+        """True (and this thread's connection released) if e means the connection is dead."""
+        if not _is_lost(e):
+            return False
+        metrics.count("db.reconnects")
+        self.release()
+        return True
+
+    def _run(self, fn, retry=True):
+        """Run fn(thread_conn); a lost connection is replaced, and fn retried once if retry."""
+        try:
+            return fn(self._conn())
+        except Exception as e:
+            if not self._dropped(e) or not retry:
+                raise
+            return fn(self._conn())
+
+    # --- statements ---
+    @metrics.timed("db.query")
+    def query(self, sql, params=(), prepared=False):
+        """SELECT returning all rows; prepared=True keeps the statement prepared server-side."""
+        def run(tc):
+            if prepared:
+                cur = tc.prepared.get(sql)
+                if cur is None:
+                    cur = tc.prepared[sql] = tc.conn.cursor(prepared=True)
+                cur.execute(sql, params)
+                return cur.fetchall()
+            cur = tc.conn.cursor()
+            try:
+                cur.execute(sql, params)
+                return cur.fetchall()
+            finally:
+                cur.close()
+        return self._run(run)
+
+    def query_one(self, sql, params=(), prepared=False):
+        rows = self.query(sql, params, prepared)
+        return rows[0] if rows else None
+
+    @metrics.timed("db.execute")
+    def execute(self, sql, params=()):
+        """Single write statement, committed. Returns lastrowid.
+
+        Not retried after a lost connection: the write may have been applied.
+        """
+        def run(tc):
+            cur = tc.conn.cursor()
+            try:
+                cur.execute(sql, params)
+                tc.conn.commit()
+                return cur.lastrowid
+            except Exception:
+                _quietly(tc.conn.rollback)
+                raise
+            finally:
+                _quietly(cur.close)
+        return self._run(run, retry=False)
+
+    @contextmanager
+    def transaction(self):
+        """Cursor on this thread's connection; commits on success, rolls back on error.
+
+        The body is not retried; a lost connection is replaced for the next call.
+        """
+        cur = self._run(lambda tc: tc.conn.cursor())
+        tc = self._local.tc
+        try:
+            yield cur
+            tc.conn.commit()
+        except Exception as e:
+            _quietly(tc.conn.rollback)
+            self._dropped(e)
+            raise
+        finally:
+            _quietly(cur.close)
+
+    # --- hot paths ---
+    def fetch_catalog(self):
+        return self.query(SQL_CATALOG, prepared=True)
+
+    def iter_catalog(self, chunk_size):
+        """Stream the catalog in name order, chunk_size rows at a time.
+
+        Starting is retried on a lost connection; losing it mid-stream raises.
+        """
+        def start(tc):
+            cur = tc.conn.cursor()
+            try:
+                cur.execute(SQL_CATALOG)
+            except Exception:
+                _quietly(cur.close)
+                raise
+            return cur
+        cur = self._run(start)
+        try:
+            while True:
+                try:
+                    rows = cur.fetchmany(chunk_size)
+                except Exception as e:
+                    self._dropped(e)
+                    raise
+                if not rows:
+                    break
+                yield rows
+        finally:
+            _quietly(cur.close)
+
+    # --- schema ---
+    # (the schema itself is created and upgraded by migrations.migrate)
+    def has_table(self, table):
+        return bool(self.query_one(
+            "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE()"
+            " AND TABLE_NAME=%s", (table,))[0])
+
+    def has_column(self, table, column):
+        return bool(self.query_one(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE()"
+            " AND TABLE_NAME=%s AND COLUMN_NAME=%s", (table, column))[0])
+
+    def has_index(self, table, index):
+        return bool(self.query_one(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS WHERE TABLE_SCHEMA=DATABASE()"
+            " AND TABLE_NAME=%s AND INDEX_NAME=%s", (table, index))[0])
+
+    def estimated_rows(self, table="products"):
+        """InnoDB's row estimate for table: instant, unlike COUNT(*) over millions of rows."""
+        row = self.query_one(SQL_ESTIMATED_ROWS, (table,))
+        return int(row[0] or 0) if row else 0
+
+    # --- change feed ---
+
+    def feed_version(self):
+        """Current change-feed position; read it before a full catalog fetch."""
+        return self.query_one(SQL_FEED_VERSION)[0]
+
+    @metrics.timed("db.changes_since")
+    def changes_since(self, version):
+        """(new_version, changed rows, deleted ids) committed after version, from one snapshot."""
+        def run(tc):
+            cur = tc.conn.cursor()
+            try:
+                cur.execute(SQL_FEED_STATE)
+                high, pruned = cur.fetchone()
+                if version < pruned:
+                    raise FeedExpired(f"catalog version {version} is older than the change feed keeps ({pruned})")
+                rows, deleted = [], []
+                if high > version:
+                    cur.execute(SQL_CHANGED_PRODUCTS, (version, high))
+                    rows = cur.fetchall()
+                    cur.execute(SQL_TOMBSTONES, (version, high))
+                    deleted = [r[0] for r in cur.fetchall()]
+                tc.conn.commit()   # ends the read snapshot
+                return high, rows, deleted
+            except Exception:
+                _quietly(tc.conn.rollback)
+                raise
+            finally:
+                _quietly(cur.close)
+        return self._run(run)
+
+    def prune_feed(self, days=TOMBSTONE_DAYS):
+        """Delete tombstones older than days; returns how many. Run at startup, not per sync."""
+        with self.transaction() as cur:
+            cur.execute(SQL_OLD_TOMBSTONES, (days,))
+            horizon = cur.fetchone()[0]
+            if horizon is None:
+                return 0
+            # same lock order as the delete trigger: the counter row, then the tombstones
+            cur.execute("UPDATE catalog_version SET pruned = GREATEST(pruned, %s) WHERE id = 1", (horizon,))
+            cur.execute("DELETE FROM product_tombstones WHERE version <= %s", (horizon,))
+            return cur.rowcount
+
+    def product_by_name(self, name_en):
+        return self.query_one(SQL_PRODUCT_BY_NAME, (name_en,), prepared=True)
+
+    def product_by_id(self, product_id):
+        return self.query_one(SQL_PRODUCT_BY_ID, (product_id,), prepared=True)
+
+    def product_by_barcode(self, barcode):
+        return self.query_one(SQL_PRODUCT_BY_BARCODE, (barcode,), prepared=True)
+
+    def products_by_ids(self, ids):
+        ids = list(ids)
+        if not ids:
+            return []
+        return self.query(SQL_PRODUCTS_BY_IDS.format(",".join(["%s"] * len(ids))), ids)
+
+    @metrics.timed("db.search")
+    def search_products(self, text, limit, after=None):
+        """One page of matches for text, for a catalog too big to cache: (rows, next cursor).
+
+        Names starting with text come first, then names (English or Hindi)
+        containing it; both phases in name order. after is the cursor the
+        previous page returned; the next cursor is None once both phases are
+        exhausted. An empty text pages through the whole catalog.
+        """
+        key = normalize_text(text)
+        phase, last = after or (0, None)
+        rows = []
+        while len(rows) < limit and phase < 2:
+            if phase == 1 and len(key) < NGRAM_MIN:
+                phase = 2
+                break
+            want = limit - len(rows)
+            if phase == 0:
+                params = (like_prefix(key),)
+                sql = SQL_SEARCH_PREFIX_AFTER if last else SQL_SEARCH_PREFIX
+            else:
+                params = (ngram_phrase(key), like_prefix(key))
+                sql = SQL_SEARCH_MATCH_AFTER if last else SQL_SEARCH_MATCH
+            if last:
+                params += (last[0], last[0], last[1])
+            page = self.query(sql, params + (want,), prepared=True)
+            rows.extend(r[:5] for r in page)
+            if len(page) < want:
+                phase, last = phase + 1, None
+            else:
+                last = (page[-1][5], page[-1][0])
+        return rows, ((phase, last) if phase < 2 else None)
@@ -0,0 +1,126 @@
+from PIL import Image
+
+# ---------------- Tuning ----------------
+THRESHOLD = 160       # gray level below which a pixel prints black (crisp Devanagari strokes)
+FEED_MIN_ROWS = 6     # blank runs at least this tall become paper feeds
+V0_MAX_ROWS = 960     # rows per GS v 0 band (same fragment height python-escpos uses)
+BAUD_BITS = 10        # 8N1 serial: 10 line bits per byte
+
+ESC, GS = b"\x1b", b"\x1d"
+
+
+class EncodeReport:
+    """Byte counts for one encoded receipt, to see transfer time per bill."""
+
+    def __init__(self, raw_bytes, encoded_bytes, rows, trimmed_rows, fed_rows, bands):
+        self.raw_bytes = raw_bytes          # what a plain full-image GS v 0 would send
+        self.encoded_bytes = encoded_bytes
+        self.rows = rows
+        self.trimmed_rows = trimmed_rows    # blank rows cut from top and bottom
+        self.fed_rows = fed_rows            # blank rows sent as ESC J feeds
+        self.bands = bands                  # content bands, each sent as GS v 0
+
+    def seconds(self, baudrate, nbytes=None):
+        return (self.encoded_bytes if nbytes is None else nbytes) * BAUD_BITS / baudrate
+
+    def summary(self, baudrate):
+        saved = 100 - 100 * self.encoded_bytes / max(1, self.raw_bytes)
+        return (f"raster {self.encoded_bytes:,} B (was {self.raw_bytes:,} B, -{saved:.0f}%), "
+                f"~{self.seconds(baudrate):.1f}s at {baudrate} baud "
+                f"(was ~{self.seconds(baudrate, self.raw_bytes):.1f}s), "
+                f"{self.trimmed_rows} rows trimmed, {self.fed_rows} rows fed, "
+                f"{self.bands} bands")
+
+
+def to_mono(img, dither=False):
+    """1-bit image, black = 0. Text is thresholded; dither only for photos/logos."""
+    if img.mode == "1":
+        return img
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        bg = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(bg, img)
+    gray = img.convert("L")
+    if dither:
+        return gray.convert("1")
+    return gray.point(lambda v: 255 if v > THRESHOLD else 0, mode="1")
+
+
+def _v0(width_bytes, rows, data):
+    return GS + b"v0\x00" + bytes((width_bytes & 0xFF, width_bytes >> 8, rows & 0xFF, rows >> 8)) + data
+
+
+def _feed(rows):
+    out = b""
+    while rows > 0:
+        n = min(rows, 255)
+        out += ESC + b"J" + bytes((n,))
+        rows -= n
+    return out
+
+
+def _encode_band(width_bytes, rows, data):
+    """GS v 0 command(s) for one content band, split every V0_MAX_ROWS rows."""
+    return b"".join(_v0(width_bytes, min(V0_MAX_ROWS, rows - y),
+                        data[y * width_bytes:(y + min(V0_MAX_ROWS, rows - y)) * width_bytes])
+                    for y in range(0, rows, V0_MAX_ROWS))
+
+
+def encode_image(img, dither=False):
+    """Encode img as ESC/POS raster bytes for a slow link.
+
+    Blank margins right/top/bottom are trimmed, blank row runs inside become
+    ESC J feeds, and each content band is sent as GS v 0. Returns
+    (bytes, EncodeReport).
+    """
+    mono = to_mono(img, dither)
+    full_w, full_h = mono.size
+    full_wb = (full_w + 7) // 8
+    raw_bytes = full_wb * full_h + 8 * -(-full_h // V0_MAX_ROWS)
+
+    # invert so printed dots are 1 bits, then trim to the ink bounding box
+    ink = mono.convert("L").point(lambda v: 255 if v == 0 else 0)
+    bbox = ink.getbbox()
+    if bbox is None:
+        return b"", EncodeReport(raw_bytes, 0, 0, full_h, 0, 0)
+    _, top, right, bottom = bbox
+    ink = ink.crop((0, top, right, bottom)).convert("1")
+    width, height = ink.size
+    wb = (width + 7) // 8
+    data = ink.tobytes()
+    blank = bytes(wb)
+
+    out, bands, fed = [], 0, 0
+    y = 0
+    while y < height:
+        # blank run -> paper feed
+        start = y
+        while y < height and data[y * wb:(y + 1) * wb] == blank:
+            y += 1
+        run = y - start
+        if run >= FEED_MIN_ROWS:
+            out.append(_feed(run))
+            fed += run
+            start = y
+        # content band up to the next long blank run
+        band_end = y
+        gap = 0
+        while band_end < height:
+            if data[band_end * wb:(band_end + 1) * wb] == blank:
+                gap += 1
+                if gap >= FEED_MIN_ROWS:
+                    band_end -= gap - 1
+                    break
+            else:
+                gap = 0
+            band_end += 1
+        if band_end >= height:
+            band_end = height
+        if band_end > start:
+            out.append(_encode_band(wb, band_end - start, data[start * wb:band_end * wb]))
+            bands += 1
+        y = band_end
+
+    encoded = b"".join(out)
+    report = EncodeReport(raw_bytes, len(encoded), height, full_h - height, fed, bands)
+    return encoded, report
@@ -0,0 +1,224 @@
+import functools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from logging.handlers import RotatingFileHandler
+
+# upper bounds (ms) of the latency buckets; one more bucket catches everything slower
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+METRICS_FILE_BYTES = 1_000_000   # rotate the metrics file at this size
+METRICS_FILE_BACKUPS = 5         # metrics.jsonl.1 .. .5 are kept
+TERMINAL = os.environ.get("POS_TERMINAL") or socket.gethostname()
+
+
+# ---------------- Histogram ----------------
+class Histogram:
+    """Fixed-bucket latency histogram in milliseconds (cumulative since start)."""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        """Estimate, interpolated inside the bucket the q-th observation falls in."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = BUCKETS_MS[i - 1] if i else 0.0
+                hi = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+                return min(self.max, lo + (hi - lo) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "mean_ms": round(self.sum / self.count, 3) if self.count else 0.0,
+                "p50_ms": round(self.quantile(0.5), 3), "p95_ms": round(self.quantile(0.95), 3),
+                "p99_ms": round(self.quantile(0.99), 3), "max_ms": round(self.max, 3)}
+
+
+# ---------------- Metrics ----------------
+class Metrics:
+    """Latency histograms and counters for the hot paths, shared by every module.
+
+    timed(name) decorates a function and time(name) wraps a block; both
+    record milliseconds into the histogram name. When the registry is created
+    disabled (POS_METRICS=0), timed() hands back the function itself and time()
+    a shared null context, so instrumented code runs exactly as before.
+    Safe to call from worker threads.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._null = nullcontext()
+
+    def observe(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.observe(ms)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name):
+        """Decorator recording each call's duration, exceptions included."""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, (time.perf_counter() - t0) * 1000)
+            return wrapper
+        return decorate
+
+    def time(self, name):
+        """Context manager timing one block: with metrics.time("print.send"): ..."""
+        return _Timer(self, name) if self.enabled else self._null
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """{"terminal", "ts", "since", "counters", "histograms": {name: summary}}."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: h.summary() for name, h in self.histograms.items()}
+        return {"terminal": TERMINAL, "ts": round(time.time(), 3), "since": round(self.started, 3),
+                "counters": counters, "histograms": histograms}
+
+    def prometheus_text(self):
+        """Everything in the Prometheus text exposition format."""
+        label = 'terminal="%s"' % TERMINAL.replace("\\", "\\\\").replace('"', '\\"')
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = "pos_" + _prom_name(name) + "_total"
+                lines += [f"# TYPE {metric} counter", f"{metric}{{{label}}} {value}"]
+            for name, h in sorted(self.histograms.items()):
+                metric = "pos_" + _prom_name(name) + "_ms"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip(BUCKETS_MS + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines += [f"{metric}_sum{{{label}}} {h.sum:.3f}", f"{metric}_count{{{label}}} {h.count}"]
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.t0) * 1000)
+        return False
+
+
+def _prom_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+# ---------------- Export ----------------
+class MetricsFile:
+    """Appends one JSON snapshot per line to path, rotating at METRICS_FILE_BYTES."""
+
+    def __init__(self, path, registry, max_bytes=METRICS_FILE_BYTES, backups=METRICS_FILE_BACKUPS):
+        self.registry = registry
+        self.logger = logging.getLogger(f"pos.metrics.{path}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                          encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def write(self):
+        self.logger.info(json.dumps(self.registry.snapshot(), ensure_ascii=False, separators=(",", ":")))
+
+    def close(self):
+        for handler in self.logger.handlers:
+            handler.close()
+
+
+def serve_prometheus(registry, port, host="127.0.0.1"):
+    """Serve GET /metrics on localhost from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def log_to_file(path, max_bytes=METRICS_FILE_BYTES, backups=METRICS_FILE_BACKUPS):
+    """Write log records (INFO and up) to path, rotating like the metrics file."""
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(threadName)s: %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    return handler
+
+
+# the process-wide registry; POS_METRICS=0 turns instrumentation off
+metrics = Metrics(enabled=os.environ.get("POS_METRICS", "1") != "0")
+# the one logger for diagnostics (a save retried later, a fallback taken);
+# what the cashier has to act on goes to a messagebox instead
+log = logging.getLogger("pos")
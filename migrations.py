@@ -0,0 +1,136 @@
+from db import SQL_FEED_VERSION
+from metrics import log
+
+# ---------------- DDL ----------------
+FEED_TABLES = (
+    "CREATE TABLE IF NOT EXISTS catalog_version ("
+    " id TINYINT PRIMARY KEY, version BIGINT UNSIGNED NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS product_tombstones ("
+    " version BIGINT UNSIGNED PRIMARY KEY, product_id INT NOT NULL,"
+    " deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+)
+FEED_COLUMNS = (
+    "ALTER TABLE products"
+    " ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0,"
+    " ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,"
+    " ADD INDEX idx_products_version (version)"
+)
+_BUMP = "UPDATE catalog_version SET version = version + 1 WHERE id = 1; "
+FEED_TRIGGERS = {
+    "products_feed_insert": "CREATE TRIGGER products_feed_insert BEFORE INSERT ON products FOR EACH ROW BEGIN "
+                            + _BUMP + "SET NEW.version = (SELECT version FROM catalog_version WHERE id = 1); END",
+    "products_feed_update": "CREATE TRIGGER products_feed_update BEFORE UPDATE ON products FOR EACH ROW BEGIN "
+                            + _BUMP + "SET NEW.version = (SELECT version FROM catalog_version WHERE id = 1); END",
+    "products_feed_delete": "CREATE TRIGGER products_feed_delete AFTER DELETE ON products FOR EACH ROW BEGIN "
+                            + _BUMP + "INSERT INTO product_tombstones (version, product_id)"
+                            " SELECT version, OLD.id FROM catalog_version WHERE id = 1; END",
+}
+FEED_PRUNED_COLUMN = "ALTER TABLE catalog_version ADD COLUMN pruned BIGINT UNSIGNED NOT NULL DEFAULT 0"
+BARCODE_COLUMN = ("ALTER TABLE products ADD COLUMN barcode VARCHAR(32) NULL,"
+                  " ADD UNIQUE INDEX idx_products_barcode (barcode)")
+# the lookup key add_to_bill compares, stored so it can be indexed
+NAME_KEY_COLUMN = ("ALTER TABLE products"
+                   " ADD COLUMN name_key VARCHAR(100) AS (LOWER(TRIM(name_en))) STORED,"
+                   " ADD INDEX idx_products_name_key (name_key)")
+# substring search on the server; the ngram parser also splits Devanagari, which has no stopwords
+NAMES_FULLTEXT = "ALTER TABLE products ADD FULLTEXT INDEX ft_products_names (name_en, name_hi) WITH PARSER ngram"
+
+MIGRATIONS_TABLE = ("CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    " version INT PRIMARY KEY, name VARCHAR(100) NOT NULL,"
+                    " applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+MIGRATION_LOCK = "pos_schema_migrations"
+MIGRATION_LOCK_SECS = 600   # a FULLTEXT build over millions of rows takes minutes
+
+
+class MigrationError(Exception):
+    pass
+
+
+# ---------------- Migrations ----------------
+# Each step checks for what it creates before creating it: MySQL DDL commits on
+# its own, so a step interrupted before it was recorded simply runs again.
+def change_feed(db):
+    """The products change feed (catalog_version, tombstones, version column, triggers).
+
+    The triggers also catch edits made outside this program.
+    """
+    for sql in FEED_TABLES:
+        db.execute(sql)
+    if not db.query_one(SQL_FEED_VERSION):
+        db.execute("INSERT INTO catalog_version (id, version) VALUES (1, 0)")
+    if not db.has_column("products", "version"):
+        db.execute(FEED_COLUMNS)
+    existing = {r[0] for r in db.query(
+        "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA=DATABASE()"
+        " AND EVENT_OBJECT_TABLE='products'")}
+    for name, sql in FEED_TRIGGERS.items():
+        if name not in existing:
+            db.execute(sql)
+
+
+def barcodes(db):
+    """products.barcode (NULL = none, unique otherwise)."""
+    if not db.has_column("products", "barcode"):
+        db.execute(BARCODE_COLUMN)
+
+
+def name_key(db):
+    """Indexed LOWER(TRIM(name_en)), so a name lookup is a seek instead of a scan."""
+    if not db.has_column("products", "name_key"):
+        db.execute(NAME_KEY_COLUMN)
+
+
+def names_fulltext(db):
+    """n-gram FULLTEXT index over both names for server-side search."""
+    if not db.has_index("products", "ft_products_names"):
+        db.execute(NAMES_FULLTEXT)
+
+
+def feed_pruning(db):
+    """catalog_version.pruned, so old tombstones can be deleted (Database.prune_feed)."""
+    if not db.has_column("catalog_version", "pruned"):
+        db.execute(FEED_PRUNED_COLUMN)
+
+
+# (version, name, step) in order; append only, never renumber
+MIGRATIONS = (
+    (1, "change feed", change_feed),
+    (2, "barcodes", barcodes),
+    (3, "name lookup key", name_key),
+    (4, "names fulltext", names_fulltext),
+    (5, "feed pruning", feed_pruning),
+)
+
+
+def applied_versions(db):
+    if not db.has_table("schema_migrations"):
+        return set()
+    return {r[0] for r in db.query("SELECT version FROM schema_migrations")}
+
+
+def migrate(db, migrations=MIGRATIONS):
+    """Bring the schema up to the last migration; returns the names applied.
+
+    An up-to-date database costs two SELECTs and no DDL, so terminals without
+    DDL rights work once any one terminal (or the back office) has migrated.
+    Terminals starting together take turns through a named lock; each
+    re-reads what is applied once it holds it.
+    """
+    if {m[0] for m in migrations} <= applied_versions(db):
+        return []
+    got = db.query_one("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_SECS))
+    if not got or got[0] != 1:
+        raise MigrationError("Another terminal is still upgrading the database, try again shortly.")
+    try:
+        db.execute(MIGRATIONS_TABLE)
+        done, applied = applied_versions(db), []
+        for version, name, step in migrations:
+            if version in done:
+                continue
+            log.info("Database upgrade %d: %s", version, name)
+            step(db)
+            db.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            applied.append(name)
+        return applied
+    finally:
+        db.query_one("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
@@ -0,0 +1,105 @@
+import heapq
+import json
+import math
+import os
+import time
+
+from metrics import log
+
+HALF_LIFE_DAYS = 7.0   # an add counts half as much a week later
+HOT_ITEMS = 300        # products whose score reorders suggestions (the fast movers)
+PRUNE_BELOW = 0.01     # scores decayed below this are dropped when the file is loaded
+REBASE_LOG2 = 64       # re-base weights before 2**exponent loses precision
+
+
+# ---------------- Popularity ----------------
+class Popularity:
+    """Per-product usage counters with exponential decay, saved as JSON.
+
+    Each add stores 2**((t - epoch) / half_life) rather than 1, so older adds
+    weigh less without ever touching the other counters: weights compare as
+    the decayed scores would, and bump() stays one dict update. Loading
+    re-bases the epoch to now (and drops what has decayed away), which keeps
+    the exponents small. Tk thread only.
+    """
+
+    def __init__(self, path, half_life_days=HALF_LIFE_DAYS, hot_items=HOT_ITEMS):
+        self.path = path
+        self.half_life = half_life_days * 86400
+        self.hot_items = hot_items
+        self.epoch = time.time()
+        self.weights = {}   # product id -> weight at epoch scale
+        self.dirty = False
+        self._hot = None    # cached hot(); None after a bump
+        self._load()
+
+    def __len__(self):
+        return len(self.weights)
+
+    def _factor(self, now):
+        return 2.0 ** ((now - self.epoch) / self.half_life)
+
+    def bump(self, product_id, now=None):
+        """Count one add of product_id."""
+        now = time.time() if now is None else now
+        if (now - self.epoch) / self.half_life > REBASE_LOG2:
+            self._rebase(now)
+        self.weights[product_id] = self.weights.get(product_id, 0.0) + self._factor(now)
+        self.dirty = True
+        self._hot = None
+
+    def score(self, product_id, now=None):
+        """Decayed add count of product_id as of now."""
+        now = time.time() if now is None else now
+        return self.weights.get(product_id, 0.0) / self._factor(now)
+
+    def hot(self):
+        """{product id: weight} of the HOT_ITEMS most used products, for SearchIndex.search(boost=)."""
+        if self._hot is None:
+            self._hot = dict(heapq.nlargest(self.hot_items, self.weights.items(), key=lambda kv: kv[1]))
+        return self._hot
+
+    def top(self, n):
+        """Ids of the n most used products, most used first."""
+        return [pid for pid, _ in heapq.nlargest(n, self.weights.items(), key=lambda kv: kv[1])]
+
+    def forget(self, product_id):
+        if self.weights.pop(product_id, None) is not None:
+            self.dirty = True
+            self._hot = None
+
+    def clear(self):
+        self.weights = {}
+        self.dirty = True
+        self._hot = None
+
+    def _rebase(self, now):
+        factor = self._factor(now)
+        self.weights = {pid: w / factor for pid, w in self.weights.items() if w / factor >= PRUNE_BELOW}
+        self.epoch = now
+        self._hot = None
+
+    # --- file ---
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.epoch = float(data["epoch"])
+            self.weights = {int(pid): float(w) for pid, w in data["weights"].items() if math.isfinite(float(w))}
+        except FileNotFoundError:
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            log.warning("Popularity counters unreadable, starting afresh: %s", e)
+            self.weights = {}
+        self._rebase(time.time())
+
+    def save(self):
+        """Write the counters (atomically) if they changed since the last save."""
+        if not self.dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"epoch": self.epoch, "half_life_days": self.half_life / 86400,
+                       "weights": {str(pid): round(w, 6) for pid, w in self.weights.items()}}, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -0,0 +1,195 @@
+import csv
+import os
+from itertools import islice
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from catalog import BARCODE_MAX, normalize_barcode
+from search import normalize_text
+
+NAME_MAX = 100                  # products.name_en / name_hi are VARCHAR(100)
+PRICE_MAX = Decimal("99999999.99")  # DECIMAL(10,2)
+UPSERT_BATCH = 1000             # rows per multi-row INSERT sent by executemany
+EXPORT_HEADER = ("id", "name_en", "name_hi", "price", "barcode")   # import ignores id
+
+# accepted header spellings -> field (our export, the product_tree headings, plain words)
+HEADER_ALIASES = {
+    "name_en": "name_en", "name (english)": "name_en", "english": "name_en", "name": "name_en",
+    "name_hi": "name_hi", "name (hindi)": "name_hi", "hindi": "name_hi",
+    "price": "price", "rate": "price",
+    "barcode": "barcode",
+}
+
+SQL_UPSERT = ("INSERT INTO products (name_en, name_hi, price) VALUES (%s,%s,%s) "
+              "ON DUPLICATE KEY UPDATE name_hi=VALUES(name_hi), price=VALUES(price)")
+SQL_UPSERT_BARCODE = ("INSERT INTO products (name_en, name_hi, price, barcode) VALUES (%s,%s,%s,%s) "
+                      "ON DUPLICATE KEY UPDATE name_hi=VALUES(name_hi), price=VALUES(price), "
+                      "barcode=VALUES(barcode)")
+# frees the file's barcodes first: a code moved to another product would otherwise hit the
+# UNIQUE index, and ON DUPLICATE KEY UPDATE would then update the product that held it
+SQL_FREE_BARCODES = "UPDATE products SET barcode=NULL WHERE barcode IN ({})"
+
+
+def clean_name(value):
+    """NFC, trimmed, inner runs of whitespace collapsed to one space."""
+    return " ".join(unicodedata.normalize("NFC", str(value or "")).split())
+
+
+def parse_price(value):
+    """Decimal price rounded to paise; accepts "1,250.50" and a leading ₹ / Rs."""
+    text = str(value if value is not None else "").replace(",", "").replace("₹", "").strip()
+    if text.lower().startswith("rs"):
+        text = text[2:].lstrip(". ")
+    price = Decimal(text).quantize(Decimal("0.01"))
+    if not (0 <= price <= PRICE_MAX):
+        raise InvalidOperation
+    return price
+
+
+def clean_barcode(value):
+    """normalize_barcode of a cell; Excel may hand back a long code as a float."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return normalize_barcode(value)
+
+
+def _is_xlsx(path):
+    return os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm")
+
+
+def read_table(path):
+    """All rows of a CSV (UTF-8) or XLSX (first sheet) file as lists of cells."""
+    if _is_xlsx(path):
+        from openpyxl import load_workbook   # only needed for Excel files
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            return [list(r) for r in wb.worksheets[0].iter_rows(values_only=True)]
+        finally:
+            wb.close()
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.reader(f))
+    except UnicodeDecodeError:
+        raise ValueError("The CSV is not UTF-8; save it as \"CSV UTF-8\" so Hindi names survive.")
+
+
+def read_price_list(path):
+    """Validated (name_en, name_hi, price) rows of a price list plus [(line, problem)].
+
+    With a barcode column the rows are (name_en, name_hi, price, barcode),
+    '' for none. Names are cleaned with clean_name; a name_en or barcode
+    repeated in the file (names case-insensitive, like the UNIQUE index)
+    keeps its first line.
+    """
+    table = read_table(path)
+    if not table:
+        raise ValueError("The file is empty.")
+    fields = {}
+    for col, title in enumerate(table[0]):
+        field = HEADER_ALIASES.get(str(title or "").strip().lower())
+        if field and field not in fields:
+            fields[field] = col
+    missing = [f for f in ("name_en", "name_hi", "price") if f not in fields]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    products, errors, seen, seen_codes = [], [], {}, {}
+    en_col, hi_col, price_col = fields["name_en"], fields["name_hi"], fields["price"]
+    code_col = fields.get("barcode")
+    for line, cells in enumerate(table[1:], 2):
+        if not any(c not in (None, "") for c in cells):
+            continue
+        cell = lambda col: cells[col] if col < len(cells) else None
+        name_en, name_hi = clean_name(cell(en_col)), clean_name(cell(hi_col))
+        if not (name_en and name_hi):
+            errors.append((line, "name missing"))
+            continue
+        if len(name_en) > NAME_MAX or len(name_hi) > NAME_MAX:
+            errors.append((line, f"name longer than {NAME_MAX} characters"))
+            continue
+        try:
+            price = parse_price(cell(price_col))
+        except (InvalidOperation, ValueError):
+            errors.append((line, f"bad price {cell(price_col)!r}"))
+            continue
+        key = normalize_text(name_en)
+        if key in seen:
+            errors.append((line, f"duplicate of line {seen[key]}"))
+            continue
+        if code_col is None:
+            seen[key] = line
+            products.append((name_en, name_hi, price))
+            continue
+        code = clean_barcode(cell(code_col))
+        if len(code) > BARCODE_MAX:
+            errors.append((line, f"barcode longer than {BARCODE_MAX} characters"))
+            continue
+        if code in seen_codes:
+            errors.append((line, f"barcode also on line {seen_codes[code]}"))
+            continue
+        seen[key] = line
+        if code:
+            seen_codes[code] = line
+        products.append((name_en, name_hi, price, code))
+    return products, errors
+
+
+def write_price_list(path, rows, progress=None, total=None):
+    """Write catalog rows (id, name_en, name_hi, price, barcode) as CSV (UTF-8 with BOM, for Excel) or XLSX.
+
+    rows may be a stream (e.g. a large catalog read from the DB) when total is given.
+    Returns the number of rows written.
+    """
+    total = len(rows) if total is None else total
+    rows = iter(rows)
+    written = 0
+    if _is_xlsx(path):
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Products")
+        ws.append(EXPORT_HEADER)
+        for written, (pid, name_en, name_hi, price, barcode) in enumerate(rows, 1):
+            ws.append((pid, name_en, name_hi, float(price), barcode))
+            if progress and written % UPSERT_BATCH == 0:
+                progress(written, total)
+        wb.save(path)
+    else:
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_HEADER)
+            while True:
+                batch = list(islice(rows, UPSERT_BATCH))
+                if not batch:
+                    break
+                writer.writerows((pid, name_en, name_hi, f"{price:.2f}", barcode)
+                                 for pid, name_en, name_hi, price, barcode in batch)
+                written += len(batch)
+                if progress:
+                    progress(written, total)
+    if progress:
+        progress(written, max(total, written))
+    return written
+
+
+def upsert_products(db, products, progress=None):
+    """Insert new / update existing (by name_en) products in one transaction.
+
+    Rows go in UPSERT_BATCH at a time through executemany, which the
+    connector sends as one multi-row INSERT per batch. Rows with a barcode
+    (read_price_list of a file with that column) set it too, '' clearing it.
+    """
+    total = len(products)
+    with_barcode = bool(products) and len(products[0]) == 4
+    with db.transaction() as cur:
+        for start in range(0, total, UPSERT_BATCH):
+            batch = products[start:start + UPSERT_BATCH]
+            if with_barcode:
+                codes = [p[3] for p in batch if p[3]]
+                if codes:
+                    cur.execute(SQL_FREE_BARCODES.format(",".join(["%s"] * len(codes))), codes)
+                cur.executemany(SQL_UPSERT_BARCODE, [(en, hi, price, code or None) for en, hi, price, code in batch])
+            else:
+                cur.executemany(SQL_UPSERT, batch)
+            if progress:
+                progress(min(start + UPSERT_BATCH, total), total)
+    return total
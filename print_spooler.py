@@ -0,0 +1,137 @@
+import itertools
+import queue
+import threading
+import time
+
+from metrics import metrics
+
+PRIORITY_HIGH = 0    # e.g. duplicate copies the customer is waiting for
+PRIORITY_NORMAL = 1
+
+
+class PartialSend(Exception):
+    """send() failed after part of the job reached the paper: sending it again would
+    print that part twice, so the job fails and the cashier reprints the bill."""
+
+
+def send_image(printer, img):
+    """Default job output: raster the image and cut."""
+    printer.image(img)
+    printer.cut()
+
+
+class PrintJob:
+    def __init__(self, job_id, render, priority, on_status):
+        self.id = job_id
+        self.render = render        # callable -> image, run on the worker thread
+        self.priority = priority
+        self.on_status = on_status  # called on the Tk thread as on_status(job, status, error)
+        self.status = "queued"
+        self.error = None
+        self.result = None          # whatever send() returned, e.g. a byte-count report
+        self.queued_at = time.monotonic()
+
+
+# ---------------- Print Spooler ----------------
+class PrintSpooler:
+    """Single worker thread that owns one long-lived printer connection.
+
+    Jobs from every bill panel go through one bounded priority queue, so they
+    never fight over the port and pay the open + init commands only once.
+    A failed send drops the connection, reconnects and retries, unless send()
+    raised PartialSend. Status changes are handed back to the Tk thread with
+    root.after.
+    """
+
+    def __init__(self, connect, root, send=send_image, maxsize=16, retries=3, retry_delay=1.0):
+        self.connect = connect      # callable -> initialised escpos printer
+        self.root = root
+        self.send = send
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = queue.PriorityQueue(maxsize)
+        self.printer = None
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status_lock = threading.RLock()
+
+    def submit(self, render, priority=PRIORITY_NORMAL, on_status=None):
+        """Queue a job; raises queue.Full when the spooler is backed up."""
+        job = PrintJob(next(self._ids), render, priority, on_status)
+        with self._status_lock:   # "queued" goes out before the worker can report "printing"
+            self.queue.put_nowait((priority, job.id, job))
+            self._report(job, "queued")
+        self._ensure_worker()
+        return job
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def stop(self):
+        """Let the worker finish queued jobs, then close the printer."""
+        if self._thread:
+            self.queue.put((PRIORITY_NORMAL + 1, 0, None))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="print-spooler", daemon=True)
+                self._thread.start()
+
+    def _report(self, job, status, error=None):
+        with self._status_lock:
+            job.status, job.error = status, error
+            if job.on_status:
+                try:
+                    self.root.after(0, job.on_status, job, status, error)
+                except Exception:
+                    pass  # window already closed
+
+    def _disconnect(self):
+        if self.printer is not None:
+            try:
+                self.printer.close()
+            except Exception:
+                pass
+        self.printer = None
+
+    def _run(self):
+        while True:
+            _, _, job = self.queue.get()
+            if job is None:
+                self._disconnect()
+                return
+            self._process(job)
+
+    def _process(self, job):
+        self._report(job, "printing")
+        metrics.observe("print.queue_wait", (time.monotonic() - job.queued_at) * 1000)
+        try:
+            with metrics.time("print.render"):
+                payload = job.render()
+        except Exception as e:
+            metrics.count("print.failed")
+            return self._report(job, "failed", e)
+        error = None
+        for attempt in range(self.retries):
+            try:
+                if self.printer is None:
+                    with metrics.time("print.connect"):
+                        self.printer = self.connect()
+                with metrics.time("print.send"):
+                    job.result = self.send(self.printer, payload)
+                metrics.count("print.done")
+                return self._report(job, "done")
+            except PartialSend as e:
+                metrics.count("print.partial")
+                self._disconnect()
+                error = e
+                break
+            except Exception as e:
+                error = e
+                metrics.count("print.send_errors")
+                self._disconnect()
+                time.sleep(self.retry_delay * (attempt + 1))
+        metrics.count("print.failed")
+        self._report(job, "failed", error)
@@ -0,0 +1,127 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+QUERY_TIMEOUT = 10.0   # seconds before the caller is told a query timed out
+WORKERS = 2            # each worker keeps one pooled connection (see Database)
+POLL_MS = 20           # Tk-side poll while queries are pending
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class Query:
+    def __init__(self, label, tag, on_done, on_error, deadline):
+        self.label = label
+        self.tag = tag
+        self.on_done = on_done      # on_done(result), Tk thread
+        self.on_error = on_error    # on_error(exception), Tk thread
+        self.deadline = deadline
+        self.submitted = time.monotonic()
+        self.state = "pending"      # -> done | failed | timed out | cancelled
+        self.future = None
+
+    def cancel(self):
+        """Drop the result; the call is skipped if a worker has not started it yet."""
+        if self.state == "pending":
+            self.state = "cancelled"
+            self.future.cancel()
+
+
+# ---------------- Query Executor ----------------
+class QueryExecutor:
+    """Runs database calls on worker threads and hands results to the Tk thread.
+
+    submit() returns at once; on_done(result) or on_error(exception) is called
+    later on the Tk thread from a root.after poll, so input handling never
+    waits on MySQL. A query submitted with the tag of one still pending
+    supersedes it (the older result is dropped). One that runs past its
+    timeout is reported as QueryTimeout and its late result ignored.
+    on_pending(labels) hears every change of the pending set, so the window
+    can show what it is waiting for.
+    """
+
+    def __init__(self, root, workers=WORKERS, timeout=QUERY_TIMEOUT, on_pending=None):
+        self.root = root
+        self.timeout = timeout
+        self.on_pending = on_pending
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="db-query")
+        self.pending = []   # Query, oldest first; Tk thread only
+        self.tags = {}      # tag -> pending Query
+        self._results = queue.Queue()
+        self._polling = False
+
+    def submit(self, fn, *args, label="", tag=None, on_done=None, on_error=None, timeout=None):
+        if tag is not None and tag in self.tags:
+            self._finish(self.tags[tag], "cancelled")
+        q = Query(label, tag, on_done, on_error, time.monotonic() + (timeout or self.timeout))
+        q.future = self.pool.submit(self._run, q, fn, args)
+        self.pending.append(q)
+        if tag is not None:
+            self.tags[tag] = q
+        self._changed()
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+        return q
+
+    def cancel(self, tag):
+        if tag in self.tags:
+            self._finish(self.tags[tag], "cancelled")
+            self._changed()
+
+    def _run(self, q, fn, args):
+        if q.state != "pending":
+            return
+        try:
+            self._results.put((q, fn(*args), None))
+        except Exception as e:
+            self._results.put((q, None, e))
+
+    def _finish(self, q, state):
+        if q.state == "pending":
+            q.state = state
+            if state == "cancelled":
+                q.future.cancel()
+        if q in self.pending:
+            self.pending.remove(q)
+        if q.tag is not None and self.tags.get(q.tag) is q:
+            del self.tags[q.tag]
+
+    def _changed(self):
+        if self.on_pending:
+            self.on_pending([q.label for q in self.pending if q.label])
+
+    def _poll(self):
+        changed = False
+        while True:
+            try:
+                q, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if q.state != "pending":
+                continue   # superseded, cancelled or already timed out
+            self._finish(q, "failed" if error else "done")
+            metrics.observe("query.roundtrip", (time.monotonic() - q.submitted) * 1000)
+            if error:
+                metrics.count("query.failed")
+            changed = True
+            callback, value = (q.on_error, error) if error else (q.on_done, result)
+            if callback:
+                callback(value)
+        now = time.monotonic()
+        for q in [q for q in self.pending if now > q.deadline]:
+            self._finish(q, "timed out")
+            metrics.count("query.timed_out")
+            changed = True
+            if q.on_error:
+                q.on_error(QueryTimeout(f"{q.label or 'Query'} timed out"))
+        if changed:
+            self._changed()
+        if self.pending:
+            self.root.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+MEMORY_BYTES = 8 * 1024 * 1024     # encoded receipts kept in memory (~50 KB each)
+DISK_BYTES = 64 * 1024 * 1024      # bound of the optional on-disk tier
+RECENT_BILLS = 200                 # printed bills offered for reprint
+
+
+def receipt_key(rows, customer_name, total, printed_at, variant=""):
+    """Content address of one receipt: everything that ends up on the paper.
+
+    rows are (name_hi, qty, price, line_total); printed_at is the time as
+    printed; variant names the renderer/encoding, whose bytes differ.
+    """
+    payload = json.dumps([variant, customer_name, total, printed_at,
+                          [[str(v) for v in row] for row in rows]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------- Receipt Cache ----------------
+class ReceiptCache:
+    """Printer-ready receipt bytes by content hash, for instant duplicates.
+
+    An LRU in memory bounded by MEMORY_BYTES, backed (when directory is
+    given) by one file per receipt, evicted oldest-used first past DISK_BYTES.
+    Printed bills are remembered as bill number -> key, newest last, so
+    "Reprint last" and reprint-by-bill survive a restart with the disk tier.
+    Used from the spooler worker and the Tk thread.
+    """
+
+    def __init__(self, directory=None, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()   # key -> bytes, least recently used first
+        self.memory_size = 0
+        self.disk = {}                # key -> (last use, size)
+        self.bills = OrderedDict()    # bill number -> {"key", "customer", "total", "printed_at"}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for entry in os.scandir(directory):
+                if entry.name.endswith(".bin"):
+                    st = entry.stat()
+                    self.disk[entry.name[:-4]] = (st.st_mtime, st.st_size)
+            self._load_bills()
+
+    # --- bytes ---
+    def get(self, key):
+        with self._lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                return data
+            if key not in self.disk:
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                self.disk.pop(key, None)
+                return None
+            self.disk[key] = (os.path.getmtime(self._path(key)), len(data))
+            self._remember(key, data)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+            else:
+                self._remember(key, data)
+            if self.directory and key not in self.disk:
+                tmp = self._path(key) + ".tmp"
+                try:
+                    with open(tmp, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, self._path(key))
+                    self.disk[key] = (os.path.getmtime(self._path(key)), len(data))
+                    self._evict_disk()
+                except OSError:
+                    pass   # the memory tier still has it
+
+    def __contains__(self, key):
+        return key in self.memory or key in self.disk
+
+    def _remember(self, key, data):
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.memory_bytes and len(self.memory) > 1:
+            _, old = self.memory.popitem(last=False)
+            self.memory_size -= len(old)
+
+    def _evict_disk(self):
+        total = sum(size for _, size in self.disk.values())
+        for key in sorted(self.disk, key=lambda k: self.disk[k][0]):
+            if total <= self.disk_bytes:
+                break
+            total -= self.disk.pop(key)[1]
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".bin")
+
+    # --- printed bills ---
+    def add_bill(self, bill_no, key, customer, total, printed_at):
+        """Remember a printed bill for reprinting."""
+        entry = {"bill": bill_no, "key": key, "customer": customer, "total": total, "printed_at": printed_at}
+        with self._lock:
+            self.bills[bill_no] = entry
+            while len(self.bills) > RECENT_BILLS:
+                self.bills.popitem(last=False)
+            if self.directory:
+                try:
+                    with open(self._bills_path(), "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                except OSError:
+                    pass
+
+    def bill(self, bill_no):
+        return self.bills.get(bill_no)
+
+    def last_bill(self):
+        return next(reversed(self.bills.values()), None)
+
+    def recent_bills(self):
+        """Remembered bills, newest first."""
+        return list(reversed(self.bills.values()))
+
+    def _bills_path(self):
+        return os.path.join(self.directory, "bills.jsonl")
+
+    def _load_bills(self):
+        try:
+            with open(self._bills_path(), encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue   # torn last line
+            self.bills[entry["bill"]] = entry
+            self.bills.move_to_end(entry["bill"])
+        while len(self.bills) > RECENT_BILLS:
+            self.bills.popitem(last=False)
+        if len(lines) > 2 * RECENT_BILLS:
+            tmp = self._bills_path() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in self.bills.values())
+            os.replace(tmp, self._bills_path())
@@ -0,0 +1,146 @@
+import os
+from datetime import datetime
+
+from PIL import Image, ImageDraw, ImageFont, features
+
+# ---------------- Layout (mirrors build_receipt_html) ----------------
+RECEIPT_WIDTH = 576            # printable dots on 80mm paper
+PAD_LEFT, PAD_RIGHT = 6, 8
+CELL_PAD_X, CELL_PAD_Y = 4, 6
+COLUMNS = (0.55, 0.11, 0.17, 0.17)  # Item, Qty, Price, Total
+FONT_SIZE = 22
+HEADER_FONT_SIZE = 24
+THRESHOLD = 160                # gray level below which a pixel prints black
+
+# First existing file wins; set RECEIPT_FONT to force one.
+FONT_CANDIDATES = (
+    os.environ.get("RECEIPT_FONT", ""),
+    "C:/Windows/Fonts/Nirmala.ttf",
+    "C:/Windows/Fonts/mangal.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansDevanagari-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSansDevanagari-Regular.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+)
+
+
+def require_shaping():
+    """Raise OSError unless Pillow can shape Devanagari, which takes libraqm."""
+    if not features.check("raqm"):
+        raise OSError("Pillow was built without libraqm: Hindi names would print unshaped")
+
+
+def find_font(candidates=FONT_CANDIDATES):
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    raise OSError("No Devanagari font found for the native receipt renderer")
+
+
+# ---------------- Native Receipt Renderer ----------------
+class ReceiptRenderer:
+    """Lays out the 576px receipt with Pillow straight into a 1-bit image.
+
+    Hindi names are shaped with libraqm. Without it Devanagari conjuncts and
+    matras do not join, so the constructor raises OSError (like a missing
+    font) and the caller prints through Chrome instead.
+    """
+
+    def __init__(self, font_path=None):
+        require_shaping()
+        self.font_path = font_path or find_font()
+        engine = ImageFont.Layout.RAQM
+        self.font = ImageFont.truetype(self.font_path, FONT_SIZE, layout_engine=engine)
+        self.header_font = ImageFont.truetype(self.font_path, HEADER_FONT_SIZE, layout_engine=engine)
+        ascent, descent = self.font.getmetrics()
+        self.line_height = ascent + descent
+        content = RECEIPT_WIDTH - PAD_LEFT - PAD_RIGHT
+        self.col_x, x = [], PAD_LEFT
+        for frac in COLUMNS:
+            self.col_x.append(x)
+            x += round(content * frac)
+        self.col_width = [round(content * frac) - 2 * CELL_PAD_X for frac in COLUMNS]
+
+    def wrap(self, text, width):
+        """Greedy word wrap of text into lines no wider than width pixels."""
+        lines, cur = [], ""
+        for word in str(text).split():
+            trial = word if not cur else cur + " " + word
+            if not cur or self.font.getlength(trial) <= width:
+                cur = trial
+            else:
+                lines.append(cur)
+                cur = word
+        lines.append(cur)
+        return lines
+
+    def render(self, rows, customer_name, total, printed_at=None):
+        """rows: iterable of (name_hi, qty, price, line_total). Returns a mode "1" image."""
+        rows = list(rows)
+        printed_at = printed_at or datetime.now()
+        ops = []   # (kind, x, y, payload, font, bold, anchor)
+        y = 4
+        mid = RECEIPT_WIDTH // 2
+        lh = self.line_height
+
+        def text(x, s, font=self.font, bold=False, anchor="la"):
+            ops.append(("text", x, y, s, font, bold, anchor))
+
+        def rule():
+            ops.append(("rule", PAD_LEFT, y, None, None, False, None))
+
+        y += 8
+        text(mid, "***** ESTIMATE *****", self.header_font, True, "ma")
+        y += self.header_font.getmetrics()[0] + self.header_font.getmetrics()[1] + 12
+        text(PAD_LEFT, "Welcome " + customer_name if customer_name else "Welcome Customer")
+        y += lh + 4
+
+        # column headings
+        y += CELL_PAD_Y
+        for x, heading in zip(self.col_x, ("Item", "Qty", "Price", "Total")):
+            text(x + CELL_PAD_X, heading, bold=True)
+        y += lh + CELL_PAD_Y
+        rule()
+        y += 2
+
+        for name_hi, qty, price, line_total in rows:
+            y += CELL_PAD_Y
+            name_lines = self.wrap(name_hi, self.col_width[0])
+            for i, line in enumerate(name_lines):
+                ops.append(("text", self.col_x[0] + CELL_PAD_X, y + i * lh, line, self.font, False, "la"))
+            text(self.col_x[1] + CELL_PAD_X, str(qty))
+            text(self.col_x[2] + CELL_PAD_X, f"{price:.2f}")
+            text(self.col_x[3] + CELL_PAD_X, f"{line_total:,}")
+            y += lh * len(name_lines) + CELL_PAD_Y
+
+        y += 4
+        rule()
+        y += 10
+        text(PAD_LEFT, f"Items: {len(rows)}", bold=True)
+        text(PAD_LEFT + 250, f"Grand Total: {int(round(total)):,}", bold=True)
+        y += lh + 4
+        text(PAD_LEFT, "Thank You!")
+        text(PAD_LEFT + 250, printed_at.strftime('%d-%m-%Y %I:%M %p'))
+        y += lh + 10
+        text(mid, "- Developed By Nayan Parihar -", anchor="ma")
+        y += lh + 8
+
+        img = Image.new("L", (RECEIPT_WIDTH, y), 255)
+        draw = ImageDraw.Draw(img)
+        right = RECEIPT_WIDTH - PAD_RIGHT
+        for kind, x, oy, payload, font, bold, anchor in ops:
+            if kind == "rule":
+                draw.line((x, oy, right, oy), fill=0, width=1)
+            else:
+                draw.text((x, oy), payload, font=font, fill=0, anchor=anchor,
+                          stroke_width=1 if bold else 0, stroke_fill=0)
+        return img.point(lambda v: 255 if v > THRESHOLD else 0, mode="1")
+
+
+_renderer = None
+
+def render_receipt(rows, customer_name, total, printed_at=None):
+    """Render with a shared ReceiptRenderer (fonts are loaded once per process)."""
+    global _renderer
+    if _renderer is None:
+        _renderer = ReceiptRenderer()
+    return _renderer.render(rows, customer_name, total, printed_at)
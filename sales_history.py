@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from metrics import log
+
+# one flat little-endian file per column, one entry per printed bill line
+COLUMNS = {
+    "bill": np.dtype("<i8"),     # bill id, increasing
+    "ts": np.dtype("<i8"),       # print time, unix seconds (non-decreasing)
+    "pid": np.dtype("<i4"),      # product id
+    "qty": np.dtype("<i4"),      # hundredths of a unit
+    "price": np.dtype("<i8"),    # paise
+    "amount": np.dtype("<i8"),   # line total as charged, whole rupees
+}
+PERIODS = ("day", "week", "month")
+COMMIT_INTERVAL = 0.05   # seconds printed bills are gathered before one write + fsync per column
+_EPOCH = date(1970, 1, 1)
+
+
+def utc_offset():
+    """Seconds to add to a unix time to get local wall-clock time (today's offset)."""
+    return time.localtime().tm_gmtoff
+
+
+# ---------------- Sales History ----------------
+class SalesHistory:
+    """Append-only columnar store of printed bills.
+
+    Rows are appended with a timestamp that never goes backwards, so every
+    column is sorted by time and a date range is two searchsorted calls.
+    Reading maps each column file with np.memmap and reports are whole-array
+    numpy operations (reduceat over contiguous periods, bincount per product),
+    so they stay interactive over years of history without MySQL.
+
+    Appending only numbers the bills and queues their rows; a writer thread
+    group-commits them with one write + fsync per column (as BillJournal
+    does), so printing a bill does no disk I/O on the Tk thread. Reads
+    flush the queue first, so a report includes every bill appended so far.
+    """
+
+    def __init__(self, directory, commit_interval=COMMIT_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = {name: os.path.join(directory, name + ".col") for name in COLUMNS}
+        rows = min(self._rows_in(name) for name in COLUMNS)
+        # a crash between column writes leaves some columns longer; drop the partial bill
+        for name, path in self.paths.items():
+            with open(path, "ab") as f:
+                f.truncate(rows * COLUMNS[name].itemsize)
+        self.rows = rows
+        self._maps = None
+        self.commit_interval = commit_interval
+        self._pending = {name: [] for name in COLUMNS}
+        self._lock = threading.Lock()      # guards _pending, next_bill and last_ts
+        self._io_lock = threading.Lock()   # guards the column files, rows and _maps
+        self._wake = threading.Event()
+        self._closed = False
+        cols = self.columns()
+        self.next_bill = int(cols["bill"][-1]) + 1 if rows else 1
+        self.last_ts = int(cols["ts"][-1]) if rows else 0
+        self._thread = threading.Thread(target=self._run, name="sales-history", daemon=True)
+        self._thread.start()
+
+    def _rows_in(self, name):
+        try:
+            return os.path.getsize(self.paths[name]) // COLUMNS[name].itemsize
+        except FileNotFoundError:
+            return 0
+
+    def __len__(self):
+        with self._io_lock, self._lock:   # not mid-commit, when the rows are in neither
+            return self.rows + len(self._pending["bill"])
+
+    # --- writing ---
+    def append_bill(self, lines, ts=None):
+        """Store one printed bill; lines are (pid, qty hundredths, price paise, amount). Returns its id."""
+        return self.append_bills([(ts, lines)])[0]
+
+    def append_bills(self, bills):
+        """Queue many bills of (ts or None, lines) for the next commit; returns their ids."""
+        ids = []
+        with self._lock:
+            cols = self._pending
+            for ts, lines in bills:
+                ts = max(int(time.time() if ts is None else ts), self.last_ts)
+                bill, self.next_bill, self.last_ts = self.next_bill, self.next_bill + 1, ts
+                ids.append(bill)
+                for pid, qty, price, amount in lines:
+                    cols["bill"].append(bill)
+                    cols["ts"].append(ts)
+                    cols["pid"].append(pid)
+                    cols["qty"].append(qty)
+                    cols["price"].append(price)
+                    cols["amount"].append(amount)
+        self._wake.set()
+        return ids
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait()
+            time.sleep(self.commit_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                log.warning("Sales history not saved, retried with the next bill: %s", e)
+
+    def flush(self):
+        """Write and fsync every queued row, one write per column.
+
+        On failure the files are cut back to the last whole bill and the rows
+        stay queued, so the next commit writes them again.
+        """
+        with self._io_lock:
+            with self._lock:
+                cols, self._pending = self._pending, {name: [] for name in COLUMNS}
+            if not cols["bill"]:
+                return
+            self._maps = None   # never extend a file while a view of it is mapped
+            try:
+                for name, values in cols.items():
+                    with open(self.paths[name], "ab") as f:
+                        np.asarray(values, dtype=COLUMNS[name]).tofile(f)
+                        f.flush()
+                        os.fsync(f.fileno())
+            except OSError:
+                for name, path in self.paths.items():
+                    try:
+                        with open(path, "ab") as f:
+                            f.truncate(self.rows * COLUMNS[name].itemsize)
+                    except OSError:
+                        pass   # the next open drops a partial bill anyway
+                with self._lock:
+                    for name, values in cols.items():
+                        self._pending[name][:0] = values
+                raise
+            self.rows += len(cols["bill"])
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    # --- reading ---
+    def columns(self):
+        """{column: read-only array}, memory-mapped."""
+        self.flush()
+        with self._io_lock:
+            if self._maps is None:
+                self._maps = {
+                    name: np.memmap(path, dtype=COLUMNS[name], mode="r", shape=(self.rows,))
+                    if self.rows else np.empty(0, COLUMNS[name])
+                    for name, path in self.paths.items()}
+            return self._maps
+
+    def between(self, start=None, end=None):
+        """Columns sliced to start <= ts < end (unix seconds, None = open)."""
+        cols = self.columns()
+        ts = cols["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, "left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, "left"))
+        return {name: col[lo:hi] for name, col in cols.items()}
+
+    # --- reports ---
+    def period_totals(self, period="day", start=None, end=None):
+        """[(first day of period, bills, lines, amount)] per day, week (Monday) or month."""
+        cols = self.between(start, end)
+        if not len(cols["ts"]):
+            return []
+        days = (cols["ts"] + utc_offset()) // 86400
+        if period == "day":
+            key = days
+        elif period == "week":
+            key = (days + 3) // 7   # 1970-01-01 was a Thursday
+        elif period == "month":
+            key = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        else:
+            raise ValueError(f"period must be one of {PERIODS}")
+        # rows are in time order, so each period is one contiguous run
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        bill = cols["bill"]
+        new_bill = np.r_[True, bill[1:] != bill[:-1]].astype(np.int64)
+        bills = np.add.reduceat(new_bill, starts)
+        lines = np.diff(np.r_[starts, len(key)])
+        amount = np.add.reduceat(cols["amount"], starts)
+        return [(self._period_start(period, int(k)), int(b), int(n), int(a))
+                for k, b, n, a in zip(key[starts], bills, lines, amount)]
+
+    @staticmethod
+    def _period_start(period, key):
+        if period == "day":
+            return _EPOCH + timedelta(days=key)
+        if period == "week":
+            return _EPOCH + timedelta(days=key * 7 - 3)
+        return date(1970 + key // 12, key % 12 + 1, 1)
+
+    def product_totals(self, start=None, end=None):
+        """(pids, qty in units, amount) for every product sold in the range."""
+        cols = self.between(start, end)
+        if not len(cols["pid"]):
+            return np.empty(0, np.int64), np.empty(0), np.empty(0, np.int64)
+        pid = cols["pid"]
+        qty = np.bincount(pid, weights=cols["qty"])
+        amount = np.bincount(pid, weights=cols["amount"])
+        sold = np.flatnonzero(np.bincount(pid))
+        return sold, qty[sold] / 100, np.rint(amount[sold]).astype(np.int64)
+
+    def top_sellers(self, n=50, start=None, end=None, by="amount"):
+        """[(pid, qty, amount)] of the n best sellers by "amount" or "qty"."""
+        pids, qty, amount = self.product_totals(start, end)
+        score = amount if by == "amount" else qty
+        if len(score) > n:
+            part = np.argpartition(-score, n - 1)[:n]
+        else:
+            part = np.arange(len(score))
+        order = part[np.argsort(-score[part], kind="stable")]
+        return [(int(pids[i]), float(qty[i]), int(amount[i])) for i in order]
+
+    def totals(self, start=None, end=None):
+        """(bills, lines, amount) over the range."""
+        cols = self.between(start, end)
+        bill = cols["bill"]
+        bills = int(np.count_nonzero(np.r_[True, bill[1:] != bill[:-1]])) if len(bill) else 0
+        return bills, len(bill), int(cols["amount"].sum())
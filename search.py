@@ -0,0 +1,272 @@
+import heapq
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+GRAM_SIZE = 3          # longest n-gram indexed; 1- and 2-grams serve queries shorter than that
+WORD_START = "\x01"    # marks the n-grams that begin a word (other than the first), for rank 1
+OVERLAY_LIMIT = 1000   # patched + dead rows carried before the postings are rebuilt
+RUN_MERGE_MAX = 32768  # streamed chunks are merged into sorted key runs up to this size
+_WORD_SEP = re.compile(r"[\s\-_/\\.,;:()\[\]&+'\"]")
+
+
+def normalize_text(text):
+    """NFC + trim + lowercase, so typed Devanagari matches stored Devanagari."""
+    return unicodedata.normalize("NFC", str(text)).strip().lower()
+
+
+def _grams(text):
+    """Every distinct 1..GRAM_SIZE-character substring of text, plus the ones right
+    after a word separator again with a WORD_START mark."""
+    grams = {text[i:i + n] for n in range(1, GRAM_SIZE + 1) for i in range(len(text) - n + 1)}
+    for m in _WORD_SEP.finditer(text):
+        word = text[m.end():m.end() + GRAM_SIZE]
+        grams.update(WORD_START + word[:n] for n in range(1, len(word) + 1))
+    return grams
+
+
+def _add_run(runs, keys, positions):
+    """Add keys with their row positions to runs as one more sorted run, first merging
+    in the runs before it while they are no bigger (and the result stays within
+    RUN_MERGE_MAX): streaming costs O(n log n) in all and leaves a few runs to bisect."""
+    while runs and len(runs[-1][0]) <= len(keys) and len(runs[-1][0]) + len(keys) <= RUN_MERGE_MAX:
+        prev_keys, prev_positions = runs.pop()
+        keys, positions = prev_keys + keys, prev_positions + positions
+    order = sorted(range(len(keys)), key=keys.__getitem__)   # sorted runs merge in linear time
+    runs.append((list(map(keys.__getitem__, order)), list(map(positions.__getitem__, order))))
+
+
+def _intersect(small, big):
+    """Sorted intersection of two sorted posting arrays (binary search into the larger
+    when it is much larger, else a set lookup per element)."""
+    if len(big) < 16 * len(small):
+        keep = set(big)
+        return array("i", [v for v in small if v in keep])
+    out = array("i")
+    lo, hi = 0, len(big)
+    for v in small:
+        lo = bisect_left(big, v, lo, hi)
+        if lo == hi:
+            break
+        if big[lo] == v:
+            out.append(v)
+    return out
+
+
+# ---------------- N-gram Search Index ----------------
+class SearchIndex:
+    """Inverted n-gram index (1 to 3 characters) over name_en and name_hi.
+
+    Postings are sorted arrays of row positions, so candidates come back in
+    name order and are intersected rarest-first before the final substring check.
+    Results are ranked prefix match, then word-start match, then substring.
+    Prefix matches come straight from sorted key runs and word-start matches
+    from the WORD_START postings, so with a limit each stage stops as soon as
+    the result is full; only the substring stage scans the plain candidates.
+
+    Rows changed after the build go to a small overlay (their old position is
+    marked dead) and are merged into the results, so a product edit never
+    costs a rebuild; compact() folds the overlay back in once it grows.
+    """
+
+    def __init__(self, rows=()):
+        self.build(rows)
+
+    def build(self, rows):
+        """Index rows of (id, name_en, name_hi, ...) by their two names, keeping their order."""
+        self.rows, self.keys, self.postings = [], [], {}
+        self.sorted_en, self.sorted_hi = [], []  # sorted runs of (keys, positions) per field, for prefixes
+        self.pos_by_id = {}                      # id -> live position
+        self.dead = set()                        # positions replaced or removed since the build
+        self.patched = {}                        # id -> (en key, hi key, row) added since the build
+        self.extend(rows)
+
+    def extend(self, rows):
+        """Append rows after the ones already indexed (used while the catalog streams in)."""
+        start = len(self.rows)
+        rows = list(rows)
+        keys = [(normalize_text(r[1]), normalize_text(r[2])) for r in rows]
+        postings = {}
+        for pos, (en, hi) in enumerate(keys, start):
+            for g in _grams(en) | _grams(hi):
+                lst = postings.get(g)
+                if lst is None:
+                    postings[g] = [pos]
+                else:
+                    lst.append(pos)
+        # new positions are all larger, so appending keeps every posting sorted
+        for g, lst in postings.items():
+            arr = self.postings.get(g)
+            if arr is None:
+                self.postings[g] = array("i", lst)
+            else:
+                arr.extend(lst)
+        self.rows.extend(rows)
+        self.keys.extend(keys)
+        self.pos_by_id.update((r[0], pos) for pos, r in enumerate(rows, start))
+        # only the new chunk is sorted here; _add_run merges runs as they pile up
+        if keys:
+            positions = list(range(start, start + len(keys)))
+            _add_run(self.sorted_en, [k[0] for k in keys], positions)
+            _add_run(self.sorted_hi, [k[1] for k in keys], positions)
+
+    def __len__(self):
+        return len(self.rows) - len(self.dead) + len(self.patched)
+
+    def upsert(self, row):
+        """Add or replace one row (by id) without touching the postings."""
+        self._bury(row[0])
+        self.patched[row[0]] = (normalize_text(row[1]), normalize_text(row[2]), row)
+        self._maybe_compact()
+
+    def remove(self, product_id):
+        self._bury(product_id)
+        self.patched.pop(product_id, None)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        # dead positions still sit in the postings and are skipped on every search
+        if len(self.patched) + len(self.dead) > OVERLAY_LIMIT:
+            self.compact()
+
+    def _bury(self, product_id):
+        pos = self.pos_by_id.pop(product_id, None)
+        if pos is not None:
+            self.dead.add(pos)
+
+    def compact(self):
+        """Rebuild the postings from the live rows, emptying the overlay."""
+        rows = [r for pos, r in enumerate(self.rows) if pos not in self.dead]
+        rows.extend(p[2] for p in self.patched.values())
+        rows.sort(key=lambda r: normalize_text(r[1]))
+        self.build(rows)
+
+    def candidates(self, query):
+        """Row positions holding every n-gram of query (superset of the matches)."""
+        n = min(len(query), GRAM_SIZE)
+        lists = []
+        for i in range(len(query) - n + 1):
+            lst = self.postings.get(query[i:i + n])
+            if lst is None:
+                return array("i")
+            lists.append(lst)
+        lists.sort(key=len)
+        result = lists[0]
+        for lst in lists[1:]:
+            if len(result) < 2:
+                break
+            result = _intersect(result, lst)
+        return result
+
+    def prefixed(self, query, limit=None):
+        """Sorted row positions whose name_en or name_hi starts with query (the first limit)."""
+        out = set()
+        end = query + "\U0010ffff"   # sorts after every key starting with query
+        for keys, positions in self.sorted_en + self.sorted_hi:
+            out.update(positions[bisect_left(keys, query):bisect_left(keys, end)])
+        return heapq.nsmallest(limit, out) if limit and len(out) > limit else sorted(out)
+
+    @staticmethod
+    def rank(query, key):
+        """0 = prefix, 1 = word start, 2 = substring, None = no match."""
+        if key.startswith(query):
+            return 0
+        at = key.find(query)
+        if at < 0:
+            return None
+        while at > 0:
+            if _WORD_SEP.match(key[at - 1]):
+                return 1
+            at = key.find(query, at + 1)
+        return 2
+
+    def search(self, query, limit=None, boost=None):
+        """Rows matching query ranked prefix > word start > substring, name order within a rank.
+
+        boost ({id: weight}, a few hundred at most) moves those rows to the
+        front of their rank, heaviest first; the scan itself skips them.
+        """
+        query = normalize_text(query)
+        rows, dead = self.rows, self.dead
+        if boost:
+            pos_by_id = self.pos_by_id
+            dead = dead.union(pos_by_id[pid] for pid in boost if pid in pos_by_id)
+        if not query:   # every row matches at rank 0
+            live = (row for pos, row in enumerate(rows) if pos not in dead)
+            return self._with_patched(query, (list(islice(live, limit)) if limit else list(live), [], []),
+                                      limit, boost)
+        # limit + len(dead) of them: enough for the limit, or all of them
+        prefixed = [pos for pos in self.prefixed(query, limit and limit + len(dead)) if pos not in dead]
+        first = [rows[pos] for pos in (prefixed[:limit] if limit else prefixed)]
+        if limit and len(first) >= limit:
+            return self._with_patched(query, (first, [], []), limit, boost)
+
+        # each stage fills in name order, so once the ranks so far reach the limit nothing later counts
+        skip = dead.union(prefixed) if dead else set(prefixed)
+        starts = self.postings.get(WORD_START + query[:GRAM_SIZE])
+        second = []
+        if starts is not None:
+            wanted = limit - len(first) if limit else None
+            # starts is exact up to GRAM_SIZE characters, a superset beyond
+            at_word = None if len(query) <= GRAM_SIZE else re.compile(_WORD_SEP.pattern + re.escape(query)).search
+            for pos in starts:
+                if pos in skip:
+                    continue
+                if at_word is None or at_word(self.keys[pos][0]) or at_word(self.keys[pos][1]):
+                    second.append(rows[pos])
+                    skip.add(pos)
+                    if wanted and len(second) >= wanted:
+                        return self._with_patched(query, (first, second, []), limit, boost)
+        third = []
+        wanted = limit - len(first) - len(second) if limit else None
+        for pos in self.candidates(query):   # whatever still contains query is a plain substring match
+            if pos in skip:
+                continue
+            en, hi = self.keys[pos]
+            if query in en or query in hi:
+                third.append(rows[pos])
+                if wanted and len(third) >= wanted:
+                    break
+        buckets = (first, second, third)
+        return self._with_patched(query, buckets, limit, boost)
+
+    def _rank_keys(self, query, en, hi):
+        r_en, r_hi = self.rank(query, en), self.rank(query, hi)
+        return r_hi if r_en is None else r_en if r_hi is None else min(r_en, r_hi)
+
+    def _boosted(self, query, boost):
+        """Rows of the boosted ids that match query, per rank, heaviest first."""
+        out = ([], [], [])
+        for pid in sorted(boost, key=boost.get, reverse=True):
+            if pid in self.patched:
+                en, hi, row = self.patched[pid]
+            elif pid in self.pos_by_id:
+                pos = self.pos_by_id[pid]
+                (en, hi), row = self.keys[pos], self.rows[pos]
+            else:
+                continue
+            r = self._rank_keys(query, en, hi)
+            if r is not None:
+                out[r].append(row)
+        return out
+
+    def _with_patched(self, query, buckets, limit, boost=None):
+        """Merge matching overlay rows into the rank buckets in name order, put the
+        boosted rows first in each rank, then cut to limit."""
+        if self.patched:
+            extra = ([], [], [])
+            for pid, (en, hi, row) in self.patched.items():
+                if boost and pid in boost:
+                    continue
+                r = self._rank_keys(query, en, hi)
+                if r is not None:
+                    extra[r].append((en, row))
+            by_name = lambda row: normalize_text(row[1])
+            buckets = [list(heapq.merge(b, [row for _, row in sorted(e, key=lambda p: p[0])], key=by_name))
+                       if e else b for b, e in zip(buckets, extra)]
+        if boost:
+            buckets = [hot + b for hot, b in zip(self._boosted(query, boost), buckets)]
+        result = buckets[0] + buckets[1] + buckets[2]
+        return result[:limit] if limit else result
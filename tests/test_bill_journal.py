@@ -0,0 +1,81 @@
+from bill_journal import BillJournal, read_journal
+from bill_model import BillModel
+
+
+def replay(path):
+    """{bill: (customer, BillModel)} rebuilt from the journal, as restore_open_bills does."""
+    bills = {}
+    for rec in read_journal(path):
+        customer, model = bills.setdefault(rec["bill"], ["", BillModel()])
+        op, pid = rec["op"], rec.get("pid")
+        if op == "add":
+            model.add(pid, rec["name_hi"], rec["price"])
+        elif op == "qty" and pid in model:
+            model.set_qty(pid, rec["qty"])
+        elif op == "price" and pid in model:
+            model.set_price(pid, rec["price"])
+        elif op == "delete":
+            model.remove(pid)
+        elif op == "clear":
+            model.clear()
+        elif op == "customer":
+            bills[rec["bill"]][0] = rec["name"]
+    return {bill: (customer, model.rows()) for bill, (customer, model) in bills.items()}
+
+
+def ring_up(journal):
+    """A morning at the counter on two bills; returns what the screen shows."""
+    left, right = BillModel(), BillModel()
+
+    def add(bill, model, pid, name_hi, price):
+        model.add(pid, name_hi, price)
+        journal.log(bill, "add", pid=pid, name_hi=name_hi, price=price)
+
+    add("Bill 1", left, 1, "चीनी", 42.5)
+    add("Bill 1", left, 2, "चाय", 19.99)
+    add("Bill 1", left, 1, "चीनी", 42.5)
+    left.set_qty(2, 1.25)
+    journal.log("Bill 1", "qty", pid=2, qty=1.25)
+    journal.log("Bill 1", "customer", name="रमेश")
+    add("Bill 2", right, 3, "तेल", 180)
+    right.clear()
+    journal.log("Bill 2", "clear")
+    add("Bill 2", right, 4, "घी", 650)
+    right.set_price(4, 640)
+    journal.log("Bill 2", "price", pid=4, price=640)
+    add("Bill 2", right, 5, "दाल", 95)
+    right.remove(5)
+    journal.log("Bill 2", "delete", pid=5)
+    return {"Bill 1": ("रमेश", left.rows()), "Bill 2": ("", right.rows())}
+
+
+def test_replay_rebuilds_the_open_bills(tmp_path):
+    path = str(tmp_path / "open_bills.journal")
+    journal = BillJournal(path, commit_interval=0.01)
+    screen = ring_up(journal)
+    journal.close()
+    assert journal.records == 11
+    assert replay(path) == screen
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / "open_bills.journal")
+    journal = BillJournal(path)
+    screen = ring_up(journal)
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"bill":"Bill 1","op":"ad')   # power cut mid-write
+    assert replay(path) == screen
+    assert BillJournal(path).records == 11
+
+
+def test_compact_keeps_the_same_bills(tmp_path):
+    path = str(tmp_path / "open_bills.journal")
+    journal = BillJournal(path)
+    screen = ring_up(journal)
+    journal.compact({bill: (customer, rows) for bill, (customer, rows) in screen.items()})
+    journal.log("Bill 2", "qty", pid=4, qty=2)
+    journal.close()
+    assert journal.records == 7
+    screen["Bill 2"] = ("", [(4, "घी", 640.0, 2)])
+    assert replay(path) == screen
@@ -0,0 +1,68 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from bill_model import BillModel, hundredths, line_total, price_bills
+
+
+@pytest.mark.parametrize("value, expected", [
+    (19, 1900),
+    (19.99, 1999),          # 1998.9999999999998 in binary
+    (0.1 + 0.2, 30),
+    (1.005, 100),           # the float is just below 1.005
+    ("1.005", 101),         # typed text rounds half up
+    (Decimal("2.675"), 268),
+    (Decimal("0.004"), 0),
+    ("0.5", 50),
+])
+def test_hundredths(value, expected):
+    assert hundredths(value) == expected
+
+
+@pytest.mark.parametrize("price, qty, rupees", [
+    (1000, 100, 10),        # exact
+    (1999, 100, 20),        # 19.99 -> 20
+    (1999, 150, 30),        # 29.985 -> 30
+    (1, 1, 1),              # any fraction of a rupee is charged
+    (0, 500, 0),
+    (3333, 300, 100),       # 99.99 -> 100
+])
+def test_line_total_rounds_up_to_whole_rupees(price, qty, rupees):
+    assert line_total(price, qty) == rupees
+
+
+def test_running_total_follows_every_edit():
+    bill = BillModel()
+    bill.add(1, "चीनी", 42.5)
+    bill.add(2, "चाय", "19.99")
+    bill.add(1, "चीनी", 42.5)               # second unit of the same line
+    assert bill.line(1).qty == 2 and bill.total == 85 + 20
+    bill.set_qty(2, 1.25)                   # 24.9875 -> 25
+    bill.set_price(1, Decimal("42.49"))     # 84.98 -> 85
+    assert bill.total == 85 + 25
+    bill.remove(1)
+    assert not bill.remove(1)
+    assert bill.total == 25 == sum(l.total for l in bill)
+    bill.clear()
+    assert bill.total == 0 and len(bill) == 0
+
+
+def test_rows_rebuild_the_same_bill():
+    bill = BillModel([(1, "a", 10.5, 3), (2, "b", "0.99", 0.5), (1, "a", 10.5, 1.25)])
+    assert bill.line(1).qty == 4.25
+    again = BillModel(bill.rows())
+    assert again.rows() == bill.rows() and again.total == bill.total
+    copy = bill.copy()
+    bill.set_qty(2, 10)
+    assert copy.total != bill.total and copy.line(2).qty == 0.5
+
+
+def test_price_bills_matches_bill_model():
+    rnd = random.Random(5)
+    bills = [[(round(rnd.uniform(0.5, 999), 2), rnd.choice((1, 2, 0.5, 1.25, 0.33, 10))) for _ in range(rnd.randint(1, 20))]
+             for _ in range(200)]
+    totals = price_bills(bills)
+    for bill, total in zip(bills, totals):
+        model = BillModel((pid, "x", price, qty) for pid, (price, qty) in enumerate(bill))
+        assert model.total == total
@@ -0,0 +1,95 @@
+from catalog import PATCH_RELOAD, ProductCatalog, normalize_barcode, normalize_name
+
+ROWS = [
+    (1, "Tata Salt 1kg", "टाटा नमक", 28, "8901058000011"),
+    (2, "Surf Excel 500g", "सर्फ एक्सेल", 110, ""),
+    (3, "Amul Ghee 1L", "अमूल घी", 650, "8901262010016"),
+    (4, "Parle-G", "पारले जी", 10, ""),
+]
+
+
+def consistent(catalog):
+    """Every view of the catalog agrees with catalog.rows, which stays in name order."""
+    keys = [normalize_name(r[1]) for r in catalog.rows]
+    assert keys == sorted(keys) == catalog.keys
+    assert catalog.names == [r[1] for r in catalog.rows]
+    assert catalog.by_id == {r[0]: r for r in catalog.rows}
+    assert catalog.by_barcode == {r[4]: r for r in catalog.rows if r[4]}
+    assert sorted(r[0] for r in catalog.search("")) == sorted(catalog.by_id)
+
+
+def test_load_sorts_by_name_and_indexes_barcodes():
+    catalog = ProductCatalog()
+    catalog.load(ROWS)
+    assert [r[0] for r in catalog.rows] == [3, 4, 2, 1]
+    assert catalog.lookup("  tata SALT 1KG ") == ROWS[0]
+    assert catalog.lookup("tata salt") is None
+    assert catalog.get(2) == ROWS[1] and catalog.get(9) is None
+    assert catalog.lookup_barcode(" 8901262 010016 ") == ROWS[2]
+    assert catalog.lookup_barcode("") is None
+    consistent(catalog)
+
+
+def test_streamed_chunks_equal_one_load():
+    streamed, loaded = ProductCatalog(), ProductCatalog()
+    loaded.load(ROWS)
+    for chunk in ([ROWS[2], ROWS[3]], [ROWS[1], ROWS[0]]):
+        streamed.extend(chunk)
+    assert streamed.rows == loaded.rows
+    # a chunk that sorts before what is loaded (other collation) still ends up in order
+    streamed.extend([(5, "Ariel 1kg", "एरियल", 250, "")])
+    assert streamed.rows[1][0] == 5
+    consistent(streamed)
+
+
+def test_prefix():
+    catalog = ProductCatalog()
+    catalog.load(ROWS + [(5, "Parle Monaco", "मोनाको", 20, "")])
+    assert [r[0] for r in catalog.prefix(" PARLE")] == [5, 4]
+    assert catalog.prefix("x") == []
+    assert len(catalog.prefix("")) == 5
+
+
+def test_search_ranks_and_keeps_name_order():
+    catalog = ProductCatalog()
+    catalog.load(ROWS)
+    assert [r[0] for r in catalog.search("")] == [3, 4, 2, 1]
+    assert [r[0] for r in catalog.search("s")] == [2, 1]       # name start, then word start
+    assert [r[0] for r in catalog.search("l", limit=2)] == [3, 4]
+    assert [r[0] for r in catalog.search("घी")] == [3]
+
+
+def test_patch_renames_reprices_and_deletes_in_place():
+    catalog = ProductCatalog()
+    catalog.load(ROWS)
+    catalog.patch([(4, "Britannia Marie", "मैरी", 30, "8901063000015"), (5, "Zandu Balm", "झंडू बाम", 45, "")],
+                  deleted=[2])
+    assert [r[0] for r in catalog.rows] == [3, 4, 1, 5]
+    assert catalog.lookup("parle-g") is None
+    assert catalog.lookup_barcode("8901063000015")[1] == "Britannia Marie"
+    assert catalog.get(2) is None
+    assert [r[0] for r in catalog.search("m")] == [4, 3, 5]   # word start, then substrings in name order
+    consistent(catalog)
+
+
+def test_barcode_moved_to_another_product():
+    catalog = ProductCatalog()
+    catalog.load(ROWS)
+    catalog.patch([(1, "Tata Salt 1kg", "टाटा नमक", 28, ""), (2, "Surf Excel 500g", "सर्फ एक्सेल", 110, "8901058000011")])
+    assert catalog.lookup_barcode("8901058000011")[0] == 2
+    consistent(catalog)
+
+
+def test_large_patch_reloads():
+    catalog = ProductCatalog()
+    catalog.load(ROWS)
+    rows = [(100 + i, f"Item {i:05d}", "वस्तु", i, "") for i in range(PATCH_RELOAD + 1)]
+    catalog.patch(rows, deleted=[1])
+    assert len(catalog) == len(ROWS) - 1 + len(rows)
+    assert not catalog.index.patched
+    consistent(catalog)
+
+
+def test_normalize_barcode():
+    assert normalize_barcode(" 890 1058\t000011 ") == "8901058000011"
+    assert normalize_barcode(None) == ""
@@ -0,0 +1,143 @@
+import time
+from decimal import Decimal
+
+import pytest
+
+from db import FeedExpired
+
+from catalog_service import (CatalogClient, CatalogService, ServiceError, decode_row, encode_row, merge_changes,
+                             serve)
+
+ROWS = [
+    (1, "Tata Salt 1kg", "टाटा नमक", Decimal("28.00"), "8901058000011"),
+    (2, "Surf Excel 500g", "सर्फ एक्सेल", Decimal("110.50"), ""),
+    (3, "Amul Ghee 1L", "अमूल घी", Decimal("650.00"), ""),
+]
+
+
+class Feed:
+    """The Database calls the service makes, over an in-memory change feed."""
+
+    def __init__(self, rows):
+        self.rows = {r[0]: r for r in rows}
+        self.history = []   # (version, changed rows, deleted ids)
+        self.asked = []
+        self.released = 0
+        self.pruned = 0   # versions at or below this have lost their tombstones
+
+    @property
+    def version(self):
+        return self.history[-1][0] if self.history else 1
+
+    def write(self, rows=(), deleted=()):
+        for row in rows:
+            self.rows[row[0]] = row
+        for pid in deleted:
+            self.rows.pop(pid, None)
+        self.history.append((self.version + 1, list(rows), list(deleted)))
+
+    def feed_version(self):
+        return self.version
+
+    def fetch_catalog(self):
+        return list(self.rows.values())
+
+    def changes_since(self, since):
+        self.asked.append(since)
+        if since < self.pruned:
+            raise FeedExpired(since)
+        sets = [(r, d) for v, r, d in self.history if v > since]
+        rows, deleted = merge_changes(sets)
+        return self.version, rows, deleted
+
+    def release(self):
+        self.released += 1
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 10
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def running():
+    feed = Feed(ROWS)
+    service = CatalogService(feed)
+    service.reload()
+    server = serve(service, port=0)
+    client = CatalogClient("127.0.0.1", server.server_address[1])
+    wait_for(lambda: client.version is not None)
+    yield feed, service, client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_rows_survive_the_wire():
+    for row in ROWS:
+        assert decode_row(encode_row(row)) == row
+    assert decode_row(None) is None
+
+
+def test_merge_changes_keeps_the_last_word():
+    a, b = ROWS[0], (1, "Tata Salt 2kg", "टाटा नमक", Decimal("50"), "")
+    assert merge_changes([([a], []), ([b], [2])]) == ([b], [2])
+    assert merge_changes([([a], []), ([], [1])]) == ([], [1])
+    assert merge_changes([([], [1]), ([a], [])]) == ([a], [])
+
+
+def test_reads_come_from_the_service(running):
+    feed, service, client = running
+    version, rows = client.catalog()
+    assert version == 1 and [r[0] for r in rows] == [3, 2, 1]
+    assert client.product_by_name(" surf excel 500G") == ROWS[1]
+    assert client.product_by_barcode("8901058000011") == ROWS[0]
+    assert client.products_by_ids([3, 9, 1]) == [ROWS[2], ROWS[0]]
+    assert client.product_by_id(9) is None and client.product_by_name("nothing") is None
+    assert [r[0] for r in client.search("s", 10)] == [2, 1]
+    assert client.call(["version"], ["name", "Amul Ghee 1L"]) == [1, encode_row(ROWS[2])]
+    with pytest.raises(ServiceError):
+        client.call(["no_such_op"])
+
+
+def test_changes_are_pushed_and_merged_on_the_terminal(running):
+    feed, service, client = running
+    feed.write([(4, "Bread", "ब्रेड", Decimal("40"), "")])
+    service.pull()
+    feed.write([(2, "Surf Excel 1kg", "सर्फ एक्सेल", Decimal("199"), "")], deleted=[1])
+    service.pull()
+    wait_for(lambda: client.version == 3)
+    asked = list(feed.asked)
+    version, rows, deleted = client.changes_since(1)
+    assert version == 3 and sorted(r[0] for r in rows) == [2, 4] and deleted == [1]
+    assert client.changes_since(3) == (3, [], [])
+    assert service.changes(2) == (3, [(2, "Surf Excel 1kg", "सर्फ एक्सेल", Decimal("199"), "")], [1])
+    assert feed.asked == asked   # answered from memory, MySQL was not asked
+    assert client.product_by_name("tata salt 1kg") is None
+
+
+def test_older_changes_than_the_log_go_to_mysql(running):
+    feed, service, client = running
+    feed.write([(4, "Bread", "ब्रेड", Decimal("40"), "")])
+    service.pull()
+    service.log.clear()   # as if CHANGE_LOG sets had gone by
+    assert service.changes(1)[0] == 2 and feed.asked[-1] == 1
+    assert feed.released == 1   # the handler thread's connection went back to the pool
+
+
+def test_expired_feed_reloads_the_service_and_tells_the_terminal(running):
+    feed, service, client = running
+    for i in range(3):
+        feed.write([(10 + i, f"Item {i}", "वस्तु", Decimal(i), "")], deleted=[i + 1])
+    feed.pruned = 3
+    service.version = 1   # the service was away while the tombstones went
+    service.pull()
+    assert service.version == 4 and sorted(r[0] for r in service.catalog.rows) == [10, 11, 12]
+    assert not service.log
+    feed.write([(20, "Jam", "जैम", Decimal("90"), "")])
+    service.pull()
+    wait_for(lambda: client.version == 5)
+    with pytest.raises(FeedExpired):   # the pushes do not reach back to 1, nor does MySQL
+        client.changes_since(1)
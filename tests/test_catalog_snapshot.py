@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from catalog_snapshot import CatalogSnapshot
+
+ROWS = [
+    (1, "Tata Salt 1kg", "टाटा नमक", Decimal("28.00"), "8901058000011"),
+    (2, "Surf Excel 500g", "सर्फ एक्सेल", Decimal("110.50"), ""),
+    (3, "amul Ghee 1L", "अमूल घी", Decimal("650.00"), ""),
+]
+
+
+def read(snapshot, chunk_size=2):
+    return [row for chunk in snapshot.iter_rows(chunk_size) for row in chunk]
+
+
+def test_replace_then_patch(tmp_path):
+    snapshot = CatalogSnapshot(str(tmp_path / "catalog.db"), "pos@localhost")
+    assert snapshot.version() is None and read(snapshot) == []
+    snapshot.replace(7, ROWS)
+    snapshot.patch(9, [(2, "Surf Excel 1kg", "सर्फ एक्सेल", Decimal("199.99"), ""),
+                       (4, "Bread", "ब्रेड", Decimal("40"), "")], deleted=[1])
+    snapshot.flush()
+    assert snapshot.version() == 9
+    assert read(snapshot) == [ROWS[2], (4, "Bread", "ब्रेड", Decimal("40"), ""),
+                              (2, "Surf Excel 1kg", "सर्फ एक्सेल", Decimal("199.99"), "")]
+
+
+def test_patch_without_a_snapshot_is_ignored(tmp_path):
+    snapshot = CatalogSnapshot(str(tmp_path / "catalog.db"), "pos@localhost")
+    snapshot.patch(3, ROWS)
+    snapshot.flush()
+    assert snapshot.version() is None and read(snapshot) == []
+
+
+def test_snapshot_of_another_database_or_cleared_is_unusable(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    snapshot = CatalogSnapshot(path, "pos@localhost")
+    snapshot.replace(5, ROWS)
+    snapshot.flush()
+    assert CatalogSnapshot(path, "pos@shop-server").version() is None
+    assert CatalogSnapshot(path, "pos@localhost").version() == 5
+    snapshot.clear()
+    snapshot.flush()
+    assert snapshot.version() is None and read(snapshot) == []
+
+
+def test_empty_sync_at_the_same_version_writes_nothing(tmp_path):
+    snapshot = CatalogSnapshot(str(tmp_path / "catalog.db"), "pos@localhost")
+    snapshot.replace(5, ROWS)
+    queued = []
+    snapshot._submit = queued.append
+    snapshot.patch(5, [])
+    snapshot.patch(6, [])
+    assert [op[:2] for op in queued] == [("patch", 6)]
@@ -0,0 +1,122 @@
+import itertools
+import threading
+import time
+
+from catalog_sync import CatalogSync
+
+
+class Root:
+    """Tk's after() on a virtual clock."""
+
+    def __init__(self):
+        self.now = 0
+        self.timers = {}
+        self._ids = itertools.count(1)
+
+    def after(self, ms, fn, *args):
+        timer = next(self._ids)
+        self.timers[timer] = (self.now + ms, timer, fn, args)
+        return timer
+
+    def after_cancel(self, timer):
+        self.timers.pop(timer, None)
+
+    def advance(self, ms):
+        end = self.now + ms
+        while self.timers:
+            due, timer, fn, args = min(self.timers.values())
+            if due > end:
+                break
+            del self.timers[timer]
+            self.now = due
+            fn(*args)
+        self.now = end
+
+
+class Feed:
+    """pull() for the worker thread: each call moves the version on by one."""
+
+    def __init__(self):
+        self.pulled, self.applied, self.errors = [], [], []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = None
+
+    def pull(self, since):
+        self.gate.wait(10)
+        self.pulled.append(since)
+        if self.fail:
+            raise self.fail
+        return since + 1, [(since, "row")], []
+
+
+def settle(root, sync):
+    """Let the worker answer and the Tk side collect it."""
+    deadline = time.monotonic() + 10
+    while sync.busy and time.monotonic() < deadline:
+        time.sleep(0.001)
+        root.advance(25)
+
+
+def make(interval_ms=1000):
+    root, feed = Root(), Feed()
+    sync = CatalogSync(root, feed.pull, feed.applied.append, interval_ms=interval_ms, on_error=feed.errors.append)
+    return root, feed, sync
+
+
+def test_polls_from_the_version_it_was_given():
+    root, feed, sync = make()
+    sync.start(5)
+    root.advance(999)
+    assert feed.pulled == []
+    root.advance(1)
+    settle(root, sync)
+    root.advance(1000 - root.now % 1000)
+    settle(root, sync)
+    assert feed.pulled == [5, 6] and sync.version == 7
+    assert feed.applied == [(6, [(5, "row")], []), (7, [(6, "row")], [])]
+    sync.stop()
+
+
+def test_now_during_a_pull_asks_again_once_it_is_back():
+    root, feed, sync = make()
+    sync.start(1)
+    feed.gate.clear()
+    sync.now()
+    sync.now()
+    sync.now()
+    assert sync.busy
+    feed.gate.set()
+    settle(root, sync)
+    root.advance(25)
+    settle(root, sync)
+    assert feed.pulled == [1, 2] and sync.version == 3
+    sync.stop()
+
+
+def test_result_from_before_a_reload_is_dropped():
+    root, feed, sync = make()
+    sync.start(1)
+    feed.gate.clear()
+    sync.now()
+    sync.pause()
+    sync.now()                # paused: nothing to pull
+    sync.start(50)            # the catalog was reloaded meanwhile
+    feed.gate.set()
+    settle(root, sync)
+    assert feed.applied == [] and sync.version == 50
+    sync.stop()
+
+
+def test_errors_go_to_on_error_and_keep_the_version():
+    root, feed, sync = make()
+    sync.start(3)
+    feed.fail = ConnectionError("feed down")
+    sync.now()
+    settle(root, sync)
+    assert feed.errors == [feed.fail] and sync.version == 3 and not sync.busy
+    feed.fail = None
+    root.advance(1000)
+    settle(root, sync)
+    assert sync.version == 4
+    sync.stop()
@@ -0,0 +1,208 @@
+import threading
+
+import mysql.connector
+import pytest
+from mysql.connector import errorcode
+
+import db
+
+
+class Server:
+    """What the fake connections talk to: canned answers, scripted failures, a log."""
+
+    def __init__(self):
+        self.answers = {}     # sql -> rows
+        self.failures = []    # errors raised by the next executes, in order
+        self.log = []         # (connection number, sql) per execute
+        self.opened = []
+
+    def lost(self):
+        return mysql.connector.OperationalError(msg="server has gone away", errno=errorcode.CR_SERVER_GONE_ERROR)
+
+
+class Cursor:
+    def __init__(self, conn, prepared):
+        self.conn, self.prepared, self.rows, self.closed = conn, prepared, [], False
+        self.lastrowid = None
+
+    def execute(self, sql, params=()):
+        server = self.conn.server
+        server.log.append((self.conn.number, sql))
+        if server.failures:
+            raise server.failures.pop(0)
+        self.rows = list(server.answers.get(sql, []))
+        self.lastrowid = self.rowcount = len(self.rows)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def close(self):
+        self.closed = True
+
+
+class Connection:
+    def __init__(self, server):
+        self.server, self.number = server, len(server.opened)
+        self.cursors, self.commits, self.rollbacks, self.closed = [], 0, 0, False
+        server.opened.append(self)
+
+    def cursor(self, prepared=False):
+        self.cursors.append(Cursor(self, prepared))
+        return self.cursors[-1]
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, **kwargs):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = Server()
+
+    class Pool:
+        def __init__(self, **config):
+            pass
+
+        def get_connection(self):
+            return Connection(server)
+
+    monkeypatch.setattr(db.pooling, "MySQLConnectionPool", Pool)
+    return server
+
+
+def test_read_is_retried_once_on_a_fresh_connection(server):
+    database = db.Database({})
+    server.answers["SELECT 1"] = [(1,)]
+    server.failures = [server.lost()]
+    assert database.query("SELECT 1") == [(1,)]
+    first, second = server.opened
+    assert first.closed and not second.closed
+    assert server.log == [(0, "SELECT 1"), (1, "SELECT 1")]
+
+
+def test_second_loss_and_other_errors_are_raised(server):
+    database = db.Database({})
+    server.failures = [server.lost(), server.lost()]
+    with pytest.raises(mysql.connector.OperationalError):
+        database.query("SELECT 1")
+    server.failures = [mysql.connector.ProgrammingError(msg="syntax", errno=errorcode.ER_PARSE_ERROR)]
+    with pytest.raises(mysql.connector.ProgrammingError):
+        database.query("SELEC 1")
+    assert len(server.log) == 3 and len(server.opened) == 2   # a syntax error keeps the connection
+
+
+def test_each_thread_has_its_own_connection(server):
+    database = db.Database({})
+    database.query("SELECT 1")
+
+    def worker():
+        database.query("SELECT 1")
+        database.release()
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    main, other = server.opened
+    assert other.closed and not main.closed
+    database.query("SELECT 1")
+    assert len(server.opened) == 2   # the Tk thread kept its connection
+
+
+def test_prepared_statement_is_parsed_once_per_connection(server):
+    database = db.Database({})
+    server.answers[db.SQL_PRODUCT_BY_ID] = [(7, "Tea", "चाय", 5)]
+    for _ in range(3):
+        assert database.product_by_id(7)[0] == 7
+    conn, = server.opened
+    assert [c.prepared for c in conn.cursors] == [True]
+
+
+def test_transaction_commits_or_rolls_back(server):
+    database = db.Database({})
+    with database.transaction() as cur:
+        cur.execute("UPDATE products SET price=1")
+    with pytest.raises(ZeroDivisionError):
+        with database.transaction() as cur:
+            cur.execute("UPDATE products SET price=2")
+            1 / 0
+    conn, = server.opened
+    assert (conn.commits, conn.rollbacks) == (1, 1)
+    assert all(c.closed for c in conn.cursors)
+
+
+def test_write_is_not_replayed_after_a_lost_connection(server):
+    database = db.Database({})
+    server.failures = [server.lost()]
+    with pytest.raises(mysql.connector.OperationalError):
+        database.execute("INSERT INTO products VALUES (1)")
+    assert server.log == [(0, "INSERT INTO products VALUES (1)")]
+    database.execute("INSERT INTO products VALUES (2)")
+    first, second = server.opened
+    assert first.closed and second.commits == 1   # the dead connection was still replaced
+
+
+def test_forgotten_prepared_statement_is_prepared_again(server):
+    database = db.Database({})
+    server.answers[db.SQL_PRODUCT_BY_ID] = [(7, "Tea", "चाय", 5, "")]
+    database.product_by_id(7)
+    server.failures = [mysql.connector.DatabaseError(msg="Unknown prepared statement handler",
+                                                     errno=db.ER_UNKNOWN_STMT_HANDLER)]
+    assert database.product_by_id(7)[0] == 7
+    first, second = server.opened
+    assert first.closed and [c.prepared for c in second.cursors] == [True]
+
+
+def test_transaction_drops_a_lost_connection(server):
+    database = db.Database({})
+    server.failures = [server.lost()]
+    with pytest.raises(mysql.connector.OperationalError):
+        with database.transaction() as cur:
+            cur.execute("UPDATE products SET price=1")
+    with database.transaction() as cur:
+        cur.execute("UPDATE products SET price=1")
+    first, second = server.opened
+    assert first.closed and (second.commits, second.rollbacks) == (1, 0)
+
+
+def test_pool_opens_with_the_first_statement(server):
+    database = db.Database({})
+    database.release()
+    assert database.pool is None and not server.opened
+    database.query("SELECT 1")
+    assert database.pool is not None and len(server.opened) == 1
+
+
+def test_feed_behind_the_pruned_tombstones_has_expired(server):
+    database = db.Database({})
+    server.answers[db.SQL_FEED_STATE] = [(40, 25)]
+    server.answers[db.SQL_CHANGED_PRODUCTS] = [(3, "Tea", "चाय", 5, "")]
+    server.answers[db.SQL_TOMBSTONES] = [(9,)]
+    assert database.changes_since(25) == (40, [(3, "Tea", "चाय", 5, "")], [9])
+    assert database.changes_since(40) == (40, [], [])
+    with pytest.raises(db.FeedExpired):
+        database.changes_since(24)
+    conn, = server.opened
+    assert conn.rollbacks == 1
+
+
+def test_prune_feed_raises_the_horizon_before_deleting(server):
+    database = db.Database({})
+    server.answers[db.SQL_OLD_TOMBSTONES] = [(None,)]   # nothing old enough
+    assert database.prune_feed() == 0
+    server.answers[db.SQL_OLD_TOMBSTONES] = [(17,)]
+    database.prune_feed()
+    statements = [sql.split()[0] for _, sql in server.log]
+    assert statements == ["SELECT", "SELECT", "UPDATE", "DELETE"]
+    assert server.opened[0].commits == 2
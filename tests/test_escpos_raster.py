@@ -0,0 +1,99 @@
+import random
+
+import pytest
+from PIL import Image
+
+from escpos_raster import FEED_MIN_ROWS, THRESHOLD, V0_MAX_ROWS, encode_image, to_mono
+
+
+def decode(data):
+    """Printed rows of an encoded receipt, as bytes per row, plus the commands seen."""
+    rows, commands, i = [], [], 0
+    width_bytes = None
+    while i < len(data):
+        if data[i:i + 2] == b"\x1bJ":
+            assert data[i + 2] > 0
+            rows.extend([None] * data[i + 2])   # blank feed, width unknown until a band
+            commands.append("feed")
+            i += 3
+        elif data[i:i + 4] == b"\x1dv0\x00":
+            wb, h = data[i + 4] | data[i + 5] << 8, data[i + 6] | data[i + 7] << 8
+            assert 0 < h <= V0_MAX_ROWS
+            body = data[i + 8:i + 8 + wb * h]
+            rows.extend(body[y * wb:(y + 1) * wb] for y in range(h))
+            width_bytes = wb
+            commands.append("v0")
+            i += 8 + wb * h
+        else:
+            raise AssertionError(f"unknown command at byte {i}: {data[i:i + 4]!r}")
+    return [bytes(width_bytes) if r is None else r for r in rows], commands
+
+
+def expected_rows(img):
+    """Dots the receipt should print: dark pixels, from the first to the last inked row,
+    up to the rightmost inked column."""
+    mono = img.convert("L")
+    w, h = mono.size
+    ink = [[mono.getpixel((x, y)) <= THRESHOLD for x in range(w)] for y in range(h)]
+    inked = [y for y in range(h) if any(ink[y])]
+    if not inked:
+        return []
+    right = max(x + 1 for row in ink for x, dot in enumerate(row) if dot)
+    out = []
+    for y in range(inked[0], inked[-1] + 1):
+        bits = ink[y][:right] + [False] * (-right % 8)
+        out.append(bytes(sum(bits[b * 8 + k] << (7 - k) for k in range(8)) for b in range(len(bits) // 8)))
+    return out
+
+
+def receipt(width, height, seed, blank_runs=()):
+    """Gray 'text' lines with blank gaps of the given heights between them."""
+    rnd = random.Random(seed)
+    img = Image.new("L", (width, height), 255)
+    y = rnd.randint(0, 12)
+    gaps = list(blank_runs)
+    while y < height - 20:
+        for row in range(y, min(height - 20, y + rnd.randint(2, 14))):
+            for x in range(rnd.randint(0, 10), rnd.randint(width // 3, width - 5)):
+                if rnd.random() < 0.35:
+                    img.putpixel((x, row), rnd.choice((0, 90, 150, 170, 200)))
+            y = row + 1
+        y += gaps.pop(0) if gaps else rnd.randint(1, 3)
+    return img
+
+
+@pytest.mark.parametrize("blank_runs", [(), (FEED_MIN_ROWS - 1, FEED_MIN_ROWS, 40, 300, 600)])
+def test_decoded_raster_is_the_image(blank_runs):
+    img = receipt(203, 1400, seed=len(blank_runs), blank_runs=blank_runs)
+    data, report = encode_image(img)
+    rows, commands = decode(data)
+    assert rows == expected_rows(img)
+    assert report.encoded_bytes == len(data) < report.raw_bytes
+    assert report.rows == len(rows) and report.trimmed_rows == img.size[1] - len(rows)
+    assert report.bands <= commands.count("v0")   # a band taller than V0_MAX_ROWS is several v0
+    if blank_runs:
+        assert "feed" in commands and report.fed_rows >= 40 + 300 + 600
+
+
+def test_tall_band_is_split_for_gs_v0():
+    img = Image.new("L", (64, V0_MAX_ROWS * 2 + 17), 255)
+    for y in range(img.size[1]):
+        img.putpixel((y % 64, y), 0)   # ink on every row: one band, no feeds
+    data, report = encode_image(img)
+    rows, commands = decode(data)
+    assert rows == expected_rows(img)
+    assert commands == ["v0", "v0", "v0"] and report.bands == 1
+
+
+def test_blank_image_sends_nothing():
+    data, report = encode_image(Image.new("RGB", (384, 500), "white"))
+    assert data == b"" and report.rows == 0 and report.trimmed_rows == 500
+
+
+def test_transparent_background_prints_white():
+    img = Image.new("RGBA", (40, 10), (0, 0, 0, 0))
+    img.putpixel((3, 4), (0, 0, 0, 255))
+    mono = to_mono(img)
+    assert [(x, y) for y in range(10) for x in range(40) if mono.getpixel((x, y)) == 0] == [(3, 4)]
+    rows, _ = decode(encode_image(img)[0])
+    assert rows == [b"\x10"]
@@ -0,0 +1,125 @@
+import pytest
+
+import migrations
+from migrations import FEED_PRUNED_COLUMN, MIGRATIONS, MigrationError, feed_pruning, migrate
+
+
+class Database:
+    """The calls migrate() makes, against an in-memory schema_migrations."""
+
+    def __init__(self, applied=(), lock=1):
+        self.applied = dict.fromkeys(applied, "earlier")
+        self.table = bool(applied)
+        self.lock, self.locked = lock, False
+        self.log = []
+
+    def has_table(self, table):
+        return table == "schema_migrations" and self.table
+
+    def query(self, sql, params=()):
+        assert sql == "SELECT version FROM schema_migrations"
+        return [(v,) for v in self.applied]
+
+    def query_one(self, sql, params=()):
+        self.log.append(sql.split("(")[0])
+        if "GET_LOCK" in sql:
+            self.locked = self.lock == 1
+            return (self.lock,)
+        self.locked = False
+        return (1,)
+
+    def execute(self, sql, params=()):
+        if sql == migrations.MIGRATIONS_TABLE:
+            self.table = True
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            assert self.locked
+            self.applied[params[0]] = params[1]
+        else:
+            raise AssertionError(sql)
+
+
+def steps(names, fail=None):
+    ran = []
+
+    def step(name):
+        def run(db):
+            if name == fail:
+                raise RuntimeError(name)
+            ran.append(name)
+        return run
+    return [(v, name, step(name)) for v, name in enumerate(names, 1)], ran
+
+
+def test_migrations_are_numbered_in_order():
+    versions = [m[0] for m in MIGRATIONS]
+    assert versions == list(range(1, len(MIGRATIONS) + 1))
+    assert len({m[1] for m in MIGRATIONS}) == len(MIGRATIONS)
+
+
+def test_fresh_database_runs_every_step_in_order_once():
+    db = Database()
+    plan, ran = steps(["a", "b", "c"])
+    assert migrate(db, plan) == ["a", "b", "c"] == ran
+    assert db.applied == {1: "a", 2: "b", 3: "c"}
+    assert db.log == ["SELECT GET_LOCK", "SELECT RELEASE_LOCK"]
+    db.log.clear()
+    assert migrate(db, plan) == [] and ran == ["a", "b", "c"]
+    assert db.log == []   # up to date: no lock, no DDL
+
+
+def test_only_missing_steps_run():
+    db = Database(applied=[1, 3])
+    plan, ran = steps(["a", "b", "c", "d"])
+    assert migrate(db, plan) == ["b", "d"] == ran
+
+
+def test_busy_lock_runs_nothing():
+    db = Database(lock=0)
+    plan, ran = steps(["a"])
+    with pytest.raises(MigrationError):
+        migrate(db, plan)
+    assert ran == [] and db.applied == {}
+
+
+def test_failed_step_keeps_earlier_ones_and_releases_the_lock():
+    db = Database()
+    plan, ran = steps(["a", "b", "c"], fail="b")
+    with pytest.raises(RuntimeError):
+        migrate(db, plan)
+    assert db.applied == {1: "a"} and not db.locked
+    plan, ran = steps(["a", "b", "c"])
+    assert migrate(db, plan) == ["b", "c"]
+
+
+def test_steps_done_while_waiting_for_the_lock_are_not_run_again():
+    db = Database()
+    plan, ran = steps(["a", "b"])
+    query_one = db.query_one
+
+    def other_terminal_finished(sql, params=()):
+        if "GET_LOCK" in sql:
+            db.table, db.applied = True, {1: "a", 2: "b"}
+        return query_one(sql, params)
+
+    db.query_one = other_terminal_finished
+    assert migrate(db, plan) == [] and ran == []
+
+
+def test_feed_pruning_adds_its_column_once():
+    executed = []
+
+    class Schema:
+        columns = set()
+
+        def has_column(self, table, column):
+            return (table, column) in self.columns
+
+        def execute(self, sql):
+            executed.append(sql)
+            self.columns.add(("catalog_version", "pruned"))
+
+    db = Schema()
+    feed_pruning(db)
+    feed_pruning(db)
+    assert executed == [FEED_PRUNED_COLUMN]
+    assert MIGRATIONS[-1][1:] == ("feed pruning", feed_pruning)
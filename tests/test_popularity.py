@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+
+import popularity
+from popularity import Popularity
+
+DAY = 86400
+
+
+@pytest.fixture
+def counters(tmp_path):
+    return Popularity(str(tmp_path / "popularity.json"), half_life_days=7, hot_items=3)
+
+
+def test_adds_decay_by_half_each_half_life(counters):
+    t0 = counters.epoch
+    counters.bump(1, now=t0)
+    counters.bump(1, now=t0)
+    assert counters.score(1, now=t0) == pytest.approx(2)
+    assert counters.score(1, now=t0 + 7 * DAY) == pytest.approx(1)
+    assert counters.score(1, now=t0 + 14 * DAY) == pytest.approx(0.5)
+    assert counters.score(2, now=t0) == 0
+
+
+def test_recent_adds_outrank_old_ones(counters):
+    t0 = counters.epoch
+    for _ in range(3):
+        counters.bump(1, now=t0)              # 3 adds four weeks ago: 3/16 today
+    counters.bump(2, now=t0 + 28 * DAY)       # 1 add today
+    counters.bump(3, now=t0 + 21 * DAY)       # 1 add last week: 1/2
+    assert counters.top(3) == [2, 3, 1]
+    assert counters.top(1) == [2]
+
+
+def test_hot_keeps_the_heaviest_and_follows_bumps(counters):
+    t0 = counters.epoch
+    for pid, adds in ((1, 5), (2, 4), (3, 3), (4, 2)):
+        for _ in range(adds):
+            counters.bump(pid, now=t0)
+    assert set(counters.hot()) == {1, 2, 3}
+    for _ in range(4):
+        counters.bump(4, now=t0)
+    assert set(counters.hot()) == {1, 4, 2}
+    counters.forget(4)
+    assert set(counters.hot()) == {1, 2, 3} and 4 not in counters.weights
+
+
+def test_rebase_keeps_the_order(counters, monkeypatch):
+    monkeypatch.setattr(popularity, "REBASE_LOG2", 2)
+    t0 = counters.epoch
+    counters.bump(1, now=t0)
+    counters.bump(1, now=t0)
+    counters.bump(2, now=t0 + 14 * DAY)
+    counters.bump(3, now=t0 + 21 * DAY)       # three half-lives on: re-based first
+    assert counters.epoch == t0 + 21 * DAY
+    assert counters.score(1, now=t0 + 21 * DAY) == pytest.approx(0.25)
+    assert counters.top(3) == [3, 2, 1]
+
+
+def test_save_and_load(counters, tmp_path):
+    counters.bump(7)
+    counters.bump(7)
+    counters.bump(9)
+    counters.save()
+    assert not counters.dirty
+    again = Popularity(counters.path)
+    assert again.top(2) == [7, 9]
+    assert again.score(7) == pytest.approx(counters.score(7), rel=1e-3)
+    with open(counters.path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert len(Popularity(counters.path)) == 0
+    with open(counters.path, "w", encoding="utf-8") as f:   # last used a year ago: decayed away
+        json.dump({"epoch": time.time() - 365 * DAY, "weights": {"1": 1.0}}, f)
+    assert len(Popularity(counters.path)) == 0
@@ -0,0 +1,192 @@
+import csv
+import re
+import sqlite3
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+
+import pytest
+
+import price_list
+from price_list import (EXPORT_HEADER, SQL_UPSERT, clean_barcode, clean_name, parse_price,
+                        read_price_list, upsert_products, write_price_list)
+
+CATALOG = [
+    (1, "Tata Salt 1kg", "टाटा नमक", Decimal("28.00"), "8901058000011"),
+    (2, "Surf Excel 500g", "सर्फ एक्सेल", Decimal("110.50"), ""),
+    (3, "Amul Ghee 1L", "अमूल घी", Decimal("650"), "8901262010016"),
+]
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+@pytest.mark.parametrize("text, price", [
+    ("28", Decimal("28.00")),
+    ("1,250.5", Decimal("1250.50")),
+    ("₹ 45", Decimal("45.00")),
+    ("Rs. 9.9", Decimal("9.90")),
+    (12.5, Decimal("12.50")),
+])
+def test_parse_price(text, price):
+    assert parse_price(text) == price
+
+
+@pytest.mark.parametrize("text", ["", None, "abc", "-1", "100000000"])
+def test_parse_price_rejects(text):
+    with pytest.raises((InvalidOperation, ValueError)):
+        parse_price(text)
+
+
+def test_clean_name():
+    assert clean_name("  Amul \t Ghee\n1L ") == "Amul Ghee 1L"
+    assert clean_name("Cafe\u0301") == "Caf\u00e9"
+    assert clean_name(None) == ""
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".xlsx"])
+def test_export_reads_back(tmp_path, suffix):
+    if suffix == ".xlsx":
+        pytest.importorskip("openpyxl")
+    path = str(tmp_path / ("products" + suffix))
+    seen = []
+    assert write_price_list(path, CATALOG, progress=lambda done, total: seen.append((done, total))) == 3
+    assert seen[-1] == (3, 3)
+    products, errors = read_price_list(path)
+    assert errors == []
+    assert products == [(en, hi, price, barcode) for _, en, hi, price, barcode in CATALOG]
+
+
+def test_streamed_export_counts_what_it_wrote(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_list, "UPSERT_BATCH", 2)
+    path = str(tmp_path / "products.csv")
+    seen = []
+    rows = (row for row in CATALOG)
+    assert write_price_list(path, rows, progress=lambda done, total: seen.append((done, total)), total=10) == 3
+    assert seen == [(2, 10), (3, 10), (3, 10)]   # total was an estimate; the last call says what was written
+    assert len(read_price_list(path)[0]) == 3
+
+
+def test_header_aliases_and_bad_lines(tmp_path):
+    path = write_csv(tmp_path / "list.csv", [
+        ["Rate", "Hindi", "Name", "Notes"],
+        ["30", "चीनी", " Sugar  1kg", "x"],
+        ["", "", "", ""],
+        ["abc", "चाय", "Tea", ""],
+        ["10", "", "Salt", ""],
+        ["12", "नमक", "SUGAR 1KG", ""],
+        ["40", "दाल", "Dal"],
+        ["5", "x" * 101, "Long", ""],
+    ])
+    products, errors = read_price_list(path)
+    assert products == [("Sugar 1kg", "चीनी", Decimal("30.00")), ("Dal", "दाल", Decimal("40.00"))]
+    assert [line for line, _ in errors] == [4, 5, 6, 8]
+    assert "duplicate of line 2" in errors[2][1]
+
+
+def test_barcode_column(tmp_path):
+    path = write_csv(tmp_path / "list.csv", [
+        ["name_en", "name_hi", "price", "Barcode"],
+        ["Tea", "चाय", "10", " 890 1058000011 "],
+        ["Salt", "नमक", "20", ""],
+        ["Dal", "दाल", "30", "8901058000011"],
+        ["Oil", "तेल", "40", "1" * 33],
+    ])
+    products, errors = read_price_list(path)
+    assert products == [("Tea", "चाय", Decimal("10.00"), "8901058000011"), ("Salt", "नमक", Decimal("20.00"), "")]
+    assert errors == [(4, "barcode also on line 2"), (5, "barcode longer than 32 characters")]
+    assert clean_barcode(8901058000011.0) == "8901058000011"
+
+
+def test_unusable_files(tmp_path):
+    with pytest.raises(ValueError, match="price"):
+        read_price_list(write_csv(tmp_path / "a.csv", [["name_en", "name_hi"], ["Tea", "चाय"]]))
+    with pytest.raises(ValueError, match="empty"):
+        read_price_list(write_csv(tmp_path / "b.csv", []))
+    latin = tmp_path / "c.csv"
+    latin.write_bytes("name_en,name_hi,price\nCaf\xe9,x,1\n".encode("latin-1"))
+    with pytest.raises(ValueError, match="UTF-8"):
+        read_price_list(str(latin))
+
+
+class Cursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql, params):
+        self.log.append((sql, list(params)))
+
+    def executemany(self, sql, rows):
+        self.log.append((sql, list(rows)))
+
+
+def test_upsert_sends_batches_in_one_transaction(monkeypatch):
+    monkeypatch.setattr(price_list, "UPSERT_BATCH", 2)
+    log, commits = [], []
+
+    class Database:
+        @contextmanager
+        def transaction(self):
+            yield Cursor(log)
+            commits.append(True)
+
+    products = [(f"P{i}", "प", Decimal(i)) for i in range(5)]
+    assert upsert_products(Database(), products) == 5
+    assert {sql for sql, _ in log} == {SQL_UPSERT}
+    batches = [rows for _, rows in log]
+    assert [len(b) for b in batches] == [2, 2, 1] and sum(batches, []) == products
+    assert commits == [True]
+    assert EXPORT_HEADER == ("id", "name_en", "name_hi", "price", "barcode")
+
+
+class SqliteCursor:
+    """The MySQL statements of upsert_products, run on SQLite."""
+
+    def __init__(self, con):
+        self.cur = con.cursor()
+
+    @staticmethod
+    def sql(sql):
+        sql = sql.replace("%s", "?").replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT(name_en) DO UPDATE SET")
+        return re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+
+    @staticmethod
+    def params(row):
+        return [str(v) if isinstance(v, Decimal) else v for v in row]
+
+    def execute(self, sql, params):
+        self.cur.execute(self.sql(sql), self.params(params))
+
+    def executemany(self, sql, rows):
+        self.cur.executemany(self.sql(sql), [self.params(r) for r in rows])
+
+
+def test_barcodes_round_trip_through_the_database(tmp_path, monkeypatch):
+    """Export, import into a database holding other barcodes, export again: the same list."""
+    monkeypatch.setattr(price_list, "UPSERT_BATCH", 2)
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, name_en TEXT UNIQUE COLLATE NOCASE,"
+                " name_hi TEXT, price TEXT, barcode TEXT UNIQUE)")
+    con.executemany("INSERT INTO products VALUES (?,?,?,?,?)", [
+        (1, "Tata Salt 1kg", "नमक", "20.00", "1111"),          # the file gives it another barcode
+        (2, "Surf Excel 500g", "सर्फ", "100.00", "2222"),      # the file clears it
+        (9, "Old Stock", "पुराना", "1.00", "8901262010016"),   # the file moves it to Amul Ghee
+    ])
+
+    class Database:
+        @contextmanager
+        def transaction(self):
+            yield SqliteCursor(con)
+            con.commit()
+
+    path = str(tmp_path / "products.csv")
+    write_price_list(path, CATALOG)
+    products, errors = read_price_list(path)
+    assert errors == [] and upsert_products(Database(), products) == 3
+    assert con.execute("SELECT barcode FROM products WHERE id = 9").fetchone() == (None,)
+    rows = con.execute("SELECT id, name_en, name_hi, price, barcode FROM products WHERE id <> 9 ORDER BY id")
+    again = str(tmp_path / "again.csv")
+    write_price_list(again, [(pid, en, hi, Decimal(price), code or "") for pid, en, hi, price, code in rows])
+    assert read_price_list(again) == (products, [])
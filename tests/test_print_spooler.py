@@ -0,0 +1,122 @@
+import queue
+import threading
+
+import pytest
+
+from print_spooler import PRIORITY_HIGH, PartialSend, PrintSpooler
+
+
+class Root:
+    """Runs on_status right away, on the worker thread; the tests only record it."""
+
+    def after(self, ms, fn, *args):
+        fn(*args)
+
+
+class Printer:
+    def __init__(self, log):
+        self.log, self.closed = log, False
+
+    def close(self):
+        self.closed = True
+
+
+class Harness:
+    def __init__(self, failures=0, error=OSError("port closed"), **kwargs):
+        self.sent, self.printers, self.statuses, self.outcome = [], [], [], {}
+        self.failures, self.error = failures, error
+        self.finished = threading.Semaphore(0)
+        self.spooler = PrintSpooler(self.connect, Root(), send=self.send, retry_delay=0, **kwargs)
+
+    def connect(self):
+        self.printers.append(Printer(self.sent))
+        return self.printers[-1]
+
+    def send(self, printer, payload):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.sent.append(payload)
+        return len(payload)
+
+    def on_status(self, job, status, error):
+        self.statuses.append((job.id, status, error))
+        if status in ("done", "failed"):
+            self.outcome[job.id] = status, error
+            self.finished.release()
+
+    def submit(self, render, **kwargs):
+        return self.spooler.submit(render, on_status=self.on_status, **kwargs)
+
+    def wait(self, jobs=1):
+        for _ in range(jobs):
+            assert self.finished.acquire(timeout=10)
+
+
+def test_high_priority_jobs_jump_the_queue():
+    h = Harness()
+    gate = threading.Event()
+    h.submit(lambda: gate.wait(10) and "first")
+    h.submit(lambda: "normal 1")
+    h.submit(lambda: "normal 2")
+    h.submit(lambda: "copy", priority=PRIORITY_HIGH)
+    gate.set()
+    h.wait(4)
+    assert h.sent == ["first", "copy", "normal 1", "normal 2"]
+    assert len(h.printers) == 1   # one connection for every job
+
+
+def test_failed_send_reconnects_and_retries():
+    h = Harness(failures=2)
+    job = h.submit(lambda: "receipt")
+    h.wait()
+    assert h.outcome[job.id] == ("done", None) and h.sent == ["receipt"]
+    assert job.result == len("receipt")   # what send() reported, e.g. the bytes on the wire
+    assert len(h.printers) == 3 and all(p.closed for p in h.printers[:2])
+
+
+def test_gives_up_after_the_retries():
+    h = Harness(failures=5, retries=3)
+    job = h.submit(lambda: "receipt")
+    h.wait()
+    status, error = h.outcome[job.id]
+    assert status == "failed" and isinstance(error, OSError)
+    assert h.sent == [] and len(h.printers) == 3
+    assert [s for _, s, _ in h.statuses] == ["queued", "printing", "failed"]
+
+
+def test_partial_send_fails_without_printing_again():
+    h = Harness(failures=1, error=PartialSend("stopped after 4,096 of 9,000 bytes"))
+    job = h.submit(lambda: "receipt")
+    h.submit(lambda: "next bill")
+    h.wait(2)
+    status, error = h.outcome[job.id]
+    assert status == "failed" and isinstance(error, PartialSend)
+    assert h.sent == ["next bill"]   # the torn receipt is left for the cashier to reprint
+    assert len(h.printers) == 2 and h.printers[0].closed
+
+
+def test_render_error_fails_without_sending():
+    h = Harness()
+    job = h.submit(lambda: 1 / 0)
+    h.wait()
+    status, error = h.outcome[job.id]
+    assert status == "failed" and isinstance(error, ZeroDivisionError)
+    assert h.printers == []
+
+
+def test_full_queue_refuses_jobs_and_stop_closes_the_printer():
+    h = Harness(maxsize=2)
+    gate = threading.Event()
+    h.submit(lambda: gate.wait(10) and "busy")
+    while h.spooler.pending():   # the worker takes the first job and holds it
+        pass
+    h.submit(lambda: "a")
+    h.submit(lambda: "b")
+    with pytest.raises(queue.Full):
+        h.submit(lambda: "c")
+    gate.set()
+    h.wait(3)
+    h.spooler.stop()
+    h.spooler._thread.join(10)
+    assert h.printers[0].closed and h.sent == ["busy", "a", "b"]
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from query_executor import QueryExecutor, QueryTimeout
+
+
+class Root:
+    """Tk's after(): callbacks wait for pump(), which runs them on the test thread."""
+
+    def __init__(self):
+        self.timers = []
+
+    def after(self, ms, fn, *args):
+        self.timers.append((fn, args))
+
+    def pump(self, executor, until=lambda: False):
+        deadline = time.monotonic() + 10
+        while (executor.pending or self.timers) and not until() and time.monotonic() < deadline:
+            timers, self.timers = self.timers, []
+            for fn, args in timers:
+                fn(*args)
+            time.sleep(0.001)
+
+
+@pytest.fixture
+def tk():
+    root, seen = Root(), []
+    executor = QueryExecutor(root, workers=1, on_pending=seen.append)
+    yield root, executor, seen
+    executor.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def test_results_and_errors_come_back_on_the_tk_thread(tk):
+    root, executor, seen = tk
+    done, failed = [], []
+    executor.submit(lambda a, b: a + b, 2, 3, label="Adding",
+                    on_done=lambda r: done.append((r, threading.current_thread().name)))
+    executor.submit(lambda: 1 / 0, label="Dividing", on_error=failed.append)
+    assert seen[-1] == ["Adding", "Dividing"]
+    root.pump(executor)
+    assert done == [(5, threading.current_thread().name)]
+    assert isinstance(failed[0], ZeroDivisionError)
+    assert seen[-1] == [] and not executor._polling
+
+
+def test_newer_query_with_the_same_tag_wins(tk):
+    root, executor, _ = tk
+    gate, done = threading.Event(), []
+    first = executor.submit(lambda: gate.wait(10) and "old", tag="search", on_done=done.append)
+    second = executor.submit(lambda: "new", tag="search", on_done=done.append)
+    assert first.state == "cancelled" and executor.tags["search"] is second
+    gate.set()
+    root.pump(executor)
+    assert done == ["new"] and second.state == "done"
+
+
+def test_cancel_skips_a_query_not_started_yet(tk):
+    root, executor, _ = tk
+    gate, ran = threading.Event(), []
+    executor.submit(lambda: gate.wait(10))
+    executor.submit(ran.append, "ran", tag="lookup")
+    executor.cancel("lookup")
+    gate.set()
+    root.pump(executor)
+    assert ran == [] and not executor.tags
+
+
+def test_slow_query_times_out_and_its_late_result_is_dropped(tk):
+    root, executor, _ = tk
+    gate, done, failed = threading.Event(), [], []
+    q = executor.submit(lambda: gate.wait(10) and "late", label="Catalog", timeout=0.02,
+                        on_done=done.append, on_error=failed.append)
+    root.pump(executor)
+    assert q.state == "timed out" and isinstance(failed[0], QueryTimeout) and "Catalog" in str(failed[0])
+    gate.set()
+    executor.submit(lambda: None)   # keeps the poll going until the late result is collected
+    root.pump(executor)
+    assert done == [] and len(failed) == 1
@@ -0,0 +1,58 @@
+import os
+
+import receipt_cache
+from receipt_cache import ReceiptCache, receipt_key
+
+ROWS = [("चीनी", 2, 42.5, 85), ("चाय", 1.25, 19.99, 25)]
+
+
+def test_key_covers_everything_printed():
+    key = receipt_key(ROWS, "रमेश", 110, "18-10-2026 10:15")
+    assert key == receipt_key([list(r) for r in ROWS], "रमेश", 110, "18-10-2026 10:15")
+    others = [receipt_key(ROWS[:1], "रमेश", 110, "18-10-2026 10:15"),
+              receipt_key(ROWS, "", 110, "18-10-2026 10:15"),
+              receipt_key(ROWS, "रमेश", 110, "18-10-2026 10:16"),
+              receipt_key(ROWS, "रमेश", 110, "18-10-2026 10:15", variant="chrome")]
+    assert len({key, *others}) == 5
+
+
+def test_memory_tier_drops_the_least_recently_used():
+    cache = ReceiptCache(memory_bytes=30)
+    for key in "abc":
+        cache.put(key, key.encode() * 10)
+    assert cache.get("a") == b"a" * 10   # a is now the most recent
+    cache.put("d", b"d" * 10)
+    assert "b" not in cache and all(k in cache for k in "acd")
+    assert cache.memory_size == 30
+    cache.put("huge", b"x" * 100)        # bigger than the whole tier: kept alone
+    assert list(cache.memory) == ["huge"]
+
+
+def test_disk_tier_survives_a_restart_and_stays_bounded(tmp_path):
+    directory = str(tmp_path / "receipts")
+    cache = ReceiptCache(directory, memory_bytes=10, disk_bytes=250)
+    for i in range(4):
+        cache.put(f"k{i}", bytes([i]) * 100)
+        os.utime(cache._path(f"k{i}"), (1000 + i, 1000 + i))
+        cache.disk[f"k{i}"] = (1000 + i, 100)
+    cache._evict_disk()
+    again = ReceiptCache(directory, memory_bytes=10, disk_bytes=250)
+    assert sorted(again.disk) == ["k2", "k3"]
+    assert again.get("k3") == bytes([3]) * 100 and again.get("k0") is None
+    assert sorted(os.listdir(directory)) == ["k2.bin", "k3.bin"]
+
+
+def test_printed_bills_are_remembered_newest_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(receipt_cache, "RECENT_BILLS", 3)
+    directory = str(tmp_path)
+    cache = ReceiptCache(directory)
+    for bill in range(1, 8):
+        cache.add_bill(bill, f"key{bill}", "", bill * 10, "18-10-2026")
+    assert [b["bill"] for b in cache.recent_bills()] == [7, 6, 5]
+    assert cache.last_bill()["key"] == "key7" and cache.bill(1) is None
+    with open(os.path.join(directory, "bills.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"bill": 8, "ke')   # power cut mid-line
+    again = ReceiptCache(directory)
+    assert [b["bill"] for b in again.recent_bills()] == [7, 6, 5]
+    with open(os.path.join(directory, "bills.jsonl"), encoding="utf-8") as f:
+        assert len(f.readlines()) == 3   # rewritten once it held more than twice the bills kept
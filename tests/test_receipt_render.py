@@ -0,0 +1,24 @@
+from datetime import datetime
+
+import pytest
+
+import receipt_render
+from receipt_render import RECEIPT_WIDTH, ReceiptRenderer
+
+
+def test_refuses_to_render_without_shaping(monkeypatch):
+    monkeypatch.setattr(receipt_render.features, "check", lambda feature: False)
+    with pytest.raises(OSError, match="libraqm"):
+        ReceiptRenderer("any.ttf")   # OSError sends Main's render_receipt_image to Chrome
+
+
+def test_renders_a_one_bit_receipt():
+    try:
+        renderer = ReceiptRenderer()
+    except OSError as e:
+        pytest.skip(str(e))
+    rows = [("चीनी", 2, 42.5, 85), ("बहुत लंबे नाम वाला कोई उत्पाद " * 3, 1, 19.99, 20)]
+    img = renderer.render(rows, "रमेश", 105, datetime(2026, 10, 18, 10, 15))
+    assert img.mode == "1" and img.size[0] == RECEIPT_WIDTH
+    short = renderer.render(rows[:1], "", 85, datetime(2026, 10, 18, 10, 15))
+    assert short.size[1] < img.size[1]   # the long name wrapped onto more lines
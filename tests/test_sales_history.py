@@ -0,0 +1,145 @@
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import sales_history
+from sales_history import COLUMNS, SalesHistory
+
+START = int(datetime(2024, 1, 30, 9, tzinfo=timezone.utc).timestamp())
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    monkeypatch.setattr(sales_history, "utc_offset", lambda: 0)
+
+
+def sample_bills(n, seed):
+    """n bills a few hours apart from START, each of 1-6 (pid, qty, price, amount) lines."""
+    rnd = random.Random(seed)
+    bills, ts = [], START
+    for _ in range(n):
+        ts += rnd.randint(0, 8 * 3600)
+        lines = [(rnd.randint(1, 40), rnd.choice((100, 50, 125, 1000)), rnd.randint(100, 99999), rnd.randint(1, 900))
+                 for _ in range(rnd.randint(1, 6))]
+        bills.append((ts, lines))
+    return bills
+
+
+def day_of(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).date()
+
+
+def reference(bills, period):
+    """period_totals worked out bill by bill with datetime."""
+    out = defaultdict(lambda: [set(), 0, 0])
+    for bill, (ts, lines) in enumerate(bills, 1):
+        day = day_of(ts)
+        if period == "week":
+            day -= timedelta(days=day.weekday())
+        elif period == "month":
+            day = day.replace(day=1)
+        out[day][0].add(bill)
+        out[day][1] += len(lines)
+        out[day][2] += sum(line[3] for line in lines)
+    return [(day, len(b), n, a) for day, (b, n, a) in sorted(out.items())]
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = SalesHistory(str(tmp_path / "sales"))
+    bills = sample_bills(300, 4)
+    history.append_bills(bills[:120])
+    for ts, lines in bills[120:]:
+        history.append_bill(lines, ts)
+    return history, bills
+
+
+@pytest.mark.parametrize("period", ["day", "week", "month"])
+def test_period_totals(history, period):
+    history, bills = history
+    assert history.period_totals(period) == reference(bills, period)
+
+
+def test_range_and_product_totals(history):
+    history, bills = history
+    start, end = bills[50][0], bills[200][0]
+    inside = [b for b in bills if start <= b[0] < end]
+    lines = [line for _, ls in inside for line in ls]
+    assert history.totals(start, end) == (len(inside), len(lines), sum(l[3] for l in lines))
+    amount, qty = defaultdict(int), defaultdict(int)
+    for pid, q, _, a in lines:
+        amount[pid] += a
+        qty[pid] += q
+    top = history.top_sellers(5, start, end)
+    assert [a for _, _, a in top] == sorted(amount.values(), reverse=True)[:5]
+    assert all(amount[pid] == a and qty[pid] / 100 == q for pid, q, a in top)
+    assert history.top_sellers(5, end, start) == [] and history.period_totals("day", end, start) == []
+
+
+def test_time_never_goes_backwards(tmp_path):
+    history = SalesHistory(str(tmp_path))
+    history.append_bill([(1, 100, 500, 5)], ts=START)
+    history.append_bill([(2, 100, 500, 5)], ts=START - 3600)   # clock set back
+    assert list(history.columns()["ts"]) == [START, START]
+    with pytest.raises(ValueError):
+        history.period_totals("year")
+
+
+def test_reopen_continues_and_drops_a_torn_bill(tmp_path):
+    directory = str(tmp_path / "sales")
+    history = SalesHistory(directory)
+    assert history.append_bills(sample_bills(10, 1)) == list(range(1, 11))
+    history.close()
+    rows = len(history)
+    with open(history.paths["pid"], "ab") as f:   # crash after one column of the next bill
+        f.write(b"\x07\x00\x00\x00")
+    again = SalesHistory(directory)
+    assert len(again) == rows
+    assert all(len(col) == rows for col in again.columns().values())
+    assert again.append_bill([(3, 100, 100, 1)], ts=START) == 11
+    assert again.columns()["ts"][-1] == again.columns()["ts"][-2]   # clamped to the last bill's time
+    assert set(COLUMNS) == set(again.columns())
+
+
+def test_bills_are_committed_off_the_calling_thread(tmp_path, monkeypatch):
+    synced_on = []
+    fsync = os.fsync
+    monkeypatch.setattr(sales_history.os, "fsync", lambda fd: (synced_on.append(threading.current_thread().name), fsync(fd)))
+    history = SalesHistory(str(tmp_path), commit_interval=0.01)
+    bills = sample_bills(20, 2)
+    for ts, lines in bills:
+        history.append_bill(lines, ts)
+    assert len(history) == sum(len(lines) for _, lines in bills)   # queued rows count already
+    deadline = time.monotonic() + 10
+    while history.rows < len(history) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert history.rows == len(history)
+    assert synced_on and set(synced_on) == {"sales-history"}
+    history.close()
+
+
+def test_failed_commit_is_written_again(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    history = SalesHistory(directory, commit_interval=60)
+    history.append_bills(sample_bills(3, 5))
+    history.flush()
+    committed = history.rows
+    bills = sample_bills(4, 6)
+    history.append_bills(bills)
+
+    def disk_full(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(sales_history.os, "fsync", disk_full)
+    with pytest.raises(OSError):
+        history.flush()
+    assert history.rows == committed
+    assert all(os.path.getsize(p) == committed * COLUMNS[n].itemsize for n, p in history.paths.items())
+    monkeypatch.undo()
+    history.close()
+    assert len(SalesHistory(directory)) == committed + sum(len(lines) for _, lines in bills)
@@ -0,0 +1,155 @@
+import random
+import re
+
+import pytest
+
+from search import OVERLAY_LIMIT, SearchIndex, normalize_text
+
+SEPARATORS = " -_/\\.,;:()[]&+'\""
+WORDS = ["soap", "sugar", "salt", "tea", "dal", "rice", "oil", "atta", "ghee", "masala", "5ml", "1kg",
+         "red", "green", "extra", "mini", "so", "ap"]
+HINDI = ["साबुन", "चीनी", "नमक", "चाय", "दाल", "चावल", "तेल", "आटा", "घी", "मसाला", "लाल", "हरा"]
+QUERIES = ["", "s", "so", "soa", "soap", "ap", "a", "5", "5ml", "ml", "-g", "ea", "xtr", "extra s",
+           "zzz", "चा", "ा", "ाल", "तेल", "ि", " r", "1"]
+
+
+def rank(query, key):
+    """0 prefix, 1 word start, 2 substring, None: written out, not taken from search.py."""
+    if key.startswith(query):
+        return 0
+    starts = [m.start() for m in re.finditer(re.escape(query), key)] if query else []
+    if not starts:
+        return None
+    return 1 if any(key[at - 1] in SEPARATORS for at in starts) else 2
+
+
+def brute_force(rows, query, limit=None, boost=None):
+    """Every row checked against query: rank, then boost weight, then name."""
+    query = normalize_text(query)
+    boost = boost or {}
+    hits = []
+    for row in rows:
+        en, hi = normalize_text(row[1]), normalize_text(row[2])
+        ranks = [r for r in (rank(query, en), rank(query, hi)) if r is not None]
+        if ranks or not query:
+            hits.append((min(ranks) if query else 0, -boost.get(row[0], 0), row[0] not in boost, en, row))
+    hits.sort(key=lambda h: h[:4])
+    out = [h[4] for h in hits]
+    return out[:limit] if limit else out
+
+
+def make_rows(n, seed):
+    rnd = random.Random(seed)
+    rows, names = [], set()
+    while len(rows) < n:
+        sep = rnd.choice(SEPARATORS[:6])
+        en = sep.join(rnd.sample(WORDS, rnd.randint(1, 3))).title() + f" {len(rows)}"
+        if en.lower() in names:
+            continue
+        names.add(en.lower())
+        rows.append((len(rows) + 1, en, " ".join(rnd.sample(HINDI, 2)), rnd.randint(1, 999), ""))
+    return sorted(rows, key=lambda r: normalize_text(r[1]))
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return make_rows(600, 1)
+
+
+@pytest.fixture
+def patched():
+    """An index streamed in chunks, then edited and trimmed the way the change feed does it."""
+    rnd = random.Random(7)
+    rows = make_rows(600, 1)
+    index = SearchIndex()
+    for i in range(0, len(rows), 64):
+        index.extend(rows[i:i + 64])
+    live = {r[0]: r for r in rows}
+    for row in rnd.sample(rows, 40):
+        new = (row[0], rnd.choice(["Soap ", "Mini ", "Zest "]) + row[1], row[2], row[3], row[4])
+        index.upsert(new)
+        live[new[0]] = new
+    for row in rnd.sample(rows, 30):
+        index.remove(row[0])
+        live.pop(row[0], None)
+    new = (9999, "Soap Extra Fresh", "नया साबुन", 5, "")
+    index.upsert(new)
+    live[new[0]] = new
+    return index, live
+
+
+@pytest.mark.parametrize("limit", [None, 1, 7, 50])
+@pytest.mark.parametrize("query", QUERIES)
+def test_ranking_matches_brute_force(rows, query, limit):
+    got = SearchIndex(rows).search(query, limit)
+    assert [r[0] for r in got] == [r[0] for r in brute_force(rows, query, limit)]
+
+
+@pytest.mark.parametrize("limit", [None, 1, 7, 50])
+@pytest.mark.parametrize("query", QUERIES)
+def test_ranking_after_patch_and_delete_matches_brute_force(patched, query, limit):
+    index, live = patched
+    got = index.search(query, limit)
+    assert [r[0] for r in got] == [r[0] for r in brute_force(live.values(), query, limit)]
+
+
+@pytest.mark.parametrize("query", ["s", "so", "ap", "ा", ""])
+def test_boost_moves_rows_to_the_front_of_their_rank(patched, query):
+    index, live = patched
+    boost = {pid: weight for weight, pid in enumerate(random.Random(3).sample(sorted(live), 25), 1)}
+    got = index.search(query, 40, boost)
+    assert [r[0] for r in got] == [r[0] for r in brute_force(live.values(), query, 40, boost)]
+
+
+def test_streamed_chunks_match_one_build(rows):
+    index = SearchIndex()
+    for i in range(0, len(rows), 64):
+        index.extend(rows[i:i + 64])
+    built = SearchIndex(rows)
+    assert len(index) == len(rows)
+    for query in QUERIES:
+        assert index.search(query) == built.search(query)
+
+
+def test_rank():
+    assert SearchIndex.rank("so", "soap") == 0
+    assert SearchIndex.rank("so", "red-soap") == 1
+    assert SearchIndex.rank("ap", "soap ap") == 1   # a later word start counts
+    assert SearchIndex.rank("oa", "soap") == 2
+    assert SearchIndex.rank("x", "soap") is None
+
+
+def test_devanagari_spellings_match_after_nfc():
+    # क़ typed as one code point or as क + nukta: NFC gives both the same form
+    index = SearchIndex([(1, "Kamal", "\u0915\u093cमल", 1, ""), (2, "Qila", "\u0958िला", 1, "")])
+    assert [r[0] for r in index.search("\u0915\u093c")] == [1, 2]
+    assert [r[0] for r in index.search("\u0958िला")] == [2]
+
+
+def test_compact_keeps_the_results(patched):
+    index, live = patched
+    before = {q: index.search(q) for q in QUERIES}
+    index.compact()
+    assert not index.patched and not index.dead
+    assert len(index) == len(live)
+    assert {q: index.search(q) for q in QUERIES} == before
+
+
+def test_removed_rows_never_come_back(patched):
+    index, live = patched
+    gone = [pid for pid in range(1, 601) if pid not in live]
+    assert gone
+    found = {r[0] for q in QUERIES for r in index.search(q)}
+    assert found.isdisjoint(gone)
+
+
+def test_deletes_alone_trigger_compaction():
+    rows = make_rows(OVERLAY_LIMIT + 20, 2)
+    index = SearchIndex(rows)
+    for row in rows[:OVERLAY_LIMIT]:
+        index.remove(row[0])
+    assert len(index.dead) == OVERLAY_LIMIT and not index.patched
+    index.upsert(rows[0])   # one patched row tips the overlay over
+    assert not index.dead and not index.patched
+    assert len(index) == len(index.rows) == 21
+    assert [r[0] for r in index.search("")] == [r[0] for r in brute_force([rows[0]] + rows[OVERLAY_LIMIT:], "")]
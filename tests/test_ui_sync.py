@@ -0,0 +1,158 @@
+import random
+from types import SimpleNamespace
+
+from ui_sync import BURST_GAP_MS, BURST_MIN_KEYS, BurstDetector, Debouncer, ListboxSync, TreeSync
+
+
+class Root:
+    """after() on a virtual clock: advance(ms) runs what falls due."""
+
+    def __init__(self):
+        self.now, self.timers, self.next_id = 0, {}, 0
+
+    def after(self, ms, fn, *args):
+        self.next_id += 1
+        self.timers[self.next_id] = (self.now + ms, fn, args)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.timers.pop(after_id, None)
+
+    def advance(self, ms):
+        self.now += ms
+        for after_id, (due, fn, args) in sorted(self.timers.items(), key=lambda t: t[1][0]):
+            if due <= self.now and self.timers.pop(after_id, None):
+                fn(*args)
+
+
+class Listbox:
+    def __init__(self, items=()):
+        self.items, self.touched = list(items), 0
+
+    def get(self, first, last=None):
+        return tuple(self.items)
+
+    def delete(self, first, last=None):
+        last = first if last is None else last
+        self.touched += last - first + 1
+        del self.items[first:last + 1]
+
+    def insert(self, index, *items):
+        self.touched += len(items)
+        self.items[index:index] = items
+
+
+class Treeview:
+    def __init__(self):
+        self.order, self.values, self.writes = [], {}, 0
+
+    def get_children(self, item=""):
+        return tuple(self.order)
+
+    def insert(self, parent, index, iid=None, values=()):
+        assert iid not in self.values
+        self.order.insert(index, iid)
+        self.values[iid] = tuple(values)
+        self.writes += 1
+
+    def delete(self, *items):
+        for iid in items:
+            self.order.remove(iid)
+            del self.values[iid]
+
+    def move(self, iid, parent, index):
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def item(self, iid, values=None, **kwargs):
+        self.values[iid] = tuple(values)
+        self.writes += 1
+
+    def shown(self):
+        return [self.values[iid] for iid in self.order]
+
+
+def test_debouncer_runs_the_last_call_once_after_the_burst():
+    root, calls = Root(), []
+    debounce = Debouncer(root, 100)
+    for text in ("s", "so", "soa"):
+        debounce(lambda gen, t: calls.append((gen, t)), text)
+        root.advance(40)
+    assert calls == []
+    root.advance(60)
+    assert calls == [(3, "soa")] and debounce.is_current(3)
+    debounce(lambda gen, t: calls.append((gen, t)), "soap")
+    assert not debounce.is_current(3)
+
+
+def test_debouncer_flush_and_cancel():
+    root, calls = Root(), []
+    debounce = Debouncer(root, 100)
+    debounce(lambda gen: calls.append(gen))
+    debounce.flush()
+    assert calls == [1]
+    root.advance(200)
+    assert calls == [1]            # flushed, so not run again
+    debounce(lambda gen: calls.append(gen))
+    debounce.cancel()
+    root.advance(200)
+    assert calls == [1] and not debounce.is_current(2)
+
+
+def test_listbox_sync_ends_equal_and_touches_only_changes():
+    rnd = random.Random(4)
+    words = [f"item {i}" for i in range(40)]
+    box = Listbox(words[:10])
+    sync = ListboxSync(box)
+    for _ in range(200):
+        items = sorted(rnd.sample(words, rnd.randint(0, 25)))
+        sync.update(items)
+        assert box.items == items
+    box.touched = 0
+    sync.update(items[:-1] + ["zz"])
+    assert box.items == items[:-1] + ["zz"] and box.touched == 2
+
+
+def test_tree_sync_ends_equal_and_rewrites_only_changed_rows():
+    rnd = random.Random(8)
+    tree = Treeview()
+    sync = TreeSync(tree)
+    prices = {pid: pid * 10 for pid in range(60)}
+    for _ in range(200):
+        for pid in rnd.sample(range(60), 3):
+            prices[pid] += 1
+        rows = [(pid, f"p{pid}", prices[pid]) for pid in rnd.sample(range(60), rnd.randint(0, 30))]
+        sync.update(rows)
+        assert tree.shown() == rows and tree.order == [str(r[0]) for r in rows]
+    tree.writes = 0
+    rows[0] = (rows[0][0], rows[0][1], -1)
+    sync.update(list(reversed(rows)))
+    assert tree.shown() == list(reversed(rows)) and tree.writes == 1
+    sync.clear()
+    assert tree.order == [] and sync.values == {}
+
+
+def keys(detector, widget, times):
+    return [detector.key(SimpleNamespace(widget=widget, time=t)) for t in times]
+
+
+def test_burst_detector_tells_a_scan_from_typing():
+    detector = BurstDetector()
+    scan = [1000 + 8 * i for i in range(13)]          # EAN-13, 8 ms apart
+    assert keys(detector, "entry", scan) == [False] * (BURST_MIN_KEYS - 1) + [True] * (14 - BURST_MIN_KEYS)
+    assert detector.active("entry") and not detector.active("other")
+    assert detector.scanned(SimpleNamespace(widget="entry", time=scan[-1] + 8))
+    assert not detector.active("entry")             # the Return ended the run
+    typed = [5000 + 120 * i for i in range(13)]
+    assert not any(keys(detector, "entry", typed))
+    assert not detector.scanned(SimpleNamespace(widget="entry", time=typed[-1] + 150))
+
+
+def test_burst_detector_needs_a_prompt_return_and_survives_clock_wrap():
+    detector = BurstDetector()
+    keys(detector, "entry", [100 + i for i in range(8)])
+    assert not detector.scanned(SimpleNamespace(widget="entry", time=107 + BURST_GAP_MS))   # Return typed later
+    wrap = [(0xFFFFFFFF - 20 + 7 * i) & 0xFFFFFFFF for i in range(8)]
+    assert keys(detector, "entry", wrap)[-1]
+    keys(detector, "other", [wrap[-1] + 1])   # another widget does not break the run
+    assert detector.scanned(SimpleNamespace(widget="entry", time=wrap[-1] + 5))
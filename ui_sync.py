@@ -0,0 +1,338 @@
+from difflib import SequenceMatcher
+
+OVERSCAN = 20       # rows rendered above and below the visible window
+WHEEL_ROWS = 3      # rows per mouse-wheel notch
+BURST_GAP_MS = 30   # keys closer together than this are machine-typed
+BURST_MIN_KEYS = 6  # a run of at least this many such keys is a scan (EAN-8 and up)
+
+
+# ---------------- Debounce ----------------
+class Debouncer:
+    """Coalesce a burst of calls into one, run delay_ms after the last call.
+
+    Every call bumps a generation counter; the callback gets its generation so
+    results computed for an older keystroke can be dropped with is_current().
+    """
+
+    def __init__(self, root, delay_ms):
+        self.root = root
+        self.delay_ms = delay_ms
+        self.generation = 0
+        self._after_id = None
+        self._pending = None
+
+    def __call__(self, fn, *args):
+        self.generation += 1
+        self._cancel_after()
+        self._pending = (self.generation, fn, args)
+        self._after_id = self.root.after(self.delay_ms, self._fire)
+        return self.generation
+
+    def _cancel_after(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _fire(self):
+        self._after_id = None
+        pending, self._pending = self._pending, None
+        if pending and pending[0] == self.generation:
+            gen, fn, args = pending
+            fn(gen, *args)
+
+    def flush(self):
+        """Run the pending call now (e.g. before Up/Down reads the result list)."""
+        if self._pending:
+            self._cancel_after()
+            self._fire()
+
+    def cancel(self):
+        self.generation += 1
+        self._cancel_after()
+        self._pending = None
+
+    def is_current(self, gen):
+        return gen == self.generation
+
+
+# ---------------- Scanner burst detection ----------------
+class BurstDetector:
+    """Tells a USB barcode scanner from a person typing into the same Entry.
+
+    A scanner "types" its digits a few ms apart and ends with Return; people
+    rarely press two keys within BURST_GAP_MS. key(event) is fed every key
+    press and says whether the widget is inside a burst; scanned(event)
+    says whether the Return that just came ends one. Times are event.time,
+    the X server's millisecond clock.
+    """
+
+    def __init__(self, gap_ms=BURST_GAP_MS, min_keys=BURST_MIN_KEYS):
+        self.gap_ms = gap_ms
+        self.min_keys = min_keys
+        self.runs = {}   # widget -> (time of its last key, keys in the current run)
+
+    def _close(self, last, now):
+        return last is not None and (now - last) & 0xFFFFFFFF < self.gap_ms   # event.time wraps
+
+    def key(self, event):
+        last, run = self.runs.get(event.widget, (None, 0))
+        run = run + 1 if self._close(last, event.time) else 1
+        self.runs[event.widget] = (event.time, run)
+        return run >= self.min_keys
+
+    def active(self, widget):
+        """True while the last key pressed in widget belongs to a burst."""
+        return self.runs.get(widget, (None, 0))[1] >= self.min_keys
+
+    def scanned(self, event):
+        """True if this key (the Return) closes a burst; the run ends either way."""
+        last, run = self.runs.pop(event.widget, (None, 0))
+        return run >= self.min_keys and self._close(last, event.time)
+
+
+# ---------------- Diff-based widget updates ----------------
+class ListboxSync:
+    """Keeps a Listbox equal to a list of strings, touching only changed rows."""
+
+    def __init__(self, listbox):
+        self.listbox = listbox
+        self.items = list(listbox.get(0, "end"))
+
+    def update(self, items):
+        items = list(items)
+        if items == self.items:
+            return
+        ops = SequenceMatcher(None, self.items, items, autojunk=False).get_opcodes()
+        # apply back to front so earlier indices stay valid
+        for tag, i1, i2, j1, j2 in reversed(ops):
+            if tag == "equal":
+                continue
+            if i2 > i1:
+                self.listbox.delete(i1, i2 - 1)
+            if j2 > j1:
+                self.listbox.insert(i1, *items[j1:j2])
+        self.items = items
+
+
+class TreeSync:
+    """Keeps a flat Treeview equal to a list of rows keyed by iid.
+
+    Rows that left the result are deleted, new ones inserted, moved ones
+    repositioned and only rows whose values changed are rewritten.
+    """
+
+    def __init__(self, tree, key=lambda row: str(row[0])):
+        self.tree = tree
+        self.key = key
+        self.values = {}  # iid -> values currently shown
+
+    def update(self, rows):
+        tree = self.tree
+        wanted = [(self.key(r), tuple(r)) for r in rows]
+        keep = {iid for iid, _ in wanted}
+        stale = [iid for iid in tree.get_children() if iid not in keep]
+        if stale:
+            tree.delete(*stale)
+            for iid in stale:
+                self.values.pop(iid, None)
+        children = list(tree.get_children())
+        for index, (iid, values) in enumerate(wanted):
+            if iid not in self.values:
+                tree.insert("", index, iid=iid, values=values)
+                children.insert(index, iid)
+                self.values[iid] = values
+                continue
+            if index >= len(children) or children[index] != iid:
+                tree.move(iid, "", index)
+                children.remove(iid)
+                children.insert(index, iid)
+            if self.values[iid] != values:
+                tree.item(iid, values=values)
+                self.values[iid] = values
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self.values.clear()
+
+
+# ---------------- Virtual Treeview ----------------
+class VirtualTree:
+    """Treeview over a long list of rows that only holds the visible window.
+
+    Only the visible rows plus OVERSCAN on each side exist as Tk items. The
+    wheel, the scrollbar and the navigation keys move a window over the cached
+    list; a move that stays inside the rendered rows is a yview change, one
+    that leaves them re-renders through TreeSync. rows can come with more(),
+    which returns the complete list and is only called once the user scrolls
+    or sorts past what was given. Paged rows (paged=True) instead come with a
+    more() that only asks for the next page; it arrives through extend(), and
+    sorting orders the pages loaded so far. Header clicks cycle ascending, descending
+    and the original order. The selection is kept by key, so it survives
+    scrolling and new rows.
+    """
+
+    def __init__(self, tree, scrollbar=None, key=lambda row: str(row[0]), sort_keys=None, overscan=OVERSCAN):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.key = key
+        self.sort_keys = sort_keys or {}   # column -> key function for header sorting
+        self.overscan = overscan
+        self.height = int(tree["height"] or 10)
+        self.sync = TreeSync(tree, key)
+        self.base = []           # rows in the order given
+        self.rows = []           # rows in display order
+        self.more = None
+        self.paged = False
+        self.source = None
+        self.sort = None         # (column, descending) or None
+        self.top = 0             # first visible row
+        self.start = self.end = 0  # rendered slice of rows
+        self.selected = None     # key of the selected row
+        self._positions = None   # key -> index in rows, built when needed
+        self._dirty = True
+        self.titles = {col: tree.heading(col)["text"] for col in self.sort_keys}
+        for col in self.sort_keys:
+            tree.heading(col, command=lambda c=col: self.sort_by(c))
+        if scrollbar is not None:
+            scrollbar.config(command=self._on_scrollbar)
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", self._on_wheel)
+        tree.bind("<Button-5>", self._on_wheel)
+        for keysym, step in (("Up", -1), ("Down", 1), ("Prior", -self.height), ("Next", self.height)):
+            tree.bind(f"<{keysym}>", lambda e, step=step: self.move_selection(step))
+        tree.bind("<Home>", lambda e: self.select_index(0))
+        tree.bind("<End>", lambda e: self.select_index(len(self._complete()) - 1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_rows(self, rows, more=None, source=None, paged=False):
+        """Show rows; scroll back to the top when source (e.g. the query) changed."""
+        self.base, self.more, self.paged = list(rows), more, paged
+        if source != self.source:
+            self.source, self.top = source, 0
+        self._apply_sort()
+
+    def extend(self, rows, more=None):
+        """Append the next page of paged rows; more asks for the one after it (None: last page)."""
+        self.base.extend(rows)
+        self.more = more
+        self._apply_sort()
+
+    def _complete(self):
+        if self.more is not None and not self.paged:
+            more, self.more = self.more, None
+            self.base = list(more())
+            self._apply_sort()
+        return self.rows
+
+    def _apply_sort(self):
+        if self.sort and self.more is not None and not self.paged:
+            more, self.more = self.more, None   # sorting needs every row
+            self.base = list(more())
+        if self.sort:
+            col, descending = self.sort
+            self.rows = sorted(self.base, key=self.sort_keys[col], reverse=descending)
+        else:
+            self.rows = self.base
+        self._positions = None
+        self._dirty = True
+        self.render()
+
+    def sort_by(self, col):
+        if self.sort == (col, False):
+            self.sort = (col, True)
+        elif self.sort == (col, True):
+            self.sort = None
+        else:
+            self.sort = (col, False)
+        for c, title in self.titles.items():
+            arrow = "" if not self.sort or self.sort[0] != c else (" ▼" if self.sort[1] else " ▲")
+            self.tree.heading(c, text=f"{title}{arrow}")
+        self._apply_sort()
+
+    # --- window ---
+    def render(self):
+        if self.more is not None and self.top + self.height + self.overscan >= len(self.rows):
+            if not self.paged:
+                return self._complete()
+            more, self.more = self.more, None
+            more()   # the page comes back through extend()
+        self._capture()   # before rendering may delete the selected item
+        n = len(self.rows)
+        self.top = max(0, min(self.top, n - self.height))
+        if self._dirty or not (self.start <= self.top and self.top + self.height <= self.end):
+            self.start = max(0, self.top - self.overscan)
+            self.end = min(n, self.top + self.height + self.overscan)
+            self.sync.update(self.rows[self.start:self.end])
+            self._dirty = False
+        if self.selected is not None and self.tree.exists(self.selected) \
+                and self.tree.selection() != (self.selected,):
+            self.tree.selection_set(self.selected)
+        rendered = self.end - self.start
+        self.tree.yview_moveto((self.top - self.start) / rendered if rendered else 0)
+        if self.scrollbar is not None:
+            self.scrollbar.set(self.top / n if n else 0, min(1, (self.top + self.height) / n) if n else 1)
+
+    def scroll_to(self, top):
+        self.top = top
+        self.render()
+
+    def _on_wheel(self, event):
+        up = getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0
+        self.scroll_to(self.top + (-WHEEL_ROWS if up else WHEEL_ROWS))
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self._complete())))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.height if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    # --- selection ---
+    def _index_of(self, key):
+        if self._positions is None:
+            self._positions = {self.key(r): i for i, r in enumerate(self.rows)}
+        return self._positions.get(key)
+
+    def _capture(self):
+        live = self.tree.selection()
+        if live:
+            self.selected = live[0]
+
+    def selection(self):
+        """(key,) of the selected row, also while it is scrolled out of the rendered rows."""
+        self._capture()
+        if self.selected is None or self._index_of(self.selected) is None:
+            return ()
+        return (self.selected,)
+
+    def selected_row(self):
+        sel = self.selection()
+        return self.rows[self._index_of(sel[0])] if sel else None
+
+    def select_index(self, index):
+        rows = self._complete() if index >= len(self.rows) - 1 else self.rows
+        if not rows:
+            return "break"
+        index = max(0, min(index, len(rows) - 1))
+        self.selected = self.key(rows[index])
+        live = self.tree.selection()
+        if live:
+            self.tree.selection_remove(*live)
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.height:
+            self.top = index - self.height + 1
+        self.render()
+        self.tree.focus(self.selected)
+        return "break"
+
+    def move_selection(self, step):
+        sel = self.selection()
+        index = self._index_of(sel[0]) if sel else self.top - 1
+        return self.select_index(index + step)